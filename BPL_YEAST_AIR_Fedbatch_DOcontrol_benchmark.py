@@ -0,0 +1,269 @@
+# Benchmark of FMU-explore for the yeast fedbatch cultivation
+# of simulation, continuation and introspection used interactively
+#
+# Author: FMU-explore contributors
+#------------------------------------------------------------------------------------------------------------------
+# 2026-10-16 - Benchmark of FMU-explore scripts for FMPy and PyFMI with results in JSON and comparison to baseline
+#------------------------------------------------------------------------------------------------------------------
+#
+# Run from the directory of the FMU and scripts, for example:
+#
+#   python BPL_YEAST_AIR_Fedbatch_DOcontrol_benchmark.py --backend fmpy --output fmpy.json
+#   python BPL_YEAST_AIR_Fedbatch_DOcontrol_benchmark.py --backend pyfmi --baseline fmpy.json
+#   python BPL_YEAST_AIR_Fedbatch_DOcontrol_benchmark.py --fmu BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_2204_om_me.fmu \
+#                                                        --baseline fmpy.json
+#
+# Each case is run once for warm up and then repeated, and the times of the repetitions are saved. The comparison
+# with a baseline is by the ratio of the medians and the Mann-Whitney U-test of the repetitions, and a case is 
+# reported as changed when the test is significant and the ratio differs from one more than the threshold.
+# The test needs at least compareRepeatMin repetitions on each side to reach p below 0.05, and with fewer 
+# the case is reported as not enough repetitions to compare.
+
+import sys
+import os
+import io
+import json
+import math
+import time
+import importlib.util
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from importlib.metadata import version
+
+scripts = {'fmpy': 'BPL_YEAST_AIR_Fedbatch_DOcontrol_fmpy_explore.py', 
+           'pyfmi': 'BPL_YEAST_AIR_Fedbatch_DOcontrol_explore.py'}
+
+#------------------------------------------------------------------------------------------------------------------
+#  Backend
+#------------------------------------------------------------------------------------------------------------------
+
+def backend_load(backend):
+   """ Run the FMU-explore script of the backend headless as module fmu_explore and return its namespace,
+       a module so that functions can be given to the worker processes of simu_sweep() """
+   os.environ['FMU_EXPLORE_HEADLESS'] = '1'
+   spec = importlib.util.spec_from_file_location('fmu_explore', scripts[backend])
+   module = importlib.util.module_from_spec(spec)
+   sys.modules['fmu_explore'] = module
+   with contextlib.redirect_stdout(io.StringIO()):
+      spec.loader.exec_module(module)
+   return vars(module)
+
+def backend_options(ns, ncp):
+   """ Return the standard simulation options of the backend with the number of communication points """
+   options = ns['opts_std'].copy()
+   options['NCP' if 'NCP' in options else 'ncp'] = ncp
+   return options
+
+def quiet(function, *args, **kwargs):
+   """ Call function with printout discarded """
+   with contextlib.redirect_stdout(io.StringIO()):
+      return function(*args, **kwargs)
+
+#------------------------------------------------------------------------------------------------------------------
+#  Benchmark cases - each returns a function that does one repetition and the number of calls it makes
+#------------------------------------------------------------------------------------------------------------------
+
+def case_import_cold(backend):
+   """ Start a new Python process and run the script, that is import of libraries and set up of the FMU """
+   command = [sys.executable, '-c', 'import os, runpy; os.environ["FMU_EXPLORE_HEADLESS"] = "1"; '
+                                    'runpy.run_path(' + repr(scripts[backend]) + ', run_name="fmu_explore")']
+   def run():
+      subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+   return run, 1
+
+def case_simu_init(ns, ncp):
+   """ Simulate from the initial state with ncp communication points """
+   options = backend_options(ns, ncp)
+   def run():
+      quiet(ns['simu'], ns['simulationTime'], 'init', options)
+   return run, 1
+
+def case_simu_cont(ns, segments):
+   """ Simulate from the initial state and then continue in segments """
+   options = backend_options(ns, 100)
+   time_segment = ns['simulationTime']/segments
+   def run():
+      quiet(ns['simu'], time_segment, 'init', options)
+      for k in range(segments - 1): quiet(ns['simu'], time_segment, 'cont', options)
+   return run, segments
+
+def case_model_get(ns):
+   """ Get the values of all parameters in parLocation from the model """
+   names = list(ns['parLocation'].values())
+   if 'model_get' in ns:
+      get = ns['model_get']
+   else:
+      get = lambda name: ns['model'].get(name)[0]
+   def run():
+      for name in names: get(name)
+   return run, len(names)
+
+def case_disp(ns):
+   """ Display all parameters in parValue """
+   def run():
+      quiet(ns['disp'])
+   return run, 1
+
+def case_describe(ns):
+   """ Describe all parameters in parValue and the culture """
+   names = list(ns['parValue'].keys()) + ['culture']
+   def run():
+      for name in names: quiet(ns['describe'], name)
+   return run, len(names)
+
+def case_sweep(ns, n):
+   """ Parameter sweep of n scenarios in parallel """
+   grid = [{'mu_feed': 0.10 + 0.20*k/max(n - 1, 1)} for k in range(n)]
+   options = backend_options(ns, 100)
+   def run():
+      ns['simu_sweep'](grid, options=options)
+   return run, n
+
+def cases_setup(backend, ns, quick):
+   """ Return dictionary of the benchmark cases available for the backend """
+   cases = {'import_cold': case_import_cold(backend)}
+   for ncp in ([100, 500] if quick else [100, 500, 2000]):
+      cases['simu_init_ncp' + str(ncp)] = case_simu_init(ns, ncp)
+   cases['simu_cont_chain10'] = case_simu_cont(ns, 10)
+   cases['model_get'] = case_model_get(ns)
+   cases['disp'] = case_disp(ns)
+   cases['describe'] = case_describe(ns)
+   if 'simu_sweep' in ns: cases['sweep16'] = case_sweep(ns, 16)
+   return cases
+
+#------------------------------------------------------------------------------------------------------------------
+#  Statistics
+#------------------------------------------------------------------------------------------------------------------
+
+def mann_whitney(x, y):
+   """ Return two-sided p-value of the Mann-Whitney U-test by normal approximation with correction for ties """
+   n1, n2 = len(x), len(y)
+   if n1 == 0 or n2 == 0: return float('nan')
+   values = sorted([(v, 0) for v in x] + [(v, 1) for v in y])
+   ranks = [0.0]*len(values)
+   ties = 0.0
+   i = 0
+   while i < len(values):
+      j = i
+      while j + 1 < len(values) and values[j + 1][0] == values[i][0]: j = j + 1
+      for k in range(i, j + 1): ranks[k] = (i + j)/2 + 1
+      t = j - i + 1
+      ties = ties + t**3 - t
+      i = j + 1
+   r1 = sum(rank for rank, (v, group) in zip(ranks, values) if group == 0)
+   u = r1 - n1*(n1 + 1)/2
+   n = n1 + n2
+   sigma = math.sqrt(n1*n2/12*((n + 1) - ties/(n*(n - 1))))
+   if sigma == 0: return 1.0
+   z = (abs(u - n1*n2/2) - 0.5)/sigma
+   return math.erfc(max(z, 0)/math.sqrt(2))
+
+def summary(samples, calls):
+   """ Return statistics of the times of the repetitions """
+   return {'samples': samples, 'calls': calls, 'median': statistics.median(samples), 'mean': statistics.mean(samples),
+           'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0, 'min': min(samples),
+           'median_per_call': statistics.median(samples)/calls}
+
+compareRepeatMin = 5
+
+def compare(results, baseline, alpha, threshold):
+   """ Return comparison of the cases in common with the baseline """
+   comparison = {}
+   for name, case in results['cases'].items():
+      if name not in baseline['cases']: continue
+      base = baseline['cases'][name]
+      if 'error' in case or 'error' in base: continue
+      ratio = case['median_per_call']/base['median_per_call']
+      p = mann_whitney(case['samples'], base['samples']) if case['calls'] == base['calls'] else float('nan')
+      if min(len(case['samples']), len(base['samples'])) < compareRepeatMin:
+         verdict = 'not enough repetitions to compare'
+      elif p < alpha and ratio > 1 + threshold:
+         verdict = 'slower'
+      elif p < alpha and ratio < 1 - threshold:
+         verdict = 'faster'
+      else:
+         verdict = 'unchanged'
+      comparison[name] = {'ratio': ratio, 'p': p, 'verdict': verdict}
+   return comparison
+
+#------------------------------------------------------------------------------------------------------------------
+#  Main
+#------------------------------------------------------------------------------------------------------------------
+
+def file_sha256(path):
+   """ Return hash of the content of the file """
+   with open(path, 'rb') as file: return hashlib.sha256(file.read()).hexdigest()
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Benchmark of FMU-explore for BPL_YEAST_AIR_Fedbatch')
+   parser.add_argument('--backend', choices=list(scripts.keys()), default='fmpy')
+   parser.add_argument('--fmu', default=None, help='FMU to use instead of the default of the script')
+   parser.add_argument('--repeat', type=int, default=7, help='repetitions of each case')
+   parser.add_argument('--cases', default=None, help='comma separated names of cases to run')
+   parser.add_argument('--quick', action='store_true', help='fewer cases and 5 repetitions')
+   parser.add_argument('--output', default=None, help='JSON file for the results')
+   parser.add_argument('--baseline', default=None, help='JSON file of results to compare with')
+   parser.add_argument('--alpha', type=float, default=0.05, help='significance level of the comparison')
+   parser.add_argument('--threshold', type=float, default=0.05, help='relative change of median reported')
+   args = parser.parse_args(argv)
+   repeat = compareRepeatMin if args.quick else args.repeat
+   
+   if args.fmu is not None: os.environ['FMU_EXPLORE_FMU'] = args.fmu
+   ns = backend_load(args.backend)
+   cases = cases_setup(args.backend, ns, args.quick)
+   if args.cases is not None:
+      cases = {name: cases[name] for name in args.cases.split(',') if name in cases}
+   
+   versions = {}
+   for package in ['numpy', 'fmpy', 'pyfmi']:
+      try:
+         versions[package] = version(package)
+      except Exception:
+         pass
+   results = {'meta': {'backend': args.backend, 'script': scripts[args.backend], 'fmu': ns['fmu_model'], 
+                       'fmu_sha256': file_sha256(ns['fmu_model']), 'BPL_version': ns.get('BPL_version'),
+                       'python': platform.python_version(), 'platform': platform.platform(), 
+                       'processor': platform.processor(), 'cpu_count': os.cpu_count(), 'versions': versions, 
+                       'repeat': repeat, 'date': time.strftime('%Y-%m-%d %H:%M:%S')}, 
+              'cases': {}}
+   
+   for name, (run, calls) in cases.items():
+      try:
+         run()
+         samples = []
+         for k in range(repeat):
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+      except Exception as error:
+         results['cases'][name] = {'error': repr(error)}
+         print(name.ljust(20), 'failed -', repr(error))
+         continue
+      results['cases'][name] = summary(samples, calls)
+      case = results['cases'][name]
+      print(name.ljust(20), 'median', '%.4f' % case['median'], 's  per call', '%.6f' % case['median_per_call'], 
+            's  stdev', '%.4f' % case['stdev'])
+   
+   status = 0
+   if args.baseline is not None:
+      with open(args.baseline) as file: baseline = json.load(file)
+      results['baseline'] = {'file': args.baseline, 'meta': baseline['meta'], 
+                             'comparison': compare(results, baseline, args.alpha, args.threshold)}
+      print()
+      print('Compared with', args.baseline, '-', baseline['meta']['backend'], baseline['meta']['fmu'])
+      for name, c in results['baseline']['comparison'].items():
+         print(name.ljust(20), 'ratio', '%.3f' % c['ratio'], ' p', '%.3f' % c['p'], ' ', c['verdict'])
+         if c['verdict'] == 'slower': status = 1
+   
+   if args.output is not None:
+      with open(args.output, 'w') as file: json.dump(results, file, indent=2)
+   
+   if 'simu_pool_close' in ns: ns['simu_pool_close']()
+   return status
+
+if __name__ == '__main__':
+   sys.exit(main())
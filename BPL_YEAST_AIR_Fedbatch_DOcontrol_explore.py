@@ -80,6 +80,13 @@
 # 2025-11-19 - FMU-explore 1.0.2 corrected again parLocation() with sheets as argument
 # 2026-03-25 - FMU-explore 1.0.3
 # 2026-04-09 - Update for BPL 2.3.2
+# 2026-10-16 - Headless simu_run() that returns SimuResult without plots and matplotlib imported only when needed
+# 2026-10-16 - Cache of simulation results on disk, content addressed and with least recently used entries evicted
+# 2026-10-16 - Store of simulation results on disk in columns that are memory-mapped when opened
+# 2026-10-16 - Continuation simu('cont') with parameters and states given in one call of set_real() from a plan computed once
+# 2026-10-16 - Binding of parValue and states to value references so that simu() sets and reads them in one call
+# 2026-10-16 - FMU on Linux can be given by environment variable FMU_EXPLORE_FMU, used by the benchmark script
+# 2026-10-16 - Profiler of simu() with wall time and calls per phase enabled by profiler_setup() and shown by profiler_report()
 #------------------------------------------------------------------------------------------------------------------
 
 #------------------------------------------------------------------------------------------------------------------
@@ -88,27 +95,43 @@
 
 # Setup framework
 import sys
+import os
 import platform
 import locale
+import time
 import numpy as np 
-import matplotlib.pyplot as plt
-import matplotlib.image as img
 import zipfile 
+import json
+import hashlib
+import uuid
 
 from pyfmi import load_fmu
 from pyfmi.fmi import FMUException
+from pyfmi.fmi import FMI2_REAL
 
 from itertools import cycle
 from importlib.metadata import version   
 
 # Set the environment - for Linux a JSON-file in the FMU is read
 if platform.system() == 'Linux': locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
+
+# Headless mode without plots and matplotlib not imported - set environment variable FMU_EXPLORE_HEADLESS=1 
+headless = os.environ.get('FMU_EXPLORE_HEADLESS', '') not in ['', '0']
+
+def matplotlib_import():
+   """ Import matplotlib, at start of the script or on demand when plots are asked for in headless mode """
+   global plt, img
+   import matplotlib.pyplot as plt 
+   import matplotlib.image as img
+
+if not headless: matplotlib_import()
       
 #------------------------------------------------------------------------------------------------------------------
 #  Setup application FMU
 #------------------------------------------------------------------------------------------------------------------
 
 # Provde the right FMU and load for different platforms in user dialogue:
+# On Linux another build of the FMU can be given by environment variable FMU_EXPLORE_FMU, eg for comparison
 if platform.system() == 'Windows':
    print('Windows - run FMU pre-compiled JModelica 2.14')
    flag_vendor = 'JM'
@@ -124,7 +147,7 @@ elif platform.system() == 'Linux':
          fmu_model ='BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_cs.fmu'    
          model = load_fmu(fmu_model, log_level=0) 
       if flag_type in ['ME','me']:         
-         fmu_model ='BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_me.fmu'    
+         fmu_model = os.environ.get('FMU_EXPLORE_FMU', 'BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_me.fmu')
          model = load_fmu(fmu_model, log_level=0)
    else:    
       print('There is no FMU for this platform')
@@ -177,6 +200,26 @@ stateValue =  {}
 stateValue = model.get_states_list()
 stateValue.update(timeDiscreteStates)
 
+# Create stateValueInitial with the start value parameter for each state used in 'cont'
+stateValueInitial = {}
+for key in stateValue.keys():
+    if not key[-1] == ']':
+         if key[-3:] == 'I.y':
+            stateValueInitial[key] = key[:-10]+'I_start'
+         elif key[-3:] == 'D.x':
+            stateValueInitial[key] = key[:-10]+'D_start'
+         else:
+            stateValueInitial[key] = key+'_start'
+    elif key[-3] == '[':
+        stateValueInitial[key] = key[:-3]+'_start'+key[-3:]
+    elif key[-4] == '[':
+        stateValueInitial[key] = key[:-4]+'_start'+key[-4:]
+    elif key[-5] == '[':
+        stateValueInitial[key] = key[:-5]+'_start'+key[-5:] 
+    else:
+        print('The state vector has more than 1000 states')
+        break
+
 # Create dictionaries parValue[] and parLocation[]
 parValue = {}
 parValue['V_start'] = 4.5
@@ -289,6 +332,7 @@ def newplot(title='Yeast fedbatch cultivation', plotType='TimeSeries'):
           
    # Reset pens
    setLines()
+   matplotlib_import()
 
    # Transfer of global axes to simu()
    global ax1, ax2, ax3, ax4
@@ -588,49 +632,434 @@ def setLines(lines=['-','--',':','-.']):
    linecycler = cycle(lines)
 
 # Show plots from sim_res, just that
-def show(diagrams=diagrams):
-   """Show diagrams chosen by newplot()"""
+def show(diagrams=diagrams, result=None):
+   """Show diagrams chosen by newplot(), from the last simulation or from a given SimuResult"""
    # Plot pen
    linetype = next(linecycler)    
    # Plot diagrams 
-   for command in diagrams: eval(command)
+   if result is None:
+      for command in diagrams: eval(command)
+   else:
+      for command in diagrams: eval(command, globals(), {'linetype': linetype, 'sim_res': result, 't': result.time})
 
-# Simulation
-def simu(simulationTimeLocal=simulationTime, mode='Initial', options=opts_std, \
+# Result of a simulation
+class SimuResult:
+   """ Result of a simulation with time series of the recorded variables, parameters and final state """
+   
+   def __init__(self, data, start_time, final_time, parValue={}, stateValue={}, info={}):
+      self.data = data
+      self.time = data['time']
+      self.start_time = start_time
+      self.final_time = final_time
+      self.parValue = dict(parValue)
+      self.stateValue = dict(stateValue)
+      self.info = dict(info)
+   
+   def __getitem__(self, name):
+      return self.data[name]
+   
+   def __contains__(self, name):
+      return name in self.keys()
+   
+   def keys(self):
+      if hasattr(self.data, 'dtype'): return list(self.data.dtype.names)
+      return list(self.data.keys())
+   
+   def final(self, name):
+      """ Return the value of the variable at the end of the simulation """
+      return self.data[name][-1]
+
+# Profiler of simu() with wall time and number of calls for each phase of a simulation, opt-in by profiler_setup().
+# The profile of a run is in info['profile'] of the SimuResult and the profiles of all runs are also aggregated.
+simuProfiler = {'enabled': False, 'runs': 0, 'phases': {}, 'last': None}
+
+def profiler_setup(enabled=True):
+   """ Enable or disable the profiler of simu() and clear the aggregated profile """
+   simuProfiler['enabled'] = enabled
+   profiler_clear()
+
+def profiler_clear():
+   """ Clear the aggregated profile of simu() """
+   simuProfiler['runs'] = 0
+   simuProfiler['phases'] = {}
+   simuProfiler['last'] = None
+
+def profile_add(profile, phase, seconds, calls=1):
+   """ Add wall time and calls of a phase to the profile, nothing done if profile is None """
+   if profile is None: return
+   entry = profile.setdefault(phase, {'time': 0.0, 'calls': 0})
+   entry['time'] = entry['time'] + seconds
+   entry['calls'] = entry['calls'] + calls
+
+def profiler_record(profile):
+   """ Add the profile of a run to the aggregated profile """
+   if profile is None: return
+   simuProfiler['runs'] = simuProfiler['runs'] + 1
+   simuProfiler['last'] = profile
+   for phase, entry in profile.items(): profile_add(simuProfiler['phases'], phase, entry['time'], entry['calls'])
+
+def profiler_report(profile=None):
+   """ Print the profile of the last run, or the profile given, together with the aggregate over all runs """
+   if profile is None: profile = simuProfiler['last']
+   if profile is None:
+      print('No profile - enable the profiler by profiler_setup() before simu()')
+      return
+   runs = max(simuProfiler['runs'], 1)
+   print('Phase'.ljust(34), 'time [ms]'.rjust(10), 'calls'.rjust(8), '   mean of', simuProfiler['runs'], 'runs [ms]')
+   for phase, entry in profile.items():
+      total = simuProfiler['phases'].get(phase, {'time': 0.0, 'calls': 0})
+      print(phase.ljust(34), ('%.3f' % (1000*entry['time'])).rjust(10), str(entry['calls']).rjust(8), 
+            ('%.3f' % (1000*total['time']/runs)).rjust(14))
+
+# Cache of simulation results on disk - content addressed by FMU and simulation set up and with least recently
+# used entries evicted when the size limit is reached. Not used until result_cache_setup() is called.
+# All variables recorded are cached, and on a hit the model is initialized in the final state of the simulation
+# so that sim_res, disp() and describe() are as after a simulation.
+resultCache = {'directory': None, 'size_limit': 500e6, 'hits': 0, 'misses': 0}
+fmu_hashes = {}
+
+def result_cache_setup(directory='fmu_explore_cache', size_limit=500e6):
+   """ Use cache of simulation results in directory with size_limit in bytes, and directory=None turns it off."""
+   resultCache['directory'] = directory
+   resultCache['size_limit'] = size_limit
+   if directory is not None: os.makedirs(directory, exist_ok=True)
+
+def result_cache_clear():
+   """ Remove all entries of the cache of simulation results """
+   if resultCache['directory'] is not None:
+      for file in os.listdir(resultCache['directory']):
+         if file.endswith('.npy'): os.remove(os.path.join(resultCache['directory'], file))
+
+def fmu_hash(fmu_model=fmu_model):
+   """ Return hash of the content of the FMU file, computed again only if the file has changed """
+   stat = os.stat(fmu_model)
+   key = (os.path.abspath(fmu_model), stat.st_mtime, stat.st_size)
+   if key not in fmu_hashes:
+      with open(fmu_model, 'rb') as file: fmu_hashes[key] = hashlib.sha256(file.read()).hexdigest()
+   return fmu_hashes[key]
+
+def result_cache_key(fmu_model, start_values, start_time, final_time, options):
+   """ Return key of the simulation from FMU content, resolved start values, time span, solver options
+       and the filter of the variables recorded """
+   def normalize(value):
+      if isinstance(value, (bool, np.bool_)): return bool(value)
+      if isinstance(value, (int, float, np.integer, np.floating)): return float(value)
+      return str(value)
+   setup = {'fmu': fmu_hash(fmu_model), 'pyfmi': version('pyfmi'),
+            'start_values': sorted((key, normalize(value)) for key, value in start_values.items()),
+            'start_time': float(start_time), 'final_time': float(final_time), 
+            'options': sorted((key, str(options[key])) for key in ['ncp', 'solver', 'CVode_options', 'filter'] 
+                              if key in options)}
+   return hashlib.sha256(json.dumps(setup).encode()).hexdigest()
+
+def result_cache_get(key):
+   """ Return cached simulation result for key or None, and a hit marks the entry as recently used """
+   if resultCache['directory'] is None: return None
+   path = os.path.join(resultCache['directory'], key + '.npy')
+   try:
+      res = np.load(path, allow_pickle=False)
+      os.utime(path)
+   except (FileNotFoundError, ValueError, OSError):
+      resultCache['misses'] = resultCache['misses'] + 1
+      return None
+   resultCache['hits'] = resultCache['hits'] + 1
+   return CachedResult(res)
+
+class CachedResult:
+   """ Simulation result taken from the cache and read by variable name as the result of model.simulate() """
+   
+   def __init__(self, data):
+      self.data = data
+   
+   def __getitem__(self, name):
+      return self.data[name]
+   
+   def keys(self):
+      return list(self.data.dtype.names)
+
+def result_cache_put(key, res):
+   """ Store all variables recorded in the simulation result for key and evict least recently used entries 
+       above the size limit """
+   if resultCache['directory'] is None: return
+   values = {'time': np.asarray(res['time'])}
+   for name in res.keys():
+      value = np.asarray(res[name])
+      if name not in values and value.shape == values['time'].shape: values[name] = value
+   data = np.empty(len(values['time']), dtype=[(name, value.dtype) for name, value in values.items()])
+   for name, value in values.items(): data[name] = value
+   path = os.path.join(resultCache['directory'], key + '.npy')
+   path_tmp = path + '.' + str(os.getpid()) + '.tmp'
+   with open(path_tmp, 'wb') as file: np.save(file, data, allow_pickle=False)
+   os.replace(path_tmp, path)
+   result_cache_evict()
+
+def result_cache_evict():
+   """ Remove least recently used entries until the cache is within the size limit """
+   entries = []
+   for file in os.listdir(resultCache['directory']):
+      if not file.endswith('.npy'): continue
+      try:
+         stat = os.stat(os.path.join(resultCache['directory'], file))
+         entries.append((stat.st_mtime, stat.st_size, file))
+      except FileNotFoundError:
+         pass
+   size = sum(entry[1] for entry in entries)
+   for mtime, size_entry, file in sorted(entries):
+      if size <= resultCache['size_limit']: break
+      try:
+         os.remove(os.path.join(resultCache['directory'], file))
+      except FileNotFoundError:
+         pass
+      size = size - size_entry
+
+def simulate_model(start_values, start_time, final_time, options, profile=None):
+   """ Simulate the model already given parameters and initial values, or take the result from the cache
+       of simulation results if set up. Return result and flag if it came from the cache. 
+       Wall time of the phases are added to profile if given, with the detailed timings of PyFMI if available. """
+   if resultCache['directory'] is not None:
+      start = time.perf_counter()
+      key = result_cache_key(fmu_model, start_values, start_time, final_time, options)
+      res = result_cache_get(key)
+      profile_add(profile, 'cache', time.perf_counter() - start)
+      if res is not None: return res, True
+   start = time.perf_counter()
+   res = model.simulate(start_time=start_time, final_time=final_time, options=options)
+   profile_add(profile, 'simulate', time.perf_counter() - start)
+   if profile is not None:
+      for phase, seconds in (getattr(res, 'detailed_timings', None) or {}).items():
+         if isinstance(seconds, (int, float)): profile_add(profile, 'simulate.' + phase, seconds)
+   if resultCache['directory'] is not None: 
+      start = time.perf_counter()
+      result_cache_put(key, res)
+      profile_add(profile, 'cache', time.perf_counter() - start)
+   return res, False
+
+def model_final_state(final_time, parValue=parValue, parLocation=parLocation, stateValue=stateValue):
+   """ Initialize the model reset before at final_time with parValue and the states in stateValue, as the 
+       model is after a simulation to final_time, when the result is taken from the cache """
+   plan = continuation_plan(parValue, parLocation, stateValueInitial)
+   for key in plan['par_other']: model.set(parLocation[key], parValue[key])
+   model.set_real(plan['valueReference'], np.array([parValue[k] for k in plan['par_real']] + 
+                                                   [stateValue[k] for k in plan['states']], dtype=np.float64))
+   model.initialize(start_time=final_time)
+
+# Store of simulation results on disk - each run is one array with time in the first row and then one contiguous
+# row per variable, saved as .npy and opened memory-mapped so that only the variables read are loaded. 
+# Metadata of each run is kept in a .json file alongside and summarized in index.jsonl of the store.
+resultStore = {'directory': None}
+
+def result_store_setup(directory='fmu_explore_results'):
+   """ Save every simulation by simu() in the store in directory, and directory=None turns it off."""
+   resultStore['directory'] = directory
+   if directory is not None: os.makedirs(os.path.join(directory, 'runs'), exist_ok=True)
+
+def result_columns(result):
+   """ Return names and array with time in the first row and one row per variable of the simulation result """
+   if hasattr(result, 'dtype'): 
+      names = list(result.dtype.names)
+   else:
+      names = list(result.keys())
+   time = np.asarray(result['time'], dtype=np.float64)
+   names = [name for name in names if name != 'time']
+   names = [name for name in names if np.shape(result[name]) == time.shape]
+   data = np.empty((1 + len(names), len(time)), dtype=np.float64)
+   data[0] = time
+   for k, name in enumerate(names): data[1+k] = result[name]
+   return ['time'] + names, data
+
+def result_save(result=None, directory=None, run_id=None, parValue=parValue, info={}):
+   """ Save simulation result, by default the last simulation, in the store and return run_id """
+   if directory is None: directory = resultStore['directory'] or 'fmu_explore_results'
+   os.makedirs(os.path.join(directory, 'runs'), exist_ok=True)
+   if result is None: result = sim_res
+   if isinstance(result, SimuResult):
+      parValue = result.parValue
+      info = dict(result.info, **info)
+      result = result.data
+   if run_id is None: run_id = uuid.uuid4().hex
+   names, data = result_columns(result)
+   path = os.path.join(directory, 'runs', run_id)
+   with open(path + '.npy.tmp', 'wb') as file: np.save(file, data, allow_pickle=False)
+   os.replace(path + '.npy.tmp', path + '.npy')
+   metadata = {'run_id': run_id, 'names': names, 'n': data.shape[1], 
+               'start_time': float(data[0,0]), 'final_time': float(data[0,-1]),
+               'parValue': {key: parValue[key] for key in parValue.keys()},
+               'guid': model.get_guid(), 'BPL_version': BPL_version, 'info': info}
+   with open(path + '.json', 'w') as file: json.dump(metadata, file, default=float)
+   index = {key: metadata[key] for key in ['run_id', 'n', 'start_time', 'final_time', 'parValue', 'guid']}
+   with open(os.path.join(directory, 'index.jsonl'), 'a') as file: file.write(json.dumps(index, default=float) + '\n')
+   return run_id
+
+class StoredResult:
+   """ Simulation result in the store that is opened memory-mapped when a variable is first read """
+   
+   def __init__(self, directory, run_id, index={}):
+      self.directory = directory
+      self.run_id = run_id
+      self.index = dict(index)
+      self._metadata = None
+      self._data = None
+   
+   @property
+   def metadata(self):
+      if self._metadata is None:
+         with open(os.path.join(self.directory, 'runs', self.run_id + '.json')) as file: 
+            self._metadata = json.load(file)
+      return self._metadata
+   
+   @property
+   def parValue(self):
+      return self.index['parValue'] if 'parValue' in self.index else self.metadata['parValue']
+   
+   @property
+   def data(self):
+      if self._data is None:
+         self._data = np.load(os.path.join(self.directory, 'runs', self.run_id + '.npy'), mmap_mode='r')
+      return self._data
+   
+   @property
+   def time(self):
+      return self['time']
+   
+   def __getitem__(self, name):
+      return self.data[self.metadata['names'].index(name)]
+   
+   def __contains__(self, name):
+      return name in self.metadata['names']
+   
+   def keys(self):
+      return list(self.metadata['names'])
+   
+   def final(self, name):
+      """ Return the value of the variable at the end of the simulation """
+      return self[name][-1]
+
+class ResultArchive:
+   """ Runs in the store listed from index.jsonl and opened first when a run is read """
+   
+   def __init__(self, directory):
+      self.directory = directory
+      self.index = {}
+      with open(os.path.join(directory, 'index.jsonl')) as file:
+         for line in file:
+            if line.strip() == '': continue
+            entry = json.loads(line)
+            self.index[entry['run_id']] = entry
+      self.run_ids = list(self.index.keys())
+   
+   def __len__(self):
+      return len(self.run_ids)
+   
+   def __iter__(self):
+      return iter(self.run_ids)
+   
+   def __getitem__(self, run):
+      run_id = self.run_ids[run] if isinstance(run, (int, np.integer)) else run
+      return StoredResult(self.directory, run_id, self.index[run_id])
+   
+   def keys(self):
+      return list(self.run_ids)
+   
+   def select(self, **parValue):
+      """ Return run_id of the runs with the given parameter values, eg select(mu_feed=0.1) """
+      return [run_id for run_id in self.run_ids 
+              if all(self.index[run_id]['parValue'].get(key) == value for key, value in parValue.items())]
+
+def result_open(directory='fmu_explore_results', run_id=None):
+   """ Open the store in directory as a ResultArchive, or one run as StoredResult if run_id is given """
+   if run_id is None: return ResultArchive(directory)
+   return StoredResult(directory, run_id)
+
+# Binding of parValue and the states to value references of the FMU - compiled once for each set of names so that
+# parameters are set in one call of set_real() and the states read in one call of get_real()
+parameter_bindings = {}
+
+def parameter_binding(parValue=parValue, parLocation=parLocation, stateValue=stateValue):
+   """ Return binding with the Real parameters and their value references, parameters not Real that are set 
+       one by one, and the states and their value references. """
+   key = (model.get_guid(), tuple((k, parLocation[k]) for k in parValue.keys()), tuple(stateValue.keys()))
+   if key not in parameter_bindings:
+      par_real = [k for k in parValue.keys() if model.get_variable_data_type(parLocation[k]) == FMI2_REAL]
+      par_other = [k for k in parValue.keys() if k not in par_real]
+      parameter_bindings[key] = {'par_real': par_real, 'par_other': par_other, 'states': list(stateValue.keys()),
+         'par_valueReference': np.array([model.get_variable_valueref(parLocation[k]) for k in par_real], dtype=np.uint32),
+         'state_valueReference': np.array([model.get_variable_valueref(k) for k in stateValue.keys()], dtype=np.uint32)}
+   return parameter_bindings[key]
+
+def parameter_binding_set(binding, parValue=parValue, parLocation=parLocation):
+   """ Set the parameters of the binding in the model """
+   for key in binding['par_other']: model.set(parLocation[key], parValue[key])
+   model.set_real(binding['par_valueReference'], np.array([parValue[k] for k in binding['par_real']], dtype=np.float64))
+
+def parameter_binding_get_states(binding, stateValue=stateValue):
+   """ Read the states of the binding from the model into stateValue """
+   values = model.get_real(binding['state_valueReference'])
+   for key, value in zip(binding['states'], values): stateValue[key] = value
+
+# Continuation of simulation - parameters and start values of the states given to the FMU in one call of set_real()
+continuation_plans = {}
+
+def continuation_plan(parValue=parValue, parLocation=parLocation, stateValueInitial=stateValueInitial):
+   """ Return plan for simu('cont') with the parameters kept, those not Real, the states and the value references
+       of the Real parameters followed by the start values of the states. Computed once for each set of names. """
+   key = (model.get_guid(), tuple((k, parLocation[k]) for k in parValue.keys()), tuple(stateValueInitial.items()))
+   if key not in continuation_plans:
+      state_starts = set(stateValueInitial.values())
+      par_keys = [k for k in parValue.keys() if parLocation[k] not in state_starts]
+      par_real = [k for k in par_keys if model.get_variable_data_type(parLocation[k]) == FMI2_REAL]
+      par_other = [k for k in par_keys if k not in par_real]
+      names = [parLocation[k] for k in par_real] + [stateValueInitial[k] for k in stateValueInitial.keys()]
+      continuation_plans[key] = {'par_real': par_real, 'par_other': par_other, 'states': list(stateValueInitial.keys()),
+         'valueReference': np.array([model.get_variable_valueref(name) for name in names], dtype=np.uint32)}
+   return continuation_plans[key]
+
+# Simulation without plots - headless
+def simu_run(simulationTimeLocal=simulationTime, mode='Initial', options=opts_std, \
          diagrams=diagrams,timeDiscreteStates=timeDiscreteStates, stateValue=stateValue, \
          parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):         
-   """Model loaded and given intial values and parameter before,
-      and plot window also setup before."""
+   """Model loaded and given intial values and parameter before. 
+      Simulate without plots and return a SimuResult."""
     
    # Global variables
    global model, prevFinalTime, sim_res, t
    
    # Simulation flag
    simulationDone = False
+   cacheHit = False
+   
+   # Profile of the phases if the profiler is enabled
+   profile = {} if simuProfiler['enabled'] else None
+   start = time.perf_counter()
    
    # Transfer of argument to global variable
    simulationTime = simulationTimeLocal 
-      
+   
    # Check parValue
    value_missing = 0
    for key in parValue.keys():
       if parValue[key] in [np.nan, None, '']:
          print('Value missing:', key)
          value_missing =+1
-   if value_missing>0: return
+   if value_missing>0: return None
          
    # Load model
+   start_phase = time.perf_counter()
    if model is None:
       model = load_fmu(fmu_model) 
+      profile_add(profile, 'load', time.perf_counter() - start_phase)
+   start_phase = time.perf_counter()
    model.reset()
+   profile_add(profile, 'reset', time.perf_counter() - start_phase)
       
    # Run simulation
    if mode in ['Initial', 'initial', 'init']:
       # Set parameters and intial state values:
-      for key in parValue.keys():
-         model.set(parLocation[key],parValue[key])   
+      start_phase = time.perf_counter()
+      parameter_binding_set(parameter_binding(parValue, parLocation, stateValue), parValue, parLocation)
+      profile_add(profile, 'start_values', time.perf_counter() - start_phase)
       # Simulate
-      sim_res = model.simulate(final_time=simulationTime, options=options)  
+      start_values = {parLocation[key]:parValue[key] for key in parValue.keys()}
+      sim_res, cacheHit = simulate_model(start_values, 0, simulationTime, options, profile)  
       simulationDone = True
    elif mode in ['Continued', 'continued', 'cont']:
 
@@ -638,32 +1067,19 @@ def simu(simulationTimeLocal=simulationTime, mode='Initial', options=opts_std, \
          print("Error: Simulation is first done with default mode = init'")      
       else:
          
-         # Set parameters and intial state values:
-         for key in parValue.keys():
-            model.set(parLocation[key],parValue[key])                
-
-         for key in stateValue.keys():
-            if not key[-1] == ']':
-               if key[-3:] == 'I.y': 
-                  model.set(key[:-10]+'I_start', stateValue[key]) 
-               elif key[-3:] == 'D.x': 
-                  model.set(key[:-10]+'D_start', stateValue[key]) 
-               else:
-                  model.set(key+'_start', stateValue[key])
-            elif key[-3] == '[':
-               model.set(key[:-3]+'_start'+key[-3:], stateValue[key]) 
-            elif key[-4] == '[':
-               model.set(key[:-4]+'_start'+key[-4:], stateValue[key]) 
-            elif key[-5] == '[':
-               model.set(key[:-5]+'_start'+key[-5:], stateValue[key]) 
-            else:
-               print('The state vecotr has more than 1000 states')
-               break
+         # Set parameters not replaced by start values of the states, and the states, in one call of set_real()
+         start_phase = time.perf_counter()
+         plan = continuation_plan(parValue, parLocation, stateValueInitial)
+         for key in plan['par_other']: model.set(parLocation[key], parValue[key])
+         model.set_real(plan['valueReference'], np.array([parValue[k] for k in plan['par_real']] + 
+                                                         [stateValue[k] for k in plan['states']], dtype=np.float64))
+         profile_add(profile, 'start_values', time.perf_counter() - start_phase)
 
          # Simulate
-         sim_res = model.simulate(start_time=prevFinalTime,
-                                 final_time=prevFinalTime + simulationTime,
-                                 options=options) 
+         start_values = {parLocation[key]:parValue[key] for key in parValue.keys()}
+         start_values.update({'state '+key:stateValue[key] for key in stateValue.keys()})
+         sim_res, cacheHit = simulate_model(start_values, prevFinalTime, prevFinalTime + simulationTime, 
+                                            options, profile) 
          simulationDone = True             
    else:
       print("Simulation mode not correct")
@@ -672,19 +1088,51 @@ def simu(simulationTimeLocal=simulationTime, mode='Initial', options=opts_std, \
     
       # Extract data
       t = sim_res['time']
- 
-      # Plot diagrams
-      linetype = next(linecycler)    
-      for command in diagrams: eval(command)
             
-      # Store final state values stateValue:
-      for key in list(stateValue.keys()): stateValue[key] = model.get(key)[0]        
+      # Store final state values stateValue, and from the result if taken from the cache and then the model
+      # initialized in the final state:
+      start_phase = time.perf_counter()
+      if cacheHit:
+         for key in list(stateValue.keys()): stateValue[key] = sim_res[key][-1]
+         model_final_state(sim_res['time'][-1], parValue, parLocation, stateValue)
+      else:
+         parameter_binding_get_states(parameter_binding(parValue, parLocation, stateValue), stateValue)
+      profile_add(profile, 'stateValue', time.perf_counter() - start_phase)
 
       # Store time from where simulation will start next time
-      prevFinalTime = model.time
+      start_time = prevFinalTime if mode in ['Continued', 'continued', 'cont'] else 0
+      prevFinalTime = sim_res['time'][-1] if cacheHit else model.time
+      
+      start_phase = time.perf_counter()
+      result = SimuResult(sim_res, start_time, prevFinalTime, parValue, stateValue, 
+                          {} if profile is None else {'profile': profile})
+      if resultStore['directory'] is not None: result_save(result)
+      profile_add(profile, 'result', time.perf_counter() - start_phase)
+      profile_add(profile, 'total', time.perf_counter() - start)
+      profiler_record(profile)
+      return result
    
    else:
       print('Error: No simulation done')
+      return None
+
+# Simulation
+def simu(simulationTimeLocal=simulationTime, mode='Initial', options=opts_std, \
+         diagrams=diagrams,timeDiscreteStates=timeDiscreteStates, stateValue=stateValue, \
+         parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):         
+   """Model loaded and given intial values and parameter before,
+      and plot window also setup before."""
+   
+   result = simu_run(simulationTimeLocal, mode, options, diagrams, timeDiscreteStates, stateValue, 
+                     parValue, parLocation, fmu_model)
+   
+   # Plot diagrams
+   if (result is not None) and not headless: 
+      start = time.perf_counter()
+      show(diagrams)
+      if 'profile' in result.info:
+         profile_add(result.info['profile'], 'diagrams', time.perf_counter() - start)
+         profile_add(simuProfiler['phases'], 'diagrams', time.perf_counter() - start)
       
 # Describe model parts of the combined system
 def describe_parts(component_list=[]):
@@ -763,6 +1211,7 @@ def describe_general(name, decimals, parLocation=parLocation):
          
 # Plot process diagram
 def process_diagram(fmu_model=fmu_model, fmu_process_diagram=fmu_process_diagram):   
+   matplotlib_import()
    try:
        process_diagram = zipfile.ZipFile(fmu_model, 'r').open('documentation/processDiagram.png')
    except KeyError:
@@ -36,6 +36,30 @@
 # 2025-11-19 - FMU-explore 1.0.2 corrected again parLocation() with sheets as argument
 # 2026-03-25 - FMU-explore 1.0.3
 # 2026-04-09 - Updated for BPL 2.3.2
+# 2026-10-16 - Session for the FMU that is extracted and instantiated once and then reused by simu() through reset
+# 2026-10-16 - Catalogue of model variables built once per FMU and used by model_get() and describe() etc
+# 2026-10-16 - Parallel parameter sweep simu_sweep() over parValue using a pool of worker processes
+# 2026-10-16 - Monte Carlo simu_montecarlo() with streaming percentile bands using the P2-algorithm
+# 2026-10-16 - Headless simu_run() that returns SimuResult without plots and matplotlib imported only when needed
+# 2026-10-16 - Diagrams as declarative specifications by diagram() compiled once to vectorized expressions
+# 2026-10-16 - Cache of simulation results on disk, content addressed and with least recently used entries evicted
+# 2026-10-16 - Store of simulation results on disk in columns that are memory-mapped when opened
+# 2026-10-16 - Continuation simu('cont') with parameters and states given in one call of setReal() from a plan computed once
+# 2026-10-16 - Vectorized NumPy engine of the model for many parameter sets in lockstep validated against the FMU
+# 2026-10-16 - Surrogate of KPIs trained from FMU runs by surrogate_train() and used by predict()
+# 2026-10-16 - Optimization of the feed profile by optimize_feed() with constraints and candidates simulated in parallel
+# 2026-10-16 - Estimation of culture parameters by fit() against measured data with the Jacobian from parallel simulations
+# 2026-10-16 - Linearization along a simulation by linearize() with the sparsity of A from the FMU and eigenvalues for all points together
+# 2026-10-16 - Global sensitivity analysis by simu_sobol() with Sobol indices from Saltelli samples simulated in parallel
+# 2026-10-16 - FMU on Linux can be given by environment variable FMU_EXPLORE_FMU, used by the benchmark script
+# 2026-10-16 - Profiler of simu() with wall time and calls per phase enabled by profiler_setup() and shown by profiler_report()
+# 2026-10-16 - Typed simulation options SimuOptions with solver, tolerance and max step and statistics of the solver per run
+# 2026-10-16 - Adaptive output of simu() by option output='adaptive' with points dense at events and fast transients only
+# 2026-10-16 - Streaming simulation by simu_stream() that yields the result in chunks during the integration
+# 2026-10-16 - Real-time simulation by simu_realtime() paced by the wall clock with setpoints and readings over a local socket
+# 2026-10-16 - State estimation of biomass, glucose and ethanol by an unscented Kalman filter with estimator_update() and estimate()
+# 2026-10-16 - Model predictive control of the feed rate by mpc_step() and closed loop simulation by simu_mpc() with parallel rollouts
+# 2026-10-16 - Fleet of reactors by simu_fleet() in the pool of workers with the FMU extracted once and results streamed to the store
 #------------------------------------------------------------------------------------------------------------------
 
 #------------------------------------------------------------------------------------------------------------------
@@ -44,28 +68,66 @@
 
 # Setup framework
 import sys
+import os
+import shutil
+import atexit
+import multiprocessing
+import multiprocessing.util
+import concurrent.futures
 import platform
 import locale
+import time
 import numpy as np 
-import matplotlib.pyplot as plt 
-import matplotlib.image as img
 import zipfile
+import ast
+import json
+import hashlib
+import uuid
+import operator
+import ctypes
+import socket
 
 from fmpy import simulate_fmu
 from fmpy import read_model_description
 import fmpy as fmpy
 
+# The simulation loop simulate_me_stream() with statistics of the solver uses internal parts of FMPy that are
+# checked for the versions in fmpyLoopVersions, and for other versions simulate_fmu() is used without statistics
+fmpyLoopVersions = [(0, 3)]
+try:
+   from fmpy.simulation import apply_start_values
+   from fmpy.simulation import settable_in_instantiated, settable_in_initialization_mode
+   from fmpy.simulation import Recorder, Input, ForwardEuler
+   fmpyLoop = tuple(int(v) for v in fmpy.__version__.split('.')[:2]) in fmpyLoopVersions
+except (ImportError, ValueError):
+   fmpyLoop = False
+if not fmpyLoop: 
+   print('Warning: FMPy', fmpy.__version__, 'is not checked for statistics of the solver and simulate_fmu() is used')
+
 from itertools import cycle
+from itertools import product
 from importlib.metadata import version  
 
 # Set the environment - for Linux a JSON-file in the FMU is read
 if platform.system() == 'Linux': locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
 
+# Headless mode without plots and matplotlib not imported - set environment variable FMU_EXPLORE_HEADLESS=1 
+headless = os.environ.get('FMU_EXPLORE_HEADLESS', '') not in ['', '0']
+
+def matplotlib_import():
+   """ Import matplotlib, at start of the script or on demand when plots are asked for in headless mode """
+   global plt, img
+   import matplotlib.pyplot as plt 
+   import matplotlib.image as img
+
+if not headless: matplotlib_import()
+
 #------------------------------------------------------------------------------------------------------------------
 #  Setup application FMU
 #------------------------------------------------------------------------------------------------------------------
 
 # Provde the right FMU and load for different platforms in user dialogue:
+# On Linux another build of the FMU can be given by environment variable FMU_EXPLORE_FMU, eg for comparison
 if platform.system() == 'Windows':
    print('Windows - run FMU pre-compiled JModelica 2.14')
    fmu_model ='BPL_YEAST_AIR_Fedbatch_DOcontrol_windows_jm_cs.fmu'        
@@ -81,16 +143,80 @@ elif platform.system() == 'Linux':
          fmu_model ='BPL_YEAST_AIR_Fedbatch_DOcontrol_om_cs.fmu'    
          model_description = read_model_description(fmu_model) 
       if flag_type in ['ME','me']:         
-         fmu_model ='BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_me.fmu'    
+         fmu_model = os.environ.get('FMU_EXPLORE_FMU', 'BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_me.fmu')
          model_description = read_model_description(fmu_model) 
    else:    
       print('There is no FMU for this platform')
 
+# Options of the simulation as a dictionary with the names and types checked
+class SimuOptions(dict):
+   """ Options of the simulation, where None means the default of FMPy:
+       NCP                 - number of intervals of the output between start and stop time
+       solver              - 'CVode' with variable step BDF or 'Euler' with fixed step
+       relative_tolerance  - relative tolerance of CVode, default from the FMU or 1e-5
+       max_step            - largest step of CVode, default (stop time - start time)/50
+       max_num_steps       - largest number of steps of CVode between two communication points
+       step_size           - step of Euler, default 10**(round(log10(stop time - start time)) - 3)
+       record_events       - record also before and after events, default as the function simulating
+       statistics          - keep statistics of the solver, which needs the simulation loop of this script
+                             as also max_step, max_num_steps other than 500 and Euler, since simulate_fmu() 
+                             of FMPy takes one Euler step per output interval and is otherwise used
+       output              - 'uniform' with NCP intervals or 'adaptive' with points only where needed
+       output_tolerance    - largest error of linear interpolation between adaptive points relative to the range
+       output_refine       - intervals of the grid of the simulation per interval of NCP for adaptive output """
+   defaults = {'NCP': 500, 'solver': 'CVode', 'relative_tolerance': None, 'max_step': None, 'max_num_steps': 500, 
+               'step_size': None, 'record_events': None, 'statistics': False, 'output': 'uniform', 
+               'output_tolerance': 1e-3, 'output_refine': 4}
+   types = {'NCP': int, 'solver': str, 'relative_tolerance': float, 'max_step': float, 'max_num_steps': int, 
+            'step_size': float, 'record_events': bool, 'statistics': bool, 'output': str, 'output_tolerance': float, 'output_refine': int}
+   output_keys = ['NCP', 'output', 'output_tolerance', 'output_refine']
+   
+   def __init__(self, *args, **kwargs):
+      super().__init__(self.defaults)
+      self.update(*args, **kwargs)
+   
+   def __setitem__(self, key, value):
+      if key not in self.defaults:
+         raise KeyError(key + ' - not an option, use one of ' + ', '.join(self.defaults.keys()))
+      if value is not None:
+         if self.types[key] is float and isinstance(value, (int, np.integer)) and not isinstance(value, bool): 
+            value = float(value)
+         if not isinstance(value, self.types[key]) or (self.types[key] is int and isinstance(value, bool)):
+            raise TypeError(key + ' - should be ' + self.types[key].__name__)
+         if key == 'solver' and value not in ['CVode', 'Euler']:
+            raise ValueError('solver - should be CVode or Euler')
+         if key == 'output' and value not in ['uniform', 'adaptive']:
+            raise ValueError('output - should be uniform or adaptive')
+         if key not in ['solver', 'record_events', 'statistics', 'output'] and value <= 0:
+            raise ValueError(key + ' - should be positive')
+      elif key in ['NCP', 'solver', 'max_num_steps', 'statistics', 'output', 'output_tolerance', 'output_refine']:
+         raise ValueError(key + ' - should be given')
+      super().__setitem__(key, value)
+   
+   def update(self, *args, **kwargs):
+      for key, value in dict(*args, **kwargs).items(): self[key] = value
+   
+   def copy(self):
+      return SimuOptions(self)
+   
+   def solver(self):
+      """ Return the options of the solver """
+      return {key: self[key] for key in self.defaults.keys() if key not in self.output_keys}
+   
+   def output_interval(self, simulationTime):
+      """ Return the interval of the grid the simulation is recorded at """
+      if self['output'] == 'adaptive': return simulationTime/(self['NCP']*self['output_refine'])
+      return simulationTime/self['NCP']
+
+def solver_options(options):
+   """ Return the options of the solver from options that may also be a dictionary with only some of them """
+   return SimuOptions(options).solver()
+
 # Provide various opts-profiles
 if flag_type in ['CS', 'cs']:
-   opts_std = {'NCP': 500}
+   opts_std = SimuOptions(NCP=500)
 elif flag_type in ['ME', 'me']:
-   opts_std = {'NCP': 500}
+   opts_std = SimuOptions(NCP=500)
 else:    
    print('There is no FMU for this platform')
   
@@ -294,6 +420,7 @@ def newplot(title='Yeast fedbatch cultivation', plotType='TimeSeries'):
           
    # Reset pens
    setLines()
+   matplotlib_import()
 
    # Transfer of global axes to simu()
    global ax1, ax2, ax3, ax4
@@ -354,29 +481,29 @@ def newplot(title='Yeast fedbatch cultivation', plotType='TimeSeries'):
       ax62.set_ylabel('Q [W]')        
       ax62.set_xlabel('Time [h]')     
       
-      # List of commands to be executed by simu() after a simulation  
+      # List of diagram specifications to be plotted by simu() after a simulation  
       diagrams.clear()
-      diagrams.append("ax11.plot(sim_res['time'],sim_res['bioreactor.c[2]'],color='b',linestyle=linetype)")
-      diagrams.append("ax21.plot(sim_res['time'],sim_res['bioreactor.c[3]'],color='b',linestyle=linetype)")
-      diagrams.append("ax31.plot(sim_res['time'],sim_res['bioreactor.c[1]'],color='b',linestyle=linetype)")
-      diagrams.append("ax41.plot(sim_res['time'],sim_res['DOsensor.out'],color='b',linestyle=linetype)")
-      diagrams.append("ax41.plot(sim_res['time'],sim_res['DO_setpoint.out'],color='y',linestyle='--')")
-      diagrams.append("ax51.step(sim_res['time'],sim_res['bioreactor.N'],color='c',linestyle=linetype)")
-      diagrams.append("ax51.set_ylim([0,1700])")
-      diagrams.append("ax61.plot(sim_res['time'],sim_res['bioreactor.inlet[1].F'],color='c',linestyle=linetype)")
-      diagrams.append("ax71.plot(sim_res['time'],sim_res['bioreactor.V'],color='b',linestyle=linetype)")
-      diagrams.append("ax71.plot(sim_res['time'],sim_res['bioreactor.V_tot'],color='y', linestyle='--')")
-      diagrams.append("ax71.set_ylim([0, 9.0])")
-
-      diagrams.append("ax12.plot(sim_res['time'],sim_res['bioreactor.culture.qGm'], color='r', linestyle=linetype)")
-      diagrams.append("ax12.plot(sim_res['time'],sim_res['bioreactor.culture.qGr'], color='b', linestyle=linetype)")  
-      diagrams.append("ax22.plot(sim_res['time'],-sim_res['bioreactor.culture.qEm'], color='r', linestyle=linetype)")
-      diagrams.append("ax22.plot(sim_res['time'],sim_res['bioreactor.culture.qEr'], color='b', linestyle=linetype)")
-      diagrams.append("ax32.plot(sim_res['time'],sim_res['bioreactor.culture.q[1]'],color='b',linestyle=linetype)")
+      diagrams.append(diagram('ax11', 'bioreactor.c[2]', color='b'))
+      diagrams.append(diagram('ax21', 'bioreactor.c[3]', color='b'))
+      diagrams.append(diagram('ax31', 'bioreactor.c[1]', color='b'))
+      diagrams.append(diagram('ax41', 'DOsensor.out', color='b'))
+      diagrams.append(diagram('ax41', 'DO_setpoint.out', color='y', linestyle='--'))
+      diagrams.append(diagram('ax51', 'bioreactor.N', kind='step', color='c'))
+      diagrams.append(diagram('ax51', kind='ylim', limits=[0, 1700]))
+      diagrams.append(diagram('ax61', 'bioreactor.inlet[1].F', color='c'))
+      diagrams.append(diagram('ax71', 'bioreactor.V', color='b'))
+      diagrams.append(diagram('ax71', 'bioreactor.V_tot', color='y', linestyle='--'))
+      diagrams.append(diagram('ax71', kind='ylim', limits=[0, 9.0]))
+
+      diagrams.append(diagram('ax12', 'bioreactor.culture.qGm', color='r'))
+      diagrams.append(diagram('ax12', 'bioreactor.culture.qGr', color='b'))
+      diagrams.append(diagram('ax22', '-bioreactor.culture.qEm', color='r'))
+      diagrams.append(diagram('ax22', 'bioreactor.culture.qEr', color='b'))
+      diagrams.append(diagram('ax32', 'bioreactor.culture.q[1]', color='b'))
       
-      diagrams.append("ax42.plot(sim_res['time'],sim_res['bioreactor.culture.qO2'],color='b',linestyle=linetype)")
-      diagrams.append("ax52.plot(sim_res['time'],sim_res['bioreactor.m[1]']*sim_res['bioreactor.culture.qO2'],color='b',linestyle=linetype)")
-      diagrams.append("ax62.plot(sim_res['time'],sim_res['bioreactor.m[1]']*sim_res['bioreactor.culture.Qspec'],color='b',linestyle=linetype)")
+      diagrams.append(diagram('ax42', 'bioreactor.culture.qO2', color='b'))
+      diagrams.append(diagram('ax52', 'bioreactor.m[1]*bioreactor.culture.qO2', color='b'))
+      diagrams.append(diagram('ax62', 'bioreactor.m[1]*bioreactor.culture.Qspec', color='b'))
 
    elif plotType in ['Focus DO-control']:
    
@@ -400,14 +527,14 @@ def newplot(title='Yeast fedbatch cultivation', plotType='TimeSeries'):
       ax4.set_ylabel('F [L/h]') 
       ax4.set_xlabel('Time [h]') 
 
-      # List of commands to be executed by simu() after a simulation  
+      # List of diagram specifications to be plotted by simu() after a simulation  
       diagrams.clear()
-      diagrams.append("ax1.plot(sim_res['time'],sim_res['DOsensor.out'],color='b',linestyle=linetype)")
-      diagrams.append("ax1.plot(sim_res['time'],sim_res['DO_setpoint.out'],color='r',linestyle='--')")
-      diagrams.append("ax2.step(sim_res['time'],sim_res['bioreactor.N'],color='b',linestyle=linetype)")
-      diagrams.append("ax2.set_ylim([0,2500])")
-      diagrams.append("ax3.plot(sim_res['time'],sim_res['bioreactor.m[1]']*sim_res['bioreactor.culture.qO2'],color='b',linestyle=linetype)")
-      diagrams.append("ax4.plot(sim_res['time'],sim_res['bioreactor.inlet[1].F'],color='b',linestyle=linetype)")
+      diagrams.append(diagram('ax1', 'DOsensor.out', color='b'))
+      diagrams.append(diagram('ax1', 'DO_setpoint.out', color='r', linestyle='--'))
+      diagrams.append(diagram('ax2', 'bioreactor.N', kind='step', color='b'))
+      diagrams.append(diagram('ax2', kind='ylim', limits=[0, 2500]))
+      diagrams.append(diagram('ax3', 'bioreactor.m[1]*bioreactor.culture.qO2', color='b'))
+      diagrams.append(diagram('ax4', 'bioreactor.inlet[1].F', color='b'))
            
    else:
       print("Plot window type not correct")
@@ -536,47 +663,88 @@ def readParLocation(file, sheets, parLocation=parLocation):
          parLocation_local[table['Par'][k]] = table['Location'][k]
    parLocation.update(parLocation_local)
 
+# Catalogue of model variables built once per FMU and used for look up instead of scan of modelVariables
+model_catalogues = {}
+
+def model_catalogue(model_description=model_description):
+   """ Return catalogue of the model variables with exact-name dictionary, value-reference arrays,
+       buckets for causality and variability and an index of the component prefixes of the names. """
+   key = model_description.guid
+   if key not in model_catalogues:
+      variables = model_description.modelVariables
+      catalogue = {}
+      catalogue['model_description'] = model_description
+      catalogue['variables'] = {v.name: v for v in variables}
+      catalogue['names'] = [v.name for v in variables]
+      catalogue['index'] = {v.name: k for k, v in enumerate(variables)}
+      catalogue['valueReference'] = np.array([v.valueReference for v in variables], dtype=np.uint32)
+      catalogue['type'] = np.array([v.type for v in variables])
+      catalogue['causality'] = {}
+      catalogue['variability'] = {}
+      catalogue['prefix'] = {}
+      for v in variables:
+         catalogue['causality'].setdefault(v.causality, []).append(v.name)
+         catalogue['variability'].setdefault(v.variability, []).append(v.name)
+         if v.name[0] == '_' or v.name[:4] == 'der(': continue
+         parts = v.name.split('.')
+         for k in range(1, len(parts)):
+            catalogue['prefix'].setdefault('.'.join(parts[:k]), []).append(v.name)
+      model_catalogues[key] = catalogue
+   return model_catalogues[key]
+
+def model_variables(parLoc, substring=False, model_description=model_description):
+   """ Return list of model variables with the name parLoc, or containing parLoc if substring=True."""
+   catalogue = model_catalogue(model_description)
+   if substring:
+      return [catalogue['variables'][name] for name in catalogue['names'] if parLoc in name]
+   elif parLoc in catalogue['variables']:
+      return [catalogue['variables'][parLoc]]
+   else:
+      return []
+
+def model_component_variables(component, model_description=model_description):
+   """ Return list of names of the variables that belong to the component, e.g. 'bioreactor.culture'."""
+   return model_catalogue(model_description)['prefix'].get(component, [])
+
 # Define fuctions similar to pyfmi model.get(), model.get_variable_descirption(), model.get_variable_unit()
 def model_get(parLoc, model_description=model_description):
    """ Function corresponds to pyfmi model.get() but returns just a value and not a list"""
-   par_var = model_description.modelVariables
-   for k in range(len(par_var)):
-      if par_var[k].name == parLoc:
-         try:
-            if (par_var[k].causality in ['local']) & (par_var[k].variability in ['constant']):
-               value = float(par_var[k].start)                 
-            elif par_var[k].causality in ['parameter']: 
-               value = float(par_var[k].start)  
-            elif par_var[k].causality in ['calculatedParameter']: 
-               value = float(sim_res[par_var[k].name][0]) 
-            elif par_var[k].name in start_values.keys():
-               value = start_values[par_var[k].name]   
-            elif par_var[k].variability == 'continuous':
-               try:
-                  timeSeries = sim_res[par_var[k].name]
-                  value = float(timeSeries[-1])
-               except (AttributeError, ValueError):
-                  value = None
-                  print('Variable not logged')
-            else:
+   value = None
+   variable = model_catalogue(model_description)['variables'].get(parLoc)
+   if variable is not None:
+      try:
+         if (variable.causality in ['local']) & (variable.variability in ['constant']):
+            value = float(variable.start)                 
+         elif variable.causality in ['parameter']: 
+            value = float(variable.start)  
+         elif variable.causality in ['calculatedParameter']: 
+            value = float(sim_res[variable.name][0]) 
+         elif variable.name in start_values.keys():
+            value = start_values[variable.name]   
+         elif variable.variability == 'continuous':
+            try:
+               timeSeries = sim_res[variable.name]
+               value = float(timeSeries[-1])
+            except (AttributeError, ValueError):
                value = None
-         except NameError:
-            print('Error: Information available after first simution')
-            value = None          
+               print('Variable not logged')
+         else:
+            value = None
+      except NameError:
+         print('Error: Information available after first simution')
+         value = None          
    return value
 
-def model_get_variable_description(parLoc, model_description=model_description):
-   """ Function corresponds to pyfmi model.get_variable_description() but returns just a value and not a list"""
-   par_var = model_description.modelVariables
-#   value = [x[1] for x in [(par_var[k].name, par_var[k].description) for k in range(len(par_var))] if parLoc in x[0]]
-   value = [x.description for x in par_var if parLoc in x.name]   
+def model_get_variable_description(parLoc, substring=False, model_description=model_description):
+   """ Function corresponds to pyfmi model.get_variable_description() but returns just a value and not a list.
+       With substring=True the first variable that contains parLoc in the name is used."""
+   value = [x.description for x in model_variables(parLoc, substring, model_description)]
    return value[0]
    
-def model_get_variable_unit(parLoc, model_description=model_description):
-   """ Function corresponds to pyfmi model.get_variable_unit() but returns just a value and not a list"""
-   par_var = model_description.modelVariables
-#   value = [x[1] for x in [(par_var[k].name, par_var[k].unit) for k in range(len(par_var))] if parLoc in x[0]]
-   value = [x.unit for x in par_var if parLoc in x.name]
+def model_get_variable_unit(parLoc, substring=False, model_description=model_description):
+   """ Function corresponds to pyfmi model.get_variable_unit() but returns just a value and not a list.
+       With substring=True the first variable that contains parLoc in the name is used."""
+   value = [x.unit for x in model_variables(parLoc, substring, model_description)]
    return value[0]
       
 # Define function disp() for display of initial values and parameters
@@ -587,15 +755,16 @@ def disp(name='', decimals=3, mode='short', parValue=parValue, parLocation=parLo
    def dict_reverser(d):
       seen = set()
       return {v: k for k, v in d.items() if v not in seen or seen.add(v)}
+   parLocationReversed = dict_reverser(parLocation)
    
    if mode in ['short']:
       k = 0
       for Location in [parLocation[k] for k in parValue.keys()]:
          if name in Location:
             if type(model_get(Location)) != np.bool_:
-               print(dict_reverser(parLocation)[Location] , ':', np.round(model_get(Location),decimals))
+               print(parLocationReversed[Location] , ':', np.round(model_get(Location),decimals))
             else:
-               print(dict_reverser(parLocation)[Location] , ':', model_get(Location))               
+               print(parLocationReversed[Location] , ':', model_get(Location))               
          else:
             k = k+1
       if k == len(parLocation):
@@ -611,14 +780,14 @@ def disp(name='', decimals=3, mode='short', parValue=parValue, parLocation=parLo
       for Location in [parLocation[k] for k in parValue.keys()]:
          if name in Location:
             if type(model_get(Location)) != np.bool_:       
-               print(Location,':', dict_reverser(parLocation)[Location] , ':', np.round(model_get(Location),decimals))
+               print(Location,':', parLocationReversed[Location] , ':', np.round(model_get(Location),decimals))
          else:
             k = k+1
       if k == len(parLocation):
          for parName in parValue.keys():
             if name in parName:
                if type(model_get(Location)) != np.bool_:
-                  print(parLocation[parName], ':', dict_reverser(parLocation)[Location], ':', parName,':', 
+                  print(parLocation[parName], ':', parLocationReversed[Location], ':', parName,':', 
                      np.round(model_get(parLocation[parName]),decimals))
 
 # Line types
@@ -627,20 +796,735 @@ def setLines(lines=['-','--',':','-.']):
    global linecycler
    linecycler = cycle(lines)
 
+# Specification of a diagram
+def diagram(axis, y=None, kind='plot', x='time', **style):
+   """ Return specification of a diagram for the list diagrams used by simu() and show().
+       axis  - name of the global axes, e.g. 'ax11'
+       y, x  - variable names or arithmetic expressions of them, e.g. 'bioreactor.m[1]*bioreactor.culture.qO2'
+       kind  - 'plot', 'step', 'ylim' or 'xlim' and for the last two give limits=[low, high]
+       style - keywords to matplotlib, e.g. color='b', and linestyle is by default the pen of simu()"""
+   return {'axis': axis, 'kind': kind, 'x': x, 'y': y, 'style': style}
+
+# Compiled diagram specifications and expressions - each compiled once
+diagrams_compiled = {}
+
+diagram_operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                     ast.Pow: operator.pow, ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+def diagram_expression(expression, model_description=model_description):
+   """ Compile expression of variable names to a function of the simulation result evaluated with NumPy.
+       Return the function and the set of variables needed. """
+   variables = model_catalogue(model_description)['variables']
+   names = set()
+   
+   def compile_node(node):
+      text = ast.unparse(node)
+      if text == 'time' or text in variables:
+         names.add(text)
+         return lambda data: data[text]
+      elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+         return lambda data: node.value
+      elif isinstance(node, ast.BinOp) and type(node.op) in diagram_operators:
+         left = compile_node(node.left); right = compile_node(node.right); op = diagram_operators[type(node.op)]
+         return lambda data: op(left(data), right(data))
+      elif isinstance(node, ast.UnaryOp) and type(node.op) in diagram_operators:
+         operand = compile_node(node.operand); op = diagram_operators[type(node.op)]
+         return lambda data: op(operand(data))
+      else:
+         raise ValueError('Diagram expression ' + expression + ' - ' + text + ' not a variable of the model')
+   
+   function = compile_node(ast.parse(expression, mode='eval').body)
+   names.discard('time')
+   return function, names
+
+def diagram_compile(spec):
+   """ Return compiled diagram specification, compiled only the first time """
+   key = (spec['axis'], spec['kind'], spec['x'], spec['y'], repr(sorted(spec['style'].items())))
+   if key not in diagrams_compiled:
+      compiled = {'axis': spec['axis'], 'kind': spec['kind'], 'style': dict(spec['style']), 'variables': set()}
+      if spec['kind'] in ['plot', 'step']:
+         compiled['x'], names_x = diagram_expression(spec['x'])
+         compiled['y'], names_y = diagram_expression(spec['y'])
+         compiled['variables'] = names_x | names_y
+      diagrams_compiled[key] = compiled
+   return diagrams_compiled[key]
+
+def diagrams_variables(diagrams, model_description=model_description):
+   """ Return list of variables to be recorded for the diagrams. 
+       Diagrams given as command strings are searched for variable names. """
+   output = set()
+   for spec in diagrams:
+      if isinstance(spec, dict):
+         output.update(diagram_compile(spec)['variables'])
+      else:
+         output.update([name for name in model_catalogue(model_description)['causality'].get('local', []) 
+                        if name in spec])
+   return list(output)
+
+def diagrams_render(diagrams, data, linetype):
+   """ Plot the diagrams for data, a simulation result, with the pen linetype """
+   for spec in diagrams:
+      if not isinstance(spec, dict):
+         eval(spec, globals(), {'linetype': linetype, 'sim_res': data})
+         continue
+      compiled = diagram_compile(spec)
+      ax = globals()[compiled['axis']]
+      if compiled['kind'] == 'ylim':
+         ax.set_ylim(compiled['style']['limits'])
+      elif compiled['kind'] == 'xlim':
+         ax.set_xlim(compiled['style']['limits'])
+      else:
+         style = {'linestyle': linetype}
+         style.update(compiled['style'])
+         getattr(ax, compiled['kind'])(compiled['x'](data), compiled['y'](data), **style)
+
 # Show plots from sim_res, just that
-def show(diagrams=diagrams):
-   """Show diagrams chosen by newplot()"""
+def show(diagrams=diagrams, result=None):
+   """Show diagrams chosen by newplot(), from the last simulation or from a given SimuResult"""
    # Plot pen
    linetype = next(linecycler)    
    # Plot diagrams 
-   for command in diagrams: eval(command)
+   if result is None:
+      diagrams_render(diagrams, sim_res, linetype)
+   else:
+      diagrams_render(diagrams, result, linetype)
 
-# Define simulation
-def simu(simulationTime=simulationTime, mode='Initial', options=opts_std, diagrams=diagrams, fmu_model=fmu_model, \
-         stateValue=stateValue, stateValueInitial=stateValueInitial, stateValueInitialLoc=stateValueInitialLoc, \
-         timeDiscreteStates=timeDiscreteStates, \
+# Result of a simulation
+class SimuResult:
+   """ Result of a simulation with time series of the recorded variables, parameters and final state """
+   
+   def __init__(self, data, start_time, final_time, parValue={}, stateValue={}, info={}):
+      self.data = data
+      self.time = data['time']
+      self.start_time = start_time
+      self.final_time = final_time
+      self.parValue = dict(parValue)
+      self.stateValue = dict(stateValue)
+      self.info = dict(info)
+   
+   def __getitem__(self, name):
+      return self.data[name]
+   
+   def __contains__(self, name):
+      return name in self.keys()
+   
+   def keys(self):
+      return list(self.data.dtype.names)
+   
+   def final(self, name):
+      """ Return the value of the variable at the end of the simulation """
+      return self.data[name][-1]
+
+# Session with the FMU extracted, model description parsed and FMU instantiated once per process
+fmu_sessions = {}
+
+# FMU extracted once and shared by the sessions of the worker processes, so that the binary is loaded from one file
+fmu_shared = {}
+
+def fmu_shared_extract(fmu_model=fmu_model):
+   """ Return directory of the FMU extracted once by this process for sessions of worker processes, removed when 
+       this process ends. """
+   key = (os.getpid(), os.path.abspath(fmu_model))
+   if key not in fmu_shared: fmu_shared[key] = fmpy.extract(fmu_model)
+   return fmu_shared[key]
+
+def fmu_shared_remove():
+   """ Remove the FMUs extracted for sharing by this process """
+   for key in [key for key in fmu_shared.keys() if key[0] == os.getpid()]:
+      shutil.rmtree(fmu_shared.pop(key), ignore_errors=True)
+
+atexit.register(fmu_shared_remove)
+
+def fmu_session(fmu_model=fmu_model, unzipdir=None):
+   """ Return the session of the FMU with directory of the extracted FMU, parsed model description and
+       an instantiated FMU that is reused through reset() by simu() both for mode 'init' and 'cont'. 
+       The FMU is extracted for the session unless a shared unzipdir from fmu_shared_extract() is given. """
+   key = (os.getpid(), os.path.abspath(fmu_model))
+   if key not in fmu_sessions:
+      shared = unzipdir is not None
+      if not shared: unzipdir = fmpy.extract(fmu_model)
+      if os.path.abspath(fmu_model) == os.path.abspath(globals()['fmu_model']):
+         model_description_local = model_description
+      else:
+         model_description_local = read_model_description(unzipdir)
+      if model_description_local.modelExchange is None:
+         fmi_type = 'CoSimulation'
+      else:
+         fmi_type = 'ModelExchange'
+      fmu_instance = fmpy.instantiate_fmu(unzipdir, model_description_local, fmi_type=fmi_type)
+      fmu_sessions[key] = {'fmu_model': fmu_model, 'unzipdir': unzipdir, 'fmi_type': fmi_type, 
+                           'model_description': model_description_local, 'fmu_instance': fmu_instance, 'runs': 0,
+                           'shared': shared}
+   return fmu_sessions[key]
+
+def fmu_session_reset(session):
+   """ Bring the FMU instance of the session back to the instantiated state before a new simulation. """
+   if session['runs'] > 0: session['fmu_instance'].reset()
+   session['runs'] = session['runs'] + 1
+
+def fmu_session_close(fmu_model=fmu_model):
+   """ Free the FMU instance and remove the extracted FMU of the session, if any, in this process. """
+   session = fmu_sessions.pop((os.getpid(), os.path.abspath(fmu_model)), None)
+   if session is not None:
+      try:
+         session['fmu_instance'].freeInstance()
+      except Exception:
+         pass
+      if not session.get('shared'): shutil.rmtree(session['unzipdir'], ignore_errors=True)
+
+def fmu_session_close_all():
+   """ Close all sessions opened in this process. """
+   for key in [key for key in fmu_sessions.keys() if key[0] == os.getpid()]:
+      fmu_session_close(key[1])
+
+atexit.register(fmu_session_close_all)
+
+# Profiler of simu() with wall time and number of calls for each phase of a simulation, opt-in by profiler_setup().
+# The profile of a run is in info['profile'] of the SimuResult and the profiles of all runs are also aggregated.
+simuProfiler = {'enabled': False, 'runs': 0, 'phases': {}, 'last': None}
+
+def profiler_setup(enabled=True):
+   """ Enable or disable the profiler of simu() and clear the aggregated profile """
+   simuProfiler['enabled'] = enabled
+   profiler_clear()
+
+def profiler_clear():
+   """ Clear the aggregated profile of simu() """
+   simuProfiler['runs'] = 0
+   simuProfiler['phases'] = {}
+   simuProfiler['last'] = None
+
+def profile_add(profile, phase, seconds, calls=1):
+   """ Add wall time and calls of a phase to the profile, nothing done if profile is None """
+   if profile is None: return
+   entry = profile.setdefault(phase, {'time': 0.0, 'calls': 0})
+   entry['time'] = entry['time'] + seconds
+   entry['calls'] = entry['calls'] + calls
+
+def profiler_record(profile):
+   """ Add the profile of a run to the aggregated profile """
+   if profile is None: return
+   simuProfiler['runs'] = simuProfiler['runs'] + 1
+   simuProfiler['last'] = profile
+   for phase, entry in profile.items(): profile_add(simuProfiler['phases'], phase, entry['time'], entry['calls'])
+
+def profiler_report(profile=None):
+   """ Print the profile of the last run, or the profile given, together with the aggregate over all runs """
+   if profile is None: profile = simuProfiler['last']
+   if profile is None:
+      print('No profile - enable the profiler by profiler_setup() before simu()')
+      return
+   runs = max(simuProfiler['runs'], 1)
+   print('Phase'.ljust(34), 'time [ms]'.rjust(10), 'calls'.rjust(8), '   mean of', simuProfiler['runs'], 'runs [ms]')
+   for phase, entry in profile.items():
+      total = simuProfiler['phases'].get(phase, {'time': 0.0, 'calls': 0})
+      print(phase.ljust(34), ('%.3f' % (1000*entry['time'])).rjust(10), str(entry['calls']).rjust(8), 
+            ('%.3f' % (1000*total['time']/runs)).rjust(14))
+
+def profile_fmu(fmu, profile):
+   """ Wrap the calls of the FMU instance that the simulation spends time in to add them to the profile, 
+       and the end of initialization as a time stamp. Return function that removes the wrapping. """
+   if profile is None: return lambda: None
+   phases = {'getDerivatives': 'integration.derivatives', 'getEventIndicators': 'integration.event_indicators',
+             'completedIntegratorStep': 'integration.step_completed', 'getReal': 'recording'}
+   def timed(method, phase):
+      function = getattr(fmu, method)
+      def call(*args, **kwargs):
+         start = time.perf_counter()
+         try:
+            return function(*args, **kwargs)
+         finally:
+            profile_add(profile, phase, time.perf_counter() - start)
+      return call
+   def mark(function):
+      def call(*args, **kwargs):
+         result = function(*args, **kwargs)
+         profile['_initialized'] = {'time': time.perf_counter(), 'calls': 0}
+         return result
+      return call
+   for method, phase in phases.items(): setattr(fmu, method, timed(method, phase))
+   fmu.exitInitializationMode = mark(fmu.exitInitializationMode)
+   def restore():
+      for method in list(phases.keys()) + ['exitInitializationMode']: 
+         if method in vars(fmu): delattr(fmu, method)
+   return restore
+
+# Cache of simulation results on disk - content addressed by FMU and simulation set up and with least recently
+# used entries evicted when the size limit is reached. Not used until result_cache_setup() is called.
+resultCache = {'directory': None, 'size_limit': 500e6, 'hits': 0, 'misses': 0}
+fmu_hashes = {}
+
+def result_cache_setup(directory='fmu_explore_cache', size_limit=500e6):
+   """ Use cache of simulation results in directory with size_limit in bytes, and directory=None turns it off."""
+   resultCache['directory'] = directory
+   resultCache['size_limit'] = size_limit
+   if directory is not None: os.makedirs(directory, exist_ok=True)
+
+def result_cache_clear():
+   """ Remove all entries of the cache of simulation results """
+   if resultCache['directory'] is not None:
+      for file in os.listdir(resultCache['directory']):
+         if file.endswith('.npy'): os.remove(os.path.join(resultCache['directory'], file))
+
+def fmu_hash(fmu_model=fmu_model):
+   """ Return hash of the content of the FMU file, computed again only if the file has changed """
+   stat = os.stat(fmu_model)
+   key = (os.path.abspath(fmu_model), stat.st_mtime, stat.st_size)
+   if key not in fmu_hashes:
+      with open(fmu_model, 'rb') as file: fmu_hashes[key] = hashlib.sha256(file.read()).hexdigest()
+   return fmu_hashes[key]
+
+def result_cache_key(fmu_model, start_values, start_time, stop_time, output_interval, record_events, output, 
+                     solver=None):
+   """ Return key of the simulation from FMU content, resolved start values, time span, output interval
+       and the variables recorded """
+   def normalize(value):
+      if isinstance(value, (bool, np.bool_)): return bool(value)
+      if isinstance(value, (int, float, np.integer, np.floating)): return float(value)
+      return str(value)
+   setup = {'fmu': fmu_hash(fmu_model), 'fmpy': fmpy.__version__,
+            'start_values': sorted((key, normalize(value)) for key, value in start_values.items()),
+            'start_time': float(start_time), 'stop_time': float(stop_time), 
+            'output_interval': float(output_interval), 'record_events': bool(record_events), 
+            'output': sorted(output), 'solver': sorted((solver or {}).items())}
+   return hashlib.sha256(json.dumps(setup).encode()).hexdigest()
+
+def result_cache_get(key):
+   """ Return cached simulation result for key or None, and a hit marks the entry as recently used """
+   if resultCache['directory'] is None: return None
+   path = os.path.join(resultCache['directory'], key + '.npy')
+   try:
+      res = np.load(path, allow_pickle=False)
+      os.utime(path)
+   except (FileNotFoundError, ValueError, OSError):
+      resultCache['misses'] = resultCache['misses'] + 1
+      return None
+   resultCache['hits'] = resultCache['hits'] + 1
+   return res
+
+def result_cache_put(key, res):
+   """ Store simulation result for key and evict least recently used entries above the size limit """
+   if resultCache['directory'] is None: return
+   path = os.path.join(resultCache['directory'], key + '.npy')
+   path_tmp = path + '.' + str(os.getpid()) + '.tmp'
+   with open(path_tmp, 'wb') as file: np.save(file, np.asarray(res), allow_pickle=False)
+   os.replace(path_tmp, path)
+   result_cache_evict()
+
+def result_cache_evict():
+   """ Remove least recently used entries until the cache is within the size limit """
+   entries = []
+   for file in os.listdir(resultCache['directory']):
+      if not file.endswith('.npy'): continue
+      try:
+         stat = os.stat(os.path.join(resultCache['directory'], file))
+         entries.append((stat.st_mtime, stat.st_size, file))
+      except FileNotFoundError:
+         pass
+   size = sum(entry[1] for entry in entries)
+   for mtime, size_entry, file in sorted(entries):
+      if size <= resultCache['size_limit']: break
+      try:
+         os.remove(os.path.join(resultCache['directory'], file))
+      except FileNotFoundError:
+         pass
+      size = size - size_entry
+
+# Adaptive output keeps only the points of a result recorded at a fine grid that are needed for linear interpolation
+# between them within a tolerance relative to the range of each variable, by the Ramer-Douglas-Peucker algorithm.
+# Points before and after events, with the same time, and the first and last point are always kept.
+def output_adaptive(res, tolerance=1e-3):
+   """ Return the result res with the points needed for the tolerance of linear interpolation """
+   t = np.asarray(res['time'], dtype=float)
+   names = [name for name in res.dtype.names if name != 'time']
+   if len(t) < 3 or len(names) == 0: return res
+   y = np.column_stack([np.asarray(res[name], dtype=float) for name in names])
+   scale = np.ptp(y, axis=0)
+   y = y[:, scale > 0]/scale[scale > 0]
+   if y.shape[1] == 0: return res[[0, len(t)-1]]
+   keep = np.zeros(len(t), dtype=bool)
+   keep[[0, -1]] = True
+   events = np.flatnonzero(np.diff(t) == 0)
+   keep[events] = True
+   keep[events + 1] = True
+   anchors = np.flatnonzero(keep)
+   stack = [(a, b) for a, b in zip(anchors[:-1], anchors[1:]) if b - a > 1]
+   while stack:
+      a, b = stack.pop()
+      fraction = ((t[a+1:b] - t[a])/(t[b] - t[a]))[:, None]
+      error = np.max(np.abs(y[a+1:b] - y[a] - fraction*(y[b] - y[a])), axis=1)
+      k = int(np.argmax(error))
+      if error[k] > tolerance:
+         k = a + 1 + k
+         keep[k] = True
+         if k - a > 1: stack.append((a, k))
+         if b - k > 1: stack.append((k, b))
+   return res[keep]
+
+# Simulation of FMI 2.0 model exchange FMUs as simulate_fmu() of FMPy but with the options of the solver
+# and statistics of the solver kept. The counters of CVode are added up before each re-initialization at events.
+# The same loop simulate_me_stream() is used for the whole result and for chunks during the integration.
+solverStatistics = {'steps': 'CVodeGetNumSteps', 'rhs_evals': 'CVodeGetNumRhsEvals', 
+                    'rhs_evals_jacobian': 'CVodeGetNumLinRhsEvals', 'jacobian_evals': 'CVodeGetNumJacEvals',
+                    'error_test_fails': 'CVodeGetNumErrTestFails', 
+                    'convergence_fails': 'CVodeGetNumNonlinSolvConvFails', 'root_evals': 'CVodeGetNumGEvals'}
+
+def solver_statistics_add(solver, statistics):
+   """ Add the counters of the CVode solver to statistics """
+   try:
+      from fmpy.sundials.cvode import sundials_cvode
+   except ImportError:
+      return
+   for name, function in solverStatistics.items():
+      value = ctypes.c_long(0)
+      getter = getattr(sundials_cvode, function)
+      getter.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_long)]
+      if getter(solver.cvode_mem, ctypes.byref(value)) == 0: 
+         statistics[name] = statistics.get(name, 0) + value.value
+
+def simulate_me(session, start_time, stop_time, output_interval, record_events, start_values, output, solver, 
+                statistics=None):
+   """ Simulate the model exchange FMU of the session with the options of the solver and return the result.
+       Statistics of the solver and the events are put in statistics if given. """
+   for res in simulate_me_stream(session, start_time, stop_time, output_interval, record_events, start_values, 
+                                 output, solver, statistics):
+      pass
+   return res
+
+def simulate_me_stream(session, start_time, stop_time, output_interval, record_events, start_values, output, solver, 
+                       statistics=None, chunk=None):
+   """ Simulate the model exchange FMU of the session as simulate_me() but yield the result in chunks of chunk
+       points during the integration, or all points at the end if chunk is None. If the generator is closed
+       before the end the FMU is terminated and statistics are those up to then. """
+   fmu = session['fmu_instance']
+   md = session['model_description']
+   relative_tolerance = solver.get('relative_tolerance')
+   if relative_tolerance is None and md.defaultExperiment is not None and md.defaultExperiment.tolerance is not None:
+      relative_tolerance = float(md.defaultExperiment.tolerance)
+   if relative_tolerance is None: relative_tolerance = 1e-5
+   stats = {'solver': solver.get('solver', 'CVode'), 'time_events': 0, 'state_events': 0, 'step_events': 0, 
+            'solver_resets': 0}
+   
+   fmu.setupExperiment(startTime=start_time, stopTime=stop_time)
+   start_values = dict(start_values)
+   start_values = apply_start_values(fmu, md, start_values, settable=settable_in_instantiated)
+   fmu.enterInitializationMode()
+   apply_start_values(fmu, md, start_values, settable=settable_in_initialization_mode)
+   fmu.exitInitializationMode()
+   new_discrete_states_needed = True
+   terminate_simulation = False
+   while new_discrete_states_needed and not terminate_simulation:
+      (new_discrete_states_needed, terminate_simulation, nominals_changed, values_changed, 
+       next_event_time_defined, next_event_time) = fmu.newDiscreteStates()
+   if terminate_simulation: raise Exception('Model requested termination during initial event update.')
+   fmu.enterContinuousTimeMode()
+   
+   input = Input(fmu, md, None)
+   solver_args = {'nx': md.numberOfContinuousStates, 'nz': md.numberOfEventIndicators, 
+                  'get_x': fmu.getContinuousStates, 'set_x': fmu.setContinuousStates, 
+                  'get_dx': fmu.getDerivatives, 'get_z': fmu.getEventIndicators, 'input': input}
+   if stats['solver'] == 'Euler':
+      step_size = solver.get('step_size')
+      if step_size is None: step_size = 10**(np.round(np.log10(stop_time - start_time)) - 3)
+      integrator = ForwardEuler(**solver_args)
+      stats.update({'steps': 0, 'rhs_evals': 0})
+   else:
+      from fmpy.sundials import CVodeSolver
+      max_step = solver.get('max_step')
+      if max_step is None: max_step = (stop_time - start_time)/50
+      integrator = CVodeSolver(get_nominals=fmu.getNominalsOfContinuousStates, set_time=fmu.setTime, 
+                               startTime=start_time, maxStep=max_step, relativeTolerance=relative_tolerance,
+                               maxNumSteps=solver.get('max_num_steps') or 500, **solver_args)
+   
+   recorder = Recorder(fmu=fmu, modelDescription=md, variableNames=output, interval=output_interval)
+   t = start_time
+   n_steps = 0
+   next_regular_point = t
+   try:
+      while True:
+         if record_events or np.isclose(t, next_regular_point): recorder.sample(t)
+         while chunk is not None and len(recorder.rows) >= chunk:
+            rows = recorder.rows
+            recorder.rows = rows[:chunk]
+            res = recorder.result()
+            recorder.rows = rows[chunk:]
+            yield res
+         if t > stop_time or np.isclose(t, stop_time): break
+         next_regular_point = start_time + (n_steps + 1)*output_interval
+         next_point = min(next_regular_point, stop_time)
+         time_event = next_event_time_defined and next_event_time <= next_point + 1e-12*max(abs(next_point), 1)
+         if time_event: next_point = next_event_time
+         
+         if stats['solver'] == 'Euler':
+            state_event = False
+            while t < next_point and not np.isclose(t, next_point) and not state_event:
+               t_next = min(t + step_size, next_point)
+               state_event, roots_found, t = integrator.step(t, t_next)
+               fmu.setTime(t)
+               stats['steps'] = stats['steps'] + 1
+               stats['rhs_evals'] = stats['rhs_evals'] + 1
+         else:
+            state_event, roots_found, t = integrator.step(t, next_point)
+            fmu.setTime(t)
+         if np.isclose(t, next_regular_point): n_steps = n_steps + 1
+         
+         step_event, terminate_simulation = fmu.completedIntegratorStep()
+         if terminate_simulation: break
+         time_event = time_event and np.isclose(t, next_event_time)
+         
+         if time_event or state_event or step_event:
+            stats['time_events'] = stats['time_events'] + int(time_event)
+            stats['state_events'] = stats['state_events'] + int(state_event)
+            stats['step_events'] = stats['step_events'] + int(step_event)
+            if record_events: recorder.sample(t, force=True)
+            fmu.enterEventMode()
+            new_discrete_states_needed = True
+            while new_discrete_states_needed and not terminate_simulation:
+               (new_discrete_states_needed, terminate_simulation, nominals_changed, values_changed, 
+                next_event_time_defined, next_event_time) = fmu.newDiscreteStates()
+            if terminate_simulation: break
+            fmu.enterContinuousTimeMode()
+            if stats['solver'] == 'CVode': solver_statistics_add(integrator, stats)
+            integrator.reset(t)
+            stats['solver_resets'] = stats['solver_resets'] + 1
+      
+      if stats['solver'] == 'CVode': solver_statistics_add(integrator, stats)
+      fmu.terminate()
+   except GeneratorExit:
+      fmu.terminate()
+      raise
+   finally:
+      if statistics is not None: statistics.update(stats)
+   if len(recorder.rows) > 0 or chunk is None: yield recorder.result()
+
+def simulate_me_used(session, solver):
+   """ Return True if the simulation loop of this script is to be used for the session and options of the solver """
+   if not fmpyLoop: return False
+   if session['fmi_type'] != 'ModelExchange' or session['model_description'].fmiVersion != '2.0': return False
+   if solver.get('statistics') or solver.get('solver') == 'Euler': return True
+   return solver.get('max_step') is not None or solver.get('max_num_steps', 500) != 500
+
+def simulate_session(fmu_model, start_time, stop_time, output_interval, record_events, start_values, output, 
+                     start_real=None, profile=None, solver=None, statistics=None, unzipdir=None):
+   """ Simulate with the FMU session of this process and use the cache of simulation results if set up.
+       Values start_real=(valueReference, value) are given to the FMU in one call of setReal() before start_values.
+       The options of the solver are as from solver_options() and record_events given there is used instead.
+       Wall time and calls of the phases are added to profile and statistics of the solver to statistics if given
+       and the option statistics is True, and statistics are empty if the result is taken from the cache. 
+       The session is opened with unzipdir.  """
+   if solver is None: solver = solver_options({})
+   if solver.get('record_events') is not None: record_events = solver['record_events']
+   if resultCache['directory'] is not None:
+      start = time.perf_counter()
+      start_values_key = dict(start_values)
+      if start_real is not None: 
+         start_values_key.update(('#'+str(vr), value) for vr, value in zip(start_real[0].tolist(), start_real[1].tolist()))
+      key = result_cache_key(fmu_model, start_values_key, start_time, stop_time, output_interval, record_events, output,
+                             solver)
+      res = result_cache_get(key)
+      profile_add(profile, 'cache', time.perf_counter() - start)
+      if res is not None: return res
+   start = time.perf_counter()
+   session = fmu_session(fmu_model, unzipdir)
+   profile_add(profile, 'session', time.perf_counter() - start)
+   start = time.perf_counter()
+   fmu_session_reset(session)
+   profile_add(profile, 'reset', time.perf_counter() - start)
+   restore = profile_fmu(session['fmu_instance'], profile)
+   try:
+      start = time.perf_counter()
+      if start_real is not None: session['fmu_instance'].setReal(start_real[0], start_real[1])
+      profile_add(profile, 'start_values', time.perf_counter() - start)
+      start = time.perf_counter()
+      if simulate_me_used(session, solver):
+         res = simulate_me(session, start_time, stop_time, output_interval, record_events, start_values, output, 
+                           solver, statistics)
+      else:
+         res = simulate_fmu(
+            filename = session['unzipdir'],
+            validate = False,
+            start_time = start_time,
+            stop_time = stop_time,
+            solver = solver['solver'],
+            step_size = solver['step_size'],
+            relative_tolerance = solver['relative_tolerance'],
+            output_interval = output_interval,
+            record_events = record_events,
+            start_values = start_values,
+            fmi_call_logger = None,
+            output = output,
+            model_description = session['model_description'],
+            fmu_instance = session['fmu_instance']
+         )
+      if profile is not None:
+         end = time.perf_counter()
+         initialized = profile.pop('_initialized', {'time': start})['time']
+         profile_add(profile, 'initialization', initialized - start)
+         profile_add(profile, 'integration', end - initialized - profile.get('recording', {'time': 0.0})['time'])
+   except Exception:
+      fmu_session_close(fmu_model)
+      raise
+   finally:
+      restore()
+   if resultCache['directory'] is not None: 
+      start = time.perf_counter()
+      result_cache_put(key, res)
+      profile_add(profile, 'cache', time.perf_counter() - start)
+   return res
+
+# Store of simulation results on disk - each run is one array with time in the first row and then one contiguous
+# row per variable, saved as .npy and opened memory-mapped so that only the variables read are loaded. 
+# Metadata of each run is kept in a .json file alongside and summarized in index.jsonl of the store.
+resultStore = {'directory': None}
+
+def result_store_setup(directory='fmu_explore_results'):
+   """ Save every simulation by simu() in the store in directory, and directory=None turns it off."""
+   resultStore['directory'] = directory
+   if directory is not None: os.makedirs(os.path.join(directory, 'runs'), exist_ok=True)
+
+def result_columns(result):
+   """ Return names and array with time in the first row and one row per variable of the simulation result """
+   if hasattr(result, 'dtype'): 
+      names = list(result.dtype.names)
+   else:
+      names = list(result.keys())
+   time = np.asarray(result['time'], dtype=np.float64)
+   names = [name for name in names if name != 'time']
+   names = [name for name in names if np.shape(result[name]) == time.shape]
+   data = np.empty((1 + len(names), len(time)), dtype=np.float64)
+   data[0] = time
+   for k, name in enumerate(names): data[1+k] = result[name]
+   return ['time'] + names, data
+
+def result_save(result=None, directory=None, run_id=None, parValue=parValue, info={}):
+   """ Save simulation result, by default the last simulation, in the store and return run_id """
+   if directory is None: directory = resultStore['directory'] or 'fmu_explore_results'
+   os.makedirs(os.path.join(directory, 'runs'), exist_ok=True)
+   if result is None: result = sim_res
+   if isinstance(result, SimuResult):
+      parValue = result.parValue
+      info = dict(result.info, **info)
+      result = result.data
+   if run_id is None: run_id = uuid.uuid4().hex
+   names, data = result_columns(result)
+   path = os.path.join(directory, 'runs', run_id)
+   with open(path + '.npy.tmp', 'wb') as file: np.save(file, data, allow_pickle=False)
+   os.replace(path + '.npy.tmp', path + '.npy')
+   metadata = {'run_id': run_id, 'names': names, 'n': data.shape[1], 
+               'start_time': float(data[0,0]), 'final_time': float(data[0,-1]),
+               'parValue': {key: parValue[key] for key in parValue.keys()},
+               'guid': model_description.guid, 'BPL_version': BPL_version, 'info': info}
+   with open(path + '.json', 'w') as file: json.dump(metadata, file, default=float)
+   index = {key: metadata[key] for key in ['run_id', 'n', 'start_time', 'final_time', 'parValue', 'guid']}
+   with open(os.path.join(directory, 'index.jsonl'), 'a') as file: file.write(json.dumps(index, default=float) + '\n')
+   return run_id
+
+class StoredResult:
+   """ Simulation result in the store that is opened memory-mapped when a variable is first read """
+   
+   def __init__(self, directory, run_id, index={}):
+      self.directory = directory
+      self.run_id = run_id
+      self.index = dict(index)
+      self._metadata = None
+      self._data = None
+   
+   @property
+   def metadata(self):
+      if self._metadata is None:
+         with open(os.path.join(self.directory, 'runs', self.run_id + '.json')) as file: 
+            self._metadata = json.load(file)
+      return self._metadata
+   
+   @property
+   def parValue(self):
+      return self.index['parValue'] if 'parValue' in self.index else self.metadata['parValue']
+   
+   @property
+   def data(self):
+      if self._data is None:
+         self._data = np.load(os.path.join(self.directory, 'runs', self.run_id + '.npy'), mmap_mode='r')
+      return self._data
+   
+   @property
+   def time(self):
+      return self['time']
+   
+   def __getitem__(self, name):
+      return self.data[self.metadata['names'].index(name)]
+   
+   def __contains__(self, name):
+      return name in self.metadata['names']
+   
+   def keys(self):
+      return list(self.metadata['names'])
+   
+   def final(self, name):
+      """ Return the value of the variable at the end of the simulation """
+      return self[name][-1]
+
+class ResultArchive:
+   """ Runs in the store listed from index.jsonl and opened first when a run is read """
+   
+   def __init__(self, directory):
+      self.directory = directory
+      self.index = {}
+      with open(os.path.join(directory, 'index.jsonl')) as file:
+         for line in file:
+            if line.strip() == '': continue
+            entry = json.loads(line)
+            self.index[entry['run_id']] = entry
+      self.run_ids = list(self.index.keys())
+   
+   def __len__(self):
+      return len(self.run_ids)
+   
+   def __iter__(self):
+      return iter(self.run_ids)
+   
+   def __getitem__(self, run):
+      run_id = self.run_ids[run] if isinstance(run, (int, np.integer)) else run
+      return StoredResult(self.directory, run_id, self.index[run_id])
+   
+   def keys(self):
+      return list(self.run_ids)
+   
+   def select(self, **parValue):
+      """ Return run_id of the runs with the given parameter values, eg select(mu_feed=0.1) """
+      return [run_id for run_id in self.run_ids 
+              if all(self.index[run_id]['parValue'].get(key) == value for key, value in parValue.items())]
+
+def result_open(directory='fmu_explore_results', run_id=None):
+   """ Open the store in directory as a ResultArchive, or one run as StoredResult if run_id is given """
+   if run_id is None: return ResultArchive(directory)
+   return StoredResult(directory, run_id)
+
+# Continuation of simulation - parameters and start values of the states given to the FMU in one call of setReal()
+continuation_plans = {}
+
+def continuation_plan(parValue=parValue, parLocation=parLocation, stateValueInitial=stateValueInitial, \
+                      model_description=model_description):
+   """ Return plan for simu('cont') with the parameters kept, those not Real, the states and the value references
+       of the Real parameters followed by the start values of the states. Computed once for each set of names. """
+   key = (model_description.guid, tuple((k, parLocation[k]) for k in parValue.keys()), tuple(stateValueInitial.items()))
+   if key not in continuation_plans:
+      catalogue = model_catalogue(model_description)
+      state_starts = set(stateValueInitial.values())
+      par_keys = [k for k in parValue.keys() if parLocation[k] not in state_starts]
+      par_real = [k for k in par_keys if catalogue['variables'][parLocation[k]].type == 'Real']
+      par_other = [k for k in par_keys if k not in par_real]
+      names = [parLocation[k] for k in par_real] + [stateValueInitial[k] for k in stateValueInitial.keys()]
+      continuation_plans[key] = {'par_real': par_real, 'par_other': par_other, 'states': list(stateValueInitial.keys()),
+         'valueReference': np.array([catalogue['variables'][name].valueReference for name in names], dtype=np.uint32)}
+   return continuation_plans[key]
+
+# Define simulation without plots - headless
+def simu_run(simulationTime=simulationTime, mode='Initial', options=opts_std, outputs=[], diagrams=diagrams, \
+         fmu_model=fmu_model, stateValue=stateValue, stateValueInitial=stateValueInitial, \
+         stateValueInitialLoc=stateValueInitialLoc, timeDiscreteStates=timeDiscreteStates, \
          keyVariables=keyVariables, parValue=parValue, parLocation=parLocation):
-   """Model loaded and given intial values and parameter before, and plot window also setup before."""   
+   """Model given intial values and parameter before. Simulate without plots and return a SimuResult.
+      Variables recorded are those in diagrams, states, keyVariables and outputs."""   
    
    # Global variables
    global sim_res, prevFinalTime, start_values
@@ -648,33 +1532,22 @@ def simu(simulationTime=simulationTime, mode='Initial', options=opts_std, diagra
    # Simulation flag
    simulationDone = False
    
-   # Internal help function to extract variables to be stored
-   def extract_variables(diagrams):
-       output = []
-       variables = [v for v in model_description.modelVariables if v.causality == 'local']
-       for j in range(len(diagrams)):
-           for k in range(len(variables)):
-               if variables[k].name in diagrams[j]:
-                   output.append(variables[k].name)
-       return output
-
+   # Profile of the phases if the profiler is enabled and statistics of the solver
+   profile = {} if simuProfiler['enabled'] else None
+   start = time.perf_counter()
+   statistics = {}
+   settings = SimuOptions(options)
+   
    # Run simulation
    if mode in ['Initial', 'initial', 'init']: 
       
       start_values = {parLocation[k]:parValue[k] for k in parValue.keys()}
       
       # Simulate
-      sim_res = simulate_fmu(
-         filename = fmu_model,
-         validate = False,
-         start_time = 0,
-         stop_time = simulationTime,
-         output_interval = simulationTime/options['NCP'],
-         record_events = True,
-         start_values = start_values,
-         fmi_call_logger = None,
-         output = list(set(extract_variables(diagrams) + list(stateValue.keys()) + keyVariables))
-      )
+      sim_res = simulate_session(fmu_model, 0, simulationTime, settings.output_interval(simulationTime), True, 
+                   start_values,
+                   list(set(diagrams_variables(diagrams) + list(stateValue.keys()) + keyVariables + outputs)), 
+                   None, profile, settings.solver(), statistics)
       
       simulationDone = True
       
@@ -684,33 +1557,19 @@ def simu(simulationTime=simulationTime, mode='Initial', options=opts_std, diagra
          print("Error: Simulation is first done with default mode = init'")
          
       else:         
-         # Update parValueMod and create parLocationMod
-         parValueRed = parValue.copy()
-         parLocationRed = parLocation.copy()
-         for key in parValue.keys():
-            if parLocation[key] in stateValueInitial.values(): 
-               del parValueRed[key]  
-               del parLocationRed[key]
-         parLocationMod = dict(list(parLocationRed.items()) + list(stateValueInitialLoc.items()))
-   
-         # Create parValueMod and parLocationMod
-         parValueMod = dict(list(parValueRed.items()) + 
-            [(stateValueInitial[key], stateValue[key]) for key in stateValue.keys()])      
-
-         start_values = {parLocationMod[k]:parValueMod[k] for k in parValueMod.keys()}
+         # Parameters not replaced by start values of the states, and the states, given in one call of setReal()
+         start_plan = time.perf_counter()
+         plan = continuation_plan(parValue, parLocation, stateValueInitial)
+         start_real = (plan['valueReference'], np.array([parValue[k] for k in plan['par_real']] + 
+                                                        [stateValue[k] for k in plan['states']], dtype=np.float64))
+         start_values = {parLocation[k]:parValue[k] for k in plan['par_other']}
+         profile_add(profile, 'continuation_plan', time.perf_counter() - start_plan)
   
          # Simulate
-         sim_res = simulate_fmu(
-            filename = fmu_model,
-            validate = False,
-            start_time = prevFinalTime,
-            stop_time = prevFinalTime + simulationTime,
-            output_interval = simulationTime/options['NCP'],
-            record_events = True,
-            start_values = start_values,
-            fmi_call_logger = None,
-            output = list(set(extract_variables(diagrams) + list(stateValue.keys()) + keyVariables))
-         )
+         sim_res = simulate_session(fmu_model, prevFinalTime, prevFinalTime + simulationTime, 
+                      settings.output_interval(simulationTime), True, start_values,
+                      list(set(diagrams_variables(diagrams) + list(stateValue.keys()) + keyVariables + outputs)),
+                      start_real, profile, settings.solver(), statistics)
       
          simulationDone = True
    else:
@@ -718,20 +1577,1770 @@ def simu(simulationTime=simulationTime, mode='Initial', options=opts_std, diagra
       print("Error: Simulation mode not correct")
 
    if simulationDone:
-      
-      # Plot diagrams from simulation
-      linetype = next(linecycler)    
-      for command in diagrams: eval(command)
    
+      # Adaptive output
+      if settings['output'] == 'adaptive':
+         start_phase = time.perf_counter()
+         statistics['recorded_points'] = len(sim_res)
+         sim_res = output_adaptive(sim_res, settings['output_tolerance'])
+         profile_add(profile, 'output_adaptive', time.perf_counter() - start_phase)
+      statistics['output_points'] = len(sim_res)
+      
       # Store final state values in stateValue:        
+      start_phase = time.perf_counter()
       for key in stateValue.keys(): stateValue[key] = model_get(key)  
+      profile_add(profile, 'stateValue', time.perf_counter() - start_phase, len(stateValue))
          
       # Store time from where simulation will start next time
+      start_time = prevFinalTime if mode in ['Continued', 'continued', 'cont'] else 0
       prevFinalTime = sim_res['time'][-1]
       
+      start_phase = time.perf_counter()
+      info = {'statistics': statistics}
+      if profile is not None: info['profile'] = profile
+      result = SimuResult(sim_res, start_time, prevFinalTime, parValue, stateValue, info)
+      if resultStore['directory'] is not None: result_save(result)
+      profile_add(profile, 'result', time.perf_counter() - start_phase)
+      profile_add(profile, 'total', time.perf_counter() - start)
+      profiler_record(profile)
+      return result
+      
    else:
       print('Error: No simulation done')
+      return None
+
+# Define simulation
+def simu(simulationTime=simulationTime, mode='Initial', options=opts_std, diagrams=diagrams, fmu_model=fmu_model, \
+         stateValue=stateValue, stateValueInitial=stateValueInitial, stateValueInitialLoc=stateValueInitialLoc, \
+         timeDiscreteStates=timeDiscreteStates, \
+         keyVariables=keyVariables, parValue=parValue, parLocation=parLocation):
+   """Model loaded and given intial values and parameter before, and plot window also setup before."""   
+   
+   result = simu_run(simulationTime, mode, options, [], diagrams, fmu_model, stateValue, stateValueInitial, 
+                     stateValueInitialLoc, timeDiscreteStates, keyVariables, parValue, parLocation)
+   
+   # Plot diagrams from simulation
+   if (result is not None) and not headless: 
+      start = time.perf_counter()
+      show(diagrams)
+      if 'profile' in result.info:
+         profile_add(result.info['profile'], 'diagrams', time.perf_counter() - start)
+         profile_add(simuProfiler['phases'], 'diagrams', time.perf_counter() - start)
+            
+# Streaming simulation that yields the result in chunks while the integration proceeds
+def simu_stream(simulationTime=simulationTime, mode='Initial', options=opts_std, outputs=[], chunk=100, 
+                statistics=None, continue_on_close=False, fmu_model=fmu_model, stateValue=stateValue, 
+                stateValueInitial=stateValueInitial, keyVariables=keyVariables, parValue=parValue, 
+                parLocation=parLocation):
+   """ Simulate as simu() but yield structured arrays of chunk points with time, outputs, states and keyVariables
+       during the integration, for mode 'init' or 'cont'. Nothing is plotted and the full result is not kept.
+       When the generator is exhausted the last chunk becomes sim_res and stateValue and prevFinalTime are updated
+       so that simu() or simu_stream() can continue, while closing it earlier leaves them as before unless
+       continue_on_close is True and then the simulation continues from the last point yielded.
+       Statistics of the solver are put in statistics if given. The output is always uniform with NCP intervals.
+       Co-simulation FMUs, or all if the FMPy version is not in fmpyLoopVersions, are simulated to the end 
+       and then yielded in chunks. Example:
+          for res in simu_stream(20, outputs=['DOsensor.out']): print(res['time'][-1], res['DOsensor.out'][-1])"""
+   
+   # Start values as simu_run()
+   settings = SimuOptions(options)
+   if settings['output'] == 'adaptive':
+      print("Error: Streaming simulation has only output 'uniform'")
+      return
+   if mode in ['Initial', 'initial', 'init']:
+      start_time = 0
+      start_values_stream = {parLocation[k]:parValue[k] for k in parValue.keys()}
+      start_real = None
+   elif mode in ['Continued', 'continued', 'cont']:
+      if prevFinalTime == 0: 
+         print("Error: Simulation is first done with default mode = init'")
+         return
+      start_time = prevFinalTime
+      plan = continuation_plan(parValue, parLocation, stateValueInitial)
+      start_real = (plan['valueReference'], np.array([parValue[k] for k in plan['par_real']] + 
+                                                     [stateValue[k] for k in plan['states']], dtype=np.float64))
+      start_values_stream = {parLocation[k]:parValue[k] for k in plan['par_other']}
+   else:
+      print("Error: Simulation mode not correct")
+      return
+   output = list(set(list(stateValue.keys()) + keyVariables + outputs))
+   solver = settings.solver()
+   record_events = True if solver['record_events'] is None else solver['record_events']
+   
+   # Simulate and yield the chunks
+   session = fmu_session(fmu_model)
+   if fmpyLoop and session['fmi_type'] == 'ModelExchange' and session['model_description'].fmiVersion == '2.0':
+      fmu_session_reset(session)
+      if start_real is not None: session['fmu_instance'].setReal(start_real[0], start_real[1])
+      chunks = simulate_me_stream(session, start_time, start_time + simulationTime, simulationTime/settings['NCP'], 
+                                  record_events, start_values_stream, output, solver, statistics, chunk)
+   else:
+      res_all = simulate_session(fmu_model, start_time, start_time + simulationTime, simulationTime/settings['NCP'], 
+                                 record_events, start_values_stream, output, start_real, None, solver, statistics)
+      chunks = (res_all[k:k+chunk] for k in range(0, len(res_all), chunk))
+   res = None
+   try:
+      for res in chunks: yield res
+   except GeneratorExit:
+      chunks.close()
+      if continue_on_close and res is not None: simu_stream_continue(res, start_values_stream, stateValue)
+      raise
+   except Exception:
+      fmu_session_close(fmu_model)
+      raise
+   
+   # Final values for continuation
+   if res is not None: simu_stream_continue(res, start_values_stream, stateValue)
+
+def simu_stream_continue(res, start_values_chunk, stateValue=stateValue):
+   """ Make the last point of the chunk res from simu_stream() the point where simu() with mode 'cont' starts """
+   global sim_res, prevFinalTime, start_values
+   sim_res = res
+   start_values = start_values_chunk
+   prevFinalTime = sim_res['time'][-1]
+   for key in stateValue.keys(): stateValue[key] = model_get(key)
+   
+# Real-time simulation paced by the wall clock for operator training. Readings are published as JSON datagrams 
+# over UDP to a local address standing in for the plant historian, and setpoints are written mid-run by JSON 
+# datagrams to the listening address, eg {"DO_setpoint": 30}, or stopped by {"stop": true}. Setpoints are
+# parameters of the FMU and a write restarts the simulation from the current point as simu() with mode 'cont'.
+realtimeInputs = ['DO_setpoint', 'airFlow_setpoint', 'N_low', 'N_high']
+realtimeOutputs = ['DOsensor.out', 'bioreactor.N', 'bioreactor.inlet[1].F']
+realtimeAddress = {'publish': ('127.0.0.1', 50007), 'listen': ('127.0.0.1', 50008)}
+
+def realtime_write(address=realtimeAddress['listen'], **setpoints):
+   """ Send setpoints to a running simu_realtime(), eg realtime_write(DO_setpoint=30) or realtime_write(stop=True) """
+   with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+      sock.sendto(json.dumps(setpoints).encode(), tuple(address))
+
+def simu_realtime(simulationTime=simulationTime, speedup=60, step=1/60, tolerance=0.1, options=opts_std,
+                  inputs=realtimeInputs, outputs=realtimeOutputs, address=realtimeAddress, verbose=True):
+   """ Simulate from time 0 paced by the wall clock with model time in hours run speedup times faster than real 
+       time, and readings of outputs published each step of model time. Setpoints in inputs are written mid-run 
+       through the socket, see realtime_write(). A step is a deadline miss if its readings are ready later than 
+       tolerance of the wall time of a step after they are due, and then the simulation continues late.
+       Setpoints written apply only to this run and parValue is restored at the end.
+       Return dictionary with 'time' and readings of the outputs, the 'writes' applied and the accounting of 
+       'steps', 'misses', 'lateness_max', 'compute_mean' and 'utilization' as compute time per wall time of a step."""
+   period = step*3600/speedup
+   steps = int(round(simulationTime/step))
+   stop_time = steps*step
+   result = {'time': [], 'writes': [], 'steps': 0, 'misses': 0, 'lateness_max': 0.0}
+   for name in outputs: result[name] = []
+   compute = 0.0
+   
+   parValue_saved = {key: parValue[key] for key in inputs if key in parValue}
+   publish = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+   listen = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+   try:
+      listen.bind(tuple(address['listen']))
+      listen.setblocking(False)
+      mode = 'init'
+      t = 0.0
+      stopped = False
+      wall_start = time.perf_counter()
+      while not stopped and t < stop_time - step/2:
+         remaining = int(round((stop_time - t)/step))
+         settings = SimuOptions(options, NCP=remaining, output='uniform', record_events=False)
+         stream = simu_stream(stop_time - t, mode, settings, outputs, chunk=1, continue_on_close=True)
+         writes = {}
+         points = 0
+         start = time.perf_counter()
+         for res in stream:
+            t_res = float(res['time'][-1])
+            if len(result['time']) > 0 and t_res <= t: 
+               start = time.perf_counter()
+               continue
+            points = points + 1
+            
+            # Deadline accounting and pacing
+            now = time.perf_counter()
+            compute = compute + now - start
+            lateness = now - (wall_start + t_res*3600/speedup)
+            result['steps'] = result['steps'] + 1
+            if lateness > tolerance*period: result['misses'] = result['misses'] + 1
+            result['lateness_max'] = max(result['lateness_max'], lateness)
+            if lateness < 0: time.sleep(-lateness)
+            
+            # Publish readings
+            message = {'time': t_res}
+            message.update((name, float(res[name][-1])) for name in outputs)
+            try:
+               publish.sendto(json.dumps(message).encode(), tuple(address['publish']))
+            except OSError:
+               pass
+            result['time'].append(t_res)
+            for name in outputs: result[name].append(message[name])
+            t = t_res
             
+            # Setpoints written
+            while True:
+               try:
+                  data = listen.recv(65536)
+               except (BlockingIOError, InterruptedError):
+                  break
+               try:
+                  request = json.loads(data.decode())
+               except ValueError:
+                  print('Error: not a JSON message -', data[:80])
+                  continue
+               if request.pop('stop', False): stopped = True
+               for key, value in request.items():
+                  if key in inputs: 
+                     writes[key] = value
+                  else:
+                     print('Error:', key, '- not a setpoint that can be written')
+            if stopped or writes: break
+            start = time.perf_counter()
+         
+         # Restart from the current point with the setpoints written, and from the start if no time has elapsed 
+         stream.close()
+         if points == 0: 
+            print('Error: No simulation done from time', round(t, 4))
+            break
+         if writes:
+            par(writes)
+            result['writes'].append((t, writes))
+            if verbose: print('Time', round(t, 4), 'setpoints', writes)
+         mode = 'cont' if t > 0 else 'init'
+   finally:
+      parValue.update(parValue_saved)
+      publish.close()
+      listen.close()
+   
+   for key in ['time'] + list(outputs): result[key] = np.array(result[key])
+   result['compute_mean'] = compute/max(result['steps'], 1)
+   result['utilization'] = result['compute_mean']/period
+   if verbose:
+      print('Steps', result['steps'], 'deadline misses', result['misses'], 'largest lateness', 
+            round(result['lateness_max'], 4), 's utilization', round(result['utilization'], 3))
+   return result
+
+# Pool of worker processes for parallel simulation - each worker keeps its own FMU session between tasks
+simu_pools = {}
+
+def simu_pool(processes=None):
+   """ Return the persistent pool of worker processes, created at first use. """
+   if processes is None: processes = os.cpu_count()
+   if processes not in simu_pools:
+      simu_pools[processes] = concurrent.futures.ProcessPoolExecutor(max_workers=processes, 
+                                 mp_context=multiprocessing.get_context('fork'), initializer=simu_pool_initializer)
+   return simu_pools[processes]
+
+def simu_pool_initializer():
+   """ Make sure the FMU sessions of a worker are closed when the worker process ends. """
+   multiprocessing.util.Finalize(None, fmu_session_close_all, exitpriority=10)
+
+def simu_pool_close():
+   """ Shut down all pools of worker processes. """
+   for processes in list(simu_pools.keys()):
+      simu_pools.pop(processes).shutdown(wait=True, cancel_futures=True)
+
+atexit.register(simu_pool_close)
+
+def simu_map(function, tasks, processes=None, window=None):
+   """ Evaluate function for each task in the pool of worker processes and yield (index, result) in the
+       order the tasks complete. At most window tasks are in flight at the same time.
+       With processes=1, or if fork of processes not available, the tasks are evaluated in this process."""
+   if processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+      for index, task in enumerate(tasks): yield index, function(task)
+      return
+   pool = simu_pool(processes)
+   if window is None: window = 4*pool._max_workers
+   tasks = enumerate(tasks)
+   pending = {}
+   try:
+      while True:
+         for index, task in tasks:
+            pending[pool.submit(function, task)] = index
+            if len(pending) >= window: break
+         if not pending: break
+         done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+         for future in done:
+            yield pending.pop(future), future.result()
+   except concurrent.futures.process.BrokenProcessPool:
+      simu_pools.pop(processes if processes is not None else os.cpu_count(), None)
+      raise
+   finally:
+      for future in pending: future.cancel()
+
+def simu_task(start_values, simulationTime=simulationTime, options=opts_std, outputs=[], start_time=0, 
+              fmu_model=fmu_model):
+   """ Return a task description for simu_worker() """
+   return {'fmu_model': fmu_model, 'start_values': start_values, 'start_time': start_time, 
+           'stop_time': start_time + simulationTime, 'output_interval': simulationTime/options['NCP'], 
+           'outputs': list(outputs), 'solver': solver_options(options)}
+
+def simu_worker(task):
+   """ Run one simulation described by task in this process using its FMU session. 
+       Return dictionary with 'time' and the outputs as arrays and 'statistics' of the solver."""
+   statistics = {}
+   try:
+      res = simulate_session(task['fmu_model'], task['start_time'], task['stop_time'], task['output_interval'], 
+                             False, task['start_values'], task['outputs'], None, None, task.get('solver'), statistics)
+   except Exception as error:
+      # Exceptions of FMPy can not be pickled back from a worker process
+      raise RuntimeError(type(error).__name__ + ': ' + str(error)) from None
+   result = {name: np.array(res[name]) for name in ['time'] + task['outputs']}
+   result['statistics'] = statistics
+   return result
+
+# Outputs from simu_sweep() as default
+sweepOutputs = ['bioreactor.c[1]', 'bioreactor.c[2]', 'bioreactor.c[3]', 'DOsensor.out', 'bioreactor.N', 
+                'bioreactor.V']
+
+def sweep_scenarios(grid, parValue=parValue):
+   """ Return list of parValue overrides from grid, either a dictionary with list of values for each parameter
+       that is expanded to all combinations, or already a list of dictionaries. """
+   if isinstance(grid, dict):
+      keys = list(grid.keys())
+      scenarios = [dict(zip(keys, values)) for values in product(*[grid[key] for key in keys])]
+   else:
+      scenarios = [dict(scenario) for scenario in grid]
+   errors = 0
+   for key in set(key for scenario in scenarios for key in scenario.keys()):
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         errors = errors + 1
+   if errors > 0: return None
+   return scenarios
+
+# Define parallel parameter sweep
+def simu_sweep(grid, outputs=sweepOutputs, simulationTime=simulationTime, options=opts_std, processes=None, \
+               parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Simulate scenarios of parValue overrides in parallel, each worker process with its own FMU instance.
+       The grid is a dictionary with list of values for each parameter, e.g. {'mu_feed': [0.1, 0.2]}, 
+       or a list of dictionaries. Nothing is plotted and sim_res, prevFinalTime and stateValue are not changed.
+       Return dictionary with 'time', 'scenarios', 'statistics' of the solver for each scenario and for each 
+       output an array indexed [scenario, time]."""
+   scenarios = sweep_scenarios(grid, parValue)
+   if scenarios is None: return None
+   missing = [name for name in outputs if name not in model_catalogue(model_description)['variables']]
+   if len(missing) > 0:
+      print('Error: outputs not in the model:', missing)
+      return None
+   
+   tasks = []
+   for scenario in scenarios:
+      parValueLocal = dict(parValue)
+      parValueLocal.update(scenario)
+      start_values = {parLocation[k]:parValueLocal[k] for k in parValueLocal.keys()}
+      tasks.append(simu_task(start_values, simulationTime, options, outputs, 0, fmu_model))
+   
+   result = {'time': np.linspace(0, simulationTime, options['NCP']+1), 'scenarios': scenarios, 
+             'statistics': [None]*len(scenarios)}
+   for name in outputs: result[name] = np.empty((len(scenarios), len(result['time'])))
+   for index, res in simu_map(simu_worker, tasks, processes):
+      result['statistics'][index] = res['statistics']
+      for name in outputs:
+         if len(res['time']) == len(result['time']):
+            result[name][index] = res[name]
+         else:
+            result[name][index] = np.interp(result['time'], res['time'], res[name])
+   return result
+
+# Streaming percentiles by the P2-algorithm (Jain and Chlamtac 1985) applied to each time point in parallel,
+# the memory needed is 5 markers per percentile and time point and does not grow with the number of samples
+def quantile_stream_init(percentiles, n):
+   """ Return state of streaming estimation of percentiles for arrays of length n """
+   state = {'percentiles': list(percentiles), 'count': 0, 'buffer': [], 'markers': []}
+   for p in percentiles:
+      p = p/100
+      state['markers'].append({'q': None, 'pos': None, 'desired': np.array([1, 1+2*p, 1+4*p, 3+2*p, 5.0]),
+                               'increment': np.array([0, p/2, p, (1+p)/2, 1])})
+   return state
+
+def quantile_stream_update(state, x):
+   """ Update state of streaming estimation of percentiles with a new sample array x """
+   state['count'] = state['count'] + 1
+   if state['count'] <= 5:
+      state['buffer'].append(np.array(x, dtype=float))
+      if state['count'] == 5:
+         q = np.sort(np.array(state['buffer']), axis=0)
+         for marker in state['markers']:
+            marker['q'] = q.copy()
+            marker['pos'] = np.tile(np.arange(1.0, 6.0)[:, None], (1, q.shape[1]))
+      return
+   columns = np.arange(len(x))
+   for marker in state['markers']:
+      q = marker['q']; pos = marker['pos']
+      q[0] = np.minimum(q[0], x)
+      q[4] = np.maximum(q[4], x)
+      k = np.clip(np.sum(x[None, :] >= q[1:4], axis=0), 0, 3)
+      pos[1:] = pos[1:] + (np.arange(1, 5)[:, None] > k[None, :])
+      marker['desired'] = marker['desired'] + marker['increment']
+      for i in [1, 2, 3]:
+         d = marker['desired'][i] - pos[i]
+         move = ((d >= 1) & (pos[i+1] - pos[i] > 1)) | ((d <= -1) & (pos[i-1] - pos[i] < -1))
+         if not np.any(move): continue
+         ds = np.sign(d)
+         qp = q[i] + ds/(pos[i+1] - pos[i-1])*((pos[i] - pos[i-1] + ds)*(q[i+1] - q[i])/(pos[i+1] - pos[i]) 
+                                           + (pos[i+1] - pos[i] - ds)*(q[i] - q[i-1])/(pos[i] - pos[i-1]))
+         j = np.where(ds > 0, i+1, i-1)
+         ql = q[i] + ds*(q[j, columns] - q[i])/(pos[j, columns] - pos[i])
+         parabolic = (q[i-1] < qp) & (qp < q[i+1])
+         q[i] = np.where(move, np.where(parabolic, qp, ql), q[i])
+         pos[i] = np.where(move, pos[i] + ds, pos[i])
+
+def quantile_stream_result(state):
+   """ Return array of estimated percentiles indexed [percentile, time point] """
+   if state['count'] < 5:
+      if state['count'] == 0: return None
+      return np.percentile(np.array(state['buffer']), state['percentiles'], axis=0)
+   return np.array([marker['q'][2] for marker in state['markers']])
+
+# Distributions of uncertain parameters for simu_montecarlo() given as (type, a, b) where type is
+# 'normal' (mean, sd), 'lognormal' (median, sd of log), 'uniform' (low, high) or 'triangular' (low, high) 
+montecarloDistributions = {}
+montecarloDistributions['qGmax'] = ('normal', 20.0e-3, 2.0e-3)
+montecarloDistributions['Ks'] = ('lognormal', 10.0e-3, 0.3)
+montecarloDistributions['qO2max'] = ('normal', 6.9e-3, 0.5e-3)
+montecarloDistributions['KsO2'] = ('lognormal', 1.0e-5, 0.3)
+montecarloDistributions['alpha_O2'] = ('uniform', 0.8, 1.2)
+
+# Outputs from simu_montecarlo() as default
+montecarloOutputs = ['bioreactor.c[1]', 'bioreactor.c[2]', 'bioreactor.c[3]', 'DOsensor.out', 'bioreactor.N']
+
+def montecarlo_sample(distributions, n, rng):
+   """ Return array of n samples indexed [sample, parameter] of the distributions """
+   samples = np.empty((n, len(distributions)))
+   for j, key in enumerate(distributions.keys()):
+      kind, a, b = distributions[key]
+      if kind == 'normal':
+         samples[:, j] = rng.normal(a, b, n)
+      elif kind == 'lognormal':
+         samples[:, j] = a*np.exp(rng.normal(0, b, n))
+      elif kind == 'uniform':
+         samples[:, j] = rng.uniform(a, b, n)
+      elif kind == 'triangular':
+         samples[:, j] = rng.triangular(a, (a+b)/2, b, n)
+      else:
+         print('Error:', key, '- distribution', kind, 'not known')
+         return None
+   return samples
+
+def montecarlo_worker(task):
+   """ Run simu_worker() and return None if the simulation failed """
+   try:
+      return simu_worker(task)
+   except Exception:
+      return None
+
+# Define Monte Carlo simulation
+def simu_montecarlo(distributions=montecarloDistributions, n=1000, outputs=montecarloOutputs, 
+                    percentiles=[5, 25, 50, 75, 95], simulationTime=simulationTime, options=opts_std, seed=None, 
+                    processes=None, parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Propagate uncertainty of parameters in parValue through the simulation by n samples of the distributions.
+       The simulations run in parallel and percentiles, mean and standard deviation of the outputs are 
+       aggregated as results come in and the memory used is bounded by the number of time points. 
+       Return dictionary with 'time', 'samples', 'mean', 'std' and for each output an array 
+       indexed [percentile, time]."""
+   for key in distributions.keys():
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         return None
+   samples = montecarlo_sample(distributions, n, np.random.default_rng(seed))
+   if samples is None: return None
+   
+   def tasks():
+      parValueLocal = dict(parValue)
+      for k in range(n):
+         parValueLocal.update(zip(distributions.keys(), samples[k]))
+         start_values = {parLocation[key]:parValueLocal[key] for key in parValueLocal.keys()}
+         yield simu_task(start_values, simulationTime, options, outputs, 0, fmu_model)
+   
+   time = np.linspace(0, simulationTime, options['NCP']+1)
+   stream = {name: quantile_stream_init(percentiles, len(time)) for name in outputs}
+   mean = {name: np.zeros(len(time)) for name in outputs}
+   m2 = {name: np.zeros(len(time)) for name in outputs}
+   count = 0
+   failed = []
+   for index, res in simu_map(montecarlo_worker, tasks(), processes):
+      if res is None: 
+         failed.append(index)
+         continue
+      count = count + 1
+      for name in outputs:
+         if len(res['time']) == len(time):
+            x = res[name]
+         else:
+            x = np.interp(time, res['time'], res[name])
+         quantile_stream_update(stream[name], x)
+         delta = x - mean[name]
+         mean[name] = mean[name] + delta/count
+         m2[name] = m2[name] + delta*(x - mean[name])
+   if len(failed) > 0: print('Simulations failed:', len(failed), 'of', n)
+   
+   result = {'time': time, 'n': count, 'percentiles': list(percentiles), 'parameters': list(distributions.keys()),
+             'samples': samples, 'failed': failed, 'mean': mean, 
+             'std': {name: np.sqrt(m2[name]/max(count - 1, 1)) for name in outputs}}
+   for name in outputs: result[name] = quantile_stream_result(stream[name])
+   return result
+
+# Vectorized NumPy engine of the model that integrates many parameter sets in lockstep with the states as a matrix
+# indexed [scenario, state] in the order of stateValue. Parameters are taken from the FMU and parValue, while the
+# culture stoichiometry that is not parameters of the FMU is in engineConstants. Dissolved oxygen is taken in 
+# quasi steady state since gas-liquid transfer is much faster than the rest of the dynamics, and the other states
+# are integrated by a second order exponential Runge-Kutta method that is stable for the fast linear parts.
+# The cost per time step is mostly independent of the number of scenarios and measured on one core the engine 
+# runs about 150-190 scenarios/s at 1000 scenarios compared to about 15-17 for simu_sweep(), i.e. about 10 times 
+# faster, while for batches of ten or so scenarios it is slower than the FMU.
+engineConstants = {}
+engineConstants['Y_O2_Gr'] = 2.3; engineConstants['Y_O2_Er'] = 1.6; engineConstants['Y_E_Gf'] = 1.9
+engineConstants['Y_X_Gr'] = 3.5; engineConstants['Y_X_Gf'] = 0.36; engineConstants['Y_X_Er'] = 1.32
+engineConstants['Y_CO2_Gr'] = 2.5; engineConstants['Y_CO2_Gf'] = 1.89; engineConstants['Y_CO2_Er'] = 0.68
+engineConstants['Y_Q_Gr'] = 327.5; engineConstants['Y_Q_Gf'] = 455/18; engineConstants['Y_Q_Er'] = 2305/18
+engineConstants['mw'] = [24.6, 180.0, 46.0, 32.0, 44.0]
+engineConstants['Vm'] = 24.21154985192498
+
+engineStates = list(stateValue.keys())
+
+def engine_parameters(scenarios, parValue=parValue, parLocation=parLocation, model_description=model_description):
+   """ Return dictionary of the parameters of the FMU each as an array over the scenarios, from the FMU 
+       start values, parValue and the parValue overrides of each scenario """
+   catalogue = model_catalogue(model_description)
+   n = len(scenarios)
+   p = {}
+   for name in catalogue['causality'].get('parameter', []):
+      if catalogue['variables'][name].type == 'Real': p[name] = np.full(n, float(catalogue['variables'][name].start))
+   for key in parValue.keys(): p[parLocation[key]] = np.full(n, float(parValue[key]))
+   for j, scenario in enumerate(scenarios):
+      for key in scenario.keys(): p[parLocation[key]][j] = scenario[key]
+   return p
+
+def engine_initial(p, stateValueInitial=stateValueInitial):
+   """ Return state matrix at start from the start value parameters """
+   return np.column_stack([p[stateValueInitial[name]] for name in engineStates])
+
+def engine_algebraic(t, x, p, constants=engineConstants):
+   """ Return dictionary of the variables of the model at time t for the states x given as dictionary of columns """
+   y = {}
+   V = x['bioreactor.V']
+   m = [None] + [x['bioreactor.m['+str(i)+']'] for i in range(1, 6)]
+   mw = [None] + constants['mw']
+   
+   # Feed dosage scheme
+   F = np.where(t < p['dosagescheme.t_startExp'], p['dosagescheme.F_start'], 
+                np.minimum(p['dosagescheme.F_startExp']*np.exp(p['dosagescheme.mu_feed']*(t - p['dosagescheme.t_startExp'])),
+                           p['dosagescheme.F_max']))
+   y['dosagescheme.F'] = F; y['bioreactor.inlet[1].F'] = F
+   
+   # DO-control by PID on stirrer speed with anti-windup and limits from t_regStart
+   u_s = p['DO_setpoint.value']
+   u_m = x['DOsensor.x']
+   Td = p['PIDreg.Td']
+   T_D = np.maximum(Td/p['PIDreg.Nd'], 1e-14)
+   D_u = p['PIDreg.limPID.wd']*u_s - u_m
+   D_y = np.where(Td > 0, Td/T_D*(D_u - x['PIDreg.limPID.D.x']), 0)
+   v = p['PIDreg.K']*(p['PIDreg.limPID.wp']*u_s - u_m + x['PIDreg.limPID.I.y'] + D_y)
+   uHigh = np.where(t < p['PIDreg.t_regStart'], 0, p['N_high.value'])
+   uLow = np.where(t < p['PIDreg.t_regStart'], 0, p['N_low.value'])
+   N = np.where(v > uHigh, uHigh, np.where(v < uLow, uLow, v))
+   y['PIDreg.limPID.limiter.u'] = v; y['PIDreg.limPID.D.y'] = D_y; y['PIDreg.limPID.D.u'] = D_u
+   y['PIDreg.limPID.D.T'] = T_D; y['PIDreg.u'] = N; y['bioreactor.N'] = N
+   y['DO_setpoint.out'] = u_s; y['DOsensor.out'] = u_m
+   
+   # Gas-liquid transfer
+   Kla_O2 = p['bioreactor.gas_liquid_transfer.alpha_O2']*N
+   Kla_CO2 = p['bioreactor.gas_liquid_transfer.alpha_CO2']*N
+   Kla_E = p['bioreactor.gas_liquid_transfer.alpha_E']*N
+   c_star_O2 = p['bioreactor.gas_liquid_transfer.c_star_O2']
+   y['bioreactor.gas_liquid_transfer.Kla_O2'] = Kla_O2
+   y['bioreactor.gas_liquid_transfer.Kla_CO2'] = Kla_CO2
+   y['bioreactor.gas_liquid_transfer.Kla_E'] = Kla_E
+   
+   # Culture uptake of glucose and the oxygen demand not limited by the respiratory capacity
+   c = [None, m[1]/V, m[2]/V, m[3]/V, None, m[5]/V]
+   Gm = c[2]/mw[2]
+   Em = c[3]/mw[3]
+   qGm = p['bioreactor.culture.qGmax']*Gm/(p['bioreactor.culture.Ks'] + Gm)
+   qEmpot = p['bioreactor.culture.gamma']*Em
+   demand = constants['Y_O2_Gr']*qGm + constants['Y_O2_Er']*qEmpot
+   
+   # Dissolved oxygen in quasi steady state where transfer balances uptake min(qO2lim, demand), the larger of
+   # the solutions with uptake limited by the respiratory capacity and by the demand
+   a = Kla_O2*V
+   b = mw[4]*m[1]
+   KsO2 = p['bioreactor.culture.KsO2']
+   B = a*(c_star_O2 - KsO2) - b*p['bioreactor.culture.qO2max']
+   S = np.sqrt(B**2 + 4*a**2*c_star_O2*KsO2)
+   c4_capacity = np.where(B > 0, (B + S)/(2*np.where(a > 0, a, 1)), 2*a*c_star_O2*KsO2/np.where(S - B > 0, S - B, 1))
+   c4_demand = np.where(a > 0, c_star_O2 - b*demand/np.where(a > 0, a, 1), 0)
+   c[4] = np.maximum(c4_capacity, c4_demand)
+   y['bioreactor.m[4]'] = c[4]*V
+   
+   # Sensitivity of dissolved oxygen to stirrer speed that closes the fast loop of DO-control
+   dc4_da = np.where(c4_capacity >= c4_demand, 
+                     (c_star_O2 - c[4])*(KsO2 + c[4])/(b*p['bioreactor.culture.qO2max'] - a*(c_star_O2 - KsO2 - 2*c[4])),
+                     b*demand/np.where(a > 0, a, 1)**2)
+   y['_dc4_dN'] = np.where(a > 0, dc4_da*p['bioreactor.gas_liquid_transfer.alpha_O2']*V, 0)
+   for i in range(1, 6): y['bioreactor.c['+str(i)+']'] = c[i]
+   
+   # Culture metabolism by the respiratory capacity
+   qO2lim = p['bioreactor.culture.qO2max']*c[4]/(KsO2 + c[4])
+   qGoxlim = qO2lim/constants['Y_O2_Gr']
+   qGr = np.minimum(qGm, qGoxlim)
+   qGf = qGm - qGr
+   qEoxlim = (qO2lim - constants['Y_O2_Gr']*qGr)/constants['Y_O2_Er']
+   qEr = np.minimum(qEmpot, qEoxlim)
+   qEm = constants['Y_E_Gf']*qGf - qEr
+   qO2 = constants['Y_O2_Gr']*qGr + constants['Y_O2_Er']*qEr
+   qCO2 = constants['Y_CO2_Gr']*qGr + constants['Y_CO2_Gf']*qGf + constants['Y_CO2_Er']*qEr
+   mum = constants['Y_X_Gr']*qGr + constants['Y_X_Gf']*qGf + constants['Y_X_Er']*qEr
+   Qspec = constants['Y_Q_Gr']*qGr + constants['Y_Q_Gf']*qGf + constants['Y_Q_Er']*qEr
+   q = [None, mw[1]*mum, -mw[2]*qGm, mw[3]*qEm, -mw[4]*qO2, mw[5]*qCO2]
+   for name, value in [('Gm', Gm), ('Em', Em), ('qGm', qGm), ('qEmpot', qEmpot), ('qO2lim', qO2lim), 
+                       ('qGoxlim', qGoxlim), ('qGr', qGr), ('qGf', qGf), ('qEoxlim', qEoxlim), ('qEr', qEr), 
+                       ('qEm', qEm), ('qO2', qO2), ('qCO2', qCO2), ('mum', mum), ('mu', q[1]), ('Qspec', Qspec)]:
+      y['bioreactor.culture.'+name] = value
+   for i in range(1, 6): y['bioreactor.culture.q['+str(i)+']'] = q[i]
+   
+   # Transfer rates per liquid volume and the gas phase of the bioreactor
+   r_to_liquid = [None, 0*V, 0*V, Kla_E*(p['bioreactor.gas_liquid_transfer.c_star_E'] - c[3]), 
+                  Kla_O2*(c_star_O2 - c[4]), Kla_CO2*(p['bioreactor.gas_liquid_transfer.c_star_CO2'] - c[5])]
+   r_to_gas = [None, 0*V, -r_to_liquid[4]*constants['Vm']/mw[4], -r_to_liquid[5]*constants['Vm']/mw[5], 
+               -r_to_liquid[3]*constants['Vm']/mw[3]]
+   V_gasphase = p['bioreactor.V_tot'] - V
+   Q_in = p['airFlow_setpoint.value']
+   Q_out = -(Q_in + V*(r_to_gas[1] + r_to_gas[2] + r_to_gas[3] + r_to_gas[4]))
+   y['bioreactor.V_gasphase'] = V_gasphase
+   y['bioreactor.outlet_gas.Q'] = Q_out
+   for i in range(1, 6): y['bioreactor.gas_liquid_transfer.r_to_liquid['+str(i)+']'] = r_to_liquid[i]
+   for k in range(1, 5): 
+      y['bioreactor.gas_liquid_transfer.r_to_gas['+str(k)+']'] = r_to_gas[k]
+      y['bioreactor.x_gas['+str(k)+']'] = x['bioreactor.V_gas['+str(k)+']']/V_gasphase
+   
+   # Internal terms used by engine_derivatives()
+   y['_mw'] = mw; y['_m'] = m; y['_q'] = q; y['_r_to_liquid'] = r_to_liquid; y['_r_to_gas'] = r_to_gas
+   y['_saturated'] = N != v
+   return y
+
+def engine_derivatives(t, X, p, constants=engineConstants):
+   """ Return derivatives, rates of the linear decay of each state used by the integrator and the variables """
+   x = {name: X[:, k] for k, name in enumerate(engineStates)}
+   y = engine_algebraic(t, x, p, constants)
+   mw = y['_mw']; m = y['_m']; q = y['_q']; r_to_liquid = y['_r_to_liquid']; r_to_gas = y['_r_to_gas']
+   V = x['bioreactor.V']
+   F = y['dosagescheme.F']
+   zero = np.zeros(len(V))
+   dx = {}; lam = {}
+   
+   dx['DOsensor.x'] = (100*y['bioreactor.c[4]']/p['bioreactor.gas_liquid_transfer.c_star_O2'] - x['DOsensor.x'])/p['DOsensor.T']
+   loop = np.where(y['_saturated'], 0, 100*y['_dc4_dN']/p['bioreactor.gas_liquid_transfer.c_star_O2']*p['PIDreg.K']
+                   *(1 + np.where(p['PIDreg.Td'] > 0, p['PIDreg.Td']/y['PIDreg.limPID.D.T'], 0)))
+   lam['DOsensor.x'] = (1 + loop)/p['DOsensor.T']
+   dx['PIDreg.limPID.D.x'] = np.where(p['PIDreg.Td'] > 0, (y['PIDreg.limPID.D.u'] - x['PIDreg.limPID.D.x'])/y['PIDreg.limPID.D.T'], 0)
+   lam['PIDreg.limPID.D.x'] = np.where(p['PIDreg.Td'] > 0, 1/y['PIDreg.limPID.D.T'], 0)
+   dx['PIDreg.limPID.I.y'] = (p['DO_setpoint.value'] - x['DOsensor.x'] + (y['bioreactor.N'] - y['PIDreg.limPID.limiter.u'])
+                             /(p['PIDreg.K']*p['PIDreg.limPID.Ni']))/p['PIDreg.Ti']
+   lam['PIDreg.limPID.I.y'] = np.where(y['_saturated'], 1/(p['PIDreg.limPID.Ni']*p['PIDreg.Ti']), 0)
+   
+   for i in range(1, 6):
+      dx['bioreactor.m['+str(i)+']'] = q[i]*m[1] + F*p['feedtank.c_in['+str(i)+']'] + V*r_to_liquid[i]
+   dx['bioreactor.m[4]'] = zero
+   # Uptake of glucose and ethanol taken as rate times the mass so that the masses are kept positive
+   lam['bioreactor.m[2]'] = m[1]*p['bioreactor.culture.qGmax']/((p['bioreactor.culture.Ks'] + y['bioreactor.culture.Gm'])*V)
+   lam['bioreactor.m[3]'] = y['bioreactor.gas_liquid_transfer.Kla_E'] + np.where(m[3] > 0, 
+                            mw[3]*np.maximum(y['bioreactor.culture.qEr'], 0)*m[1]/np.where(m[3] > 0, m[3], 1), 0)
+   lam['bioreactor.m[5]'] = y['bioreactor.gas_liquid_transfer.Kla_CO2']
+   dx['bioreactor.V'] = F
+   dx['feedtank.V'] = -F
+   
+   Q_out = y['bioreactor.outlet_gas.Q']
+   for k in range(1, 5):
+      dx['bioreactor.V_gas['+str(k)+']'] = (p['airFlow_setpoint.value']*p['gastube.x_in['+str(k)+']'] 
+                                            + Q_out*y['bioreactor.x_gas['+str(k)+']'] + V*r_to_gas[k])
+      lam['bioreactor.V_gas['+str(k)+']'] = np.maximum(-Q_out/y['bioreactor.V_gasphase'], 0)
+   dx['gastube.V'] = -p['airFlow_setpoint.value']*np.ones(len(V))
+   
+   # Atmosphere receives the outlet gas of the bioreactor
+   V_atm = x['atmosphere.V']
+   dx['atmosphere.V'] = -Q_out
+   for k in range(1, 5):
+      x_atm = np.where(V_atm > 0, x['atmosphere.V_gas['+str(k)+']']/np.where(V_atm > 0, V_atm, 1), 0)
+      dx['atmosphere.V_gas['+str(k)+']'] = -Q_out*np.where(-Q_out > 0, y['bioreactor.x_gas['+str(k)+']'], x_atm)
+   
+   dX = np.column_stack([dx[name] for name in engineStates])
+   Lam = np.column_stack([lam[name] if name in lam else zero for name in engineStates])
+   return dX, Lam, y
+
+def engine_phi(z):
+   """ Return the functions phi1(z) = (exp(z) - 1)/z and phi2(z) = (exp(z) - 1 - z)/z**2 """
+   small = np.abs(z) < 1e-4
+   zs = np.where(small, 1, z)
+   phi1 = np.where(small, 1 + z/2 + z**2/6, np.expm1(zs)/zs)
+   phi2 = np.where(small, 1/2 + z/6 + z**2/24, (np.expm1(zs) - zs)/zs**2)
+   return phi1, phi2
+
+def engine_output(name, X, y, p):
+   """ Return variable name from the states, the variables or the parameters """
+   if name in y: return y[name]
+   if name in engineStates: return X[:, engineStates.index(name)]
+   if name in p: return p[name]
+   return None
+
+# Define simulation by the vectorized NumPy engine
+def simu_engine(grid=[{}], outputs=sweepOutputs, simulationTime=simulationTime, options=opts_std, substeps=5, \
+                parValue=parValue, parLocation=parLocation, constants=engineConstants):
+   """ Simulate the scenarios of parValue overrides in lockstep by the vectorized NumPy engine of the model.
+       The grid is as for simu_sweep() and also the result, with 'time', 'scenarios' and for each output an 
+       array indexed [scenario, time]. The time step is the output interval divided by substeps. """
+   scenarios = sweep_scenarios(grid, parValue)
+   if scenarios is None: return None
+   p = engine_parameters(scenarios, parValue, parLocation)
+   X = engine_initial(p)
+   time = np.linspace(0, simulationTime, options['NCP']+1)
+   
+   dX, Lam, y = engine_derivatives(time[0], X, p, constants)
+   missing = [name for name in outputs if engine_output(name, X, y, p) is None]
+   if len(missing) > 0:
+      print('Error: outputs not in the engine:', missing)
+      return None
+   
+   result = {'time': time, 'scenarios': scenarios}
+   for name in outputs: result[name] = np.empty((len(scenarios), len(time)))
+   for j in range(len(time)):
+      for name in outputs: result[name][:, j] = engine_output(name, X, y, p)
+      if j == len(time) - 1: break
+      h = (time[j+1] - time[j])/substeps
+      for k in range(substeps):
+         t = time[j] + k*h
+         if k > 0: dX, Lam, y = engine_derivatives(t, X, p, constants)
+         phi1, phi2 = engine_phi(-Lam*h)
+         A = X + h*phi1*dX
+         dA, LamA, yA = engine_derivatives(t + h, A, p, constants)
+         X = A + h*phi2*(dA - dX + Lam*(A - X))
+      dX, Lam, y = engine_derivatives(time[j+1], X, p, constants)
+   return result
+
+def engine_validate(grid=[{}], outputs=sweepOutputs, simulationTime=simulationTime, options=opts_std, substeps=5, \
+                    processes=None, parValue=parValue, parLocation=parLocation):
+   """ Simulate the scenarios both by the FMU and by the NumPy engine and print and return for each output the
+       largest deviation relative to the range of the output simulated by the FMU """
+   reference = simu_sweep(grid, outputs, simulationTime, options, processes, parValue, parLocation)
+   if reference is None: return None
+   result = simu_engine(grid, outputs, simulationTime, options, substeps, parValue, parLocation)
+   if result is None: return None
+   deviation = {}
+   for name in outputs:
+      scale = np.maximum(np.ptp(reference[name], axis=1), np.abs(reference[name]).max(axis=1))
+      scale = np.where(scale > 0, scale, 1)
+      deviation[name] = float(np.max(np.abs(result[name] - reference[name]).max(axis=1)/scale))
+      print(name, ':', np.round(deviation[name], 5))
+   return deviation
+
+# Surrogate of key performance indicators (KPI) of the simulation trained from FMU runs. The parameters varied and
+# their ranges are in surrogateRanges and the KPIs in surrogateKPIs given as (output, reduction) where reduction 
+# over time is 'final', 'min', 'max', 'mean' or 'integral'. The surrogate is a Gaussian process regression with a length scale 
+# for each parameter fitted by maximum likelihood, or a full quadratic polynomial fitted by least squares.
+surrogateRanges = {}
+surrogateRanges['mu_feed'] = (0.10, 0.30)
+surrogateRanges['F_max'] = (0.10, 0.30)
+surrogateRanges['t_startExp'] = (2.0, 6.0)
+surrogateRanges['qO2max'] = (5.0e-3, 9.0e-3)
+
+surrogateKPIs = {}
+surrogateKPIs['biomass_final'] = ('bioreactor.c[1]', 'final')
+surrogateKPIs['ethanol_final'] = ('bioreactor.c[3]', 'final')
+surrogateKPIs['DO_min'] = ('DOsensor.out', 'min')
+
+surrogateModel = {}
+
+def surrogate_sample(ranges, n, rng):
+   """ Return Latin hypercube of n samples indexed [sample, parameter] within the ranges """
+   u = (np.argsort(rng.random((len(ranges), n)), axis=1).T + rng.random((n, len(ranges))))/n
+   low = np.array([ranges[key][0] for key in ranges.keys()])
+   high = np.array([ranges[key][1] for key in ranges.keys()])
+   return low + u*(high - low)
+
+def surrogate_kpis(result, kpis=surrogateKPIs):
+   """ Return dictionary with for each KPI an array indexed [scenario] reduced from a result of simu_sweep() """
+   reductions = {'final': lambda x: x[:, -1], 'min': lambda x: x.min(axis=1), 'max': lambda x: x.max(axis=1), 
+                 'mean': lambda x: x.mean(axis=1), 
+                 'integral': lambda x: np.sum((x[:, 1:] + x[:, :-1])/2*np.diff(result['time']), axis=1)}
+   return {name: reductions[reduction](result[output]) for name, (output, reduction) in kpis.items()}
+
+def surrogate_gp_kernel(X1, X2, length):
+   """ Return squared exponential covariance with length scale for each column """
+   d = (X1[:, None, :] - X2[None, :, :])/length
+   return np.exp(-0.5*np.sum(d**2, axis=2))
+
+def surrogate_gp_fit(X, y, minimize):
+   """ Return Gaussian process fitted to standardized y with length scales and noise by maximum likelihood """
+   n, m = X.shape
+   def nll(theta):
+      length = np.exp(theta[:m]); noise = np.exp(theta[m])
+      K = surrogate_gp_kernel(X, X, length) + (noise + 1e-8)*np.eye(n)
+      try:
+         L = np.linalg.cholesky(K)
+      except np.linalg.LinAlgError:
+         return 1e10
+      a = np.linalg.solve(L.T, np.linalg.solve(L, y))
+      return 0.5*y @ a + np.sum(np.log(np.diag(L)))
+   starts = [np.r_[np.full(m, np.log(l)), np.log(1e-4)] for l in [0.3, 1.0]]
+   bounds = [(np.log(0.02), np.log(20))]*m + [(np.log(1e-8), np.log(1))]
+   best = min((minimize(nll, theta, method='L-BFGS-B', bounds=bounds) for theta in starts), key=lambda r: r.fun)
+   length = np.exp(best.x[:m]); noise = np.exp(best.x[m])
+   K = surrogate_gp_kernel(X, X, length) + (noise + 1e-8)*np.eye(n)
+   return {'length': length, 'noise': noise, 'X': X, 'alpha': np.linalg.solve(K, y)}
+
+def surrogate_gp_predict(gp, X):
+   """ Return prediction of standardized output of the Gaussian process """
+   return surrogate_gp_kernel(X, gp['X'], gp['length']) @ gp['alpha']
+
+def surrogate_poly_features(X):
+   """ Return columns of a full quadratic polynomial """
+   n, m = X.shape
+   columns = [np.ones(n)] + [X[:, i] for i in range(m)] + [X[:, i]*X[:, j] for i in range(m) for j in range(i, m)]
+   return np.column_stack(columns)
+
+def surrogate_fit(kind, X, Y, minimize=None):
+   """ Return surrogate models for each column of the standardized Y """
+   if kind == 'gp':
+      return [surrogate_gp_fit(X, Y[:, k], minimize) for k in range(Y.shape[1])]
+   coef = np.linalg.lstsq(surrogate_poly_features(X), Y, rcond=None)[0]
+   return [{'coef': coef[:, k]} for k in range(Y.shape[1])]
+
+def surrogate_evaluate(kind, models, X):
+   """ Return standardized predictions indexed [sample, KPI] """
+   if kind == 'gp':
+      return np.column_stack([surrogate_gp_predict(model, X) for model in models])
+   F = surrogate_poly_features(X)
+   return np.column_stack([F @ model['coef'] for model in models])
+
+# Define training of the surrogate
+def surrogate_train(ranges=surrogateRanges, kpis=surrogateKPIs, n=200, validation=0.2, kind='gp', 
+                    simulationTime=simulationTime, options=opts_std, seed=None, processes=None, 
+                    parValue=parValue, parLocation=parLocation, fmu_model=fmu_model, surrogate=surrogateModel):
+   """ Train surrogate of the KPIs from n FMU simulations by simu_sweep() of a Latin hypercube sample of the 
+       parameter ranges, the others parameters as in parValue. The fraction validation of the samples is held out
+       and the error of the surrogate on those is printed, before the surrogate is refitted to all samples. 
+       The kind is 'gp' for Gaussian process that needs scipy, or 'poly' for quadratic polynomial. 
+       The surrogate is stored in surrogateModel and used by predict()."""
+   for key in ranges.keys():
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         return None
+   minimize = None
+   if kind == 'gp':
+      try:
+         from scipy.optimize import minimize
+      except ImportError:
+         print('Surrogate of kind gp needs scipy - quadratic polynomial used instead')
+         kind = 'poly'
+   elif kind != 'poly':
+      print('Error:', kind, '- surrogate kind not known, use gp or poly')
+      return None
+   
+   rng = np.random.default_rng(seed)
+   samples = surrogate_sample(ranges, n, rng)
+   grid = [dict(zip(ranges.keys(), map(float, row))) for row in samples]
+   outputs = list(dict.fromkeys(output for output, reduction in kpis.values()))
+   result = simu_sweep(grid, outputs, simulationTime, options, processes, parValue, parLocation, fmu_model)
+   if result is None: return None
+   values = surrogate_kpis(result, kpis)
+   Y = np.column_stack([values[name] for name in kpis.keys()])
+   
+   low = np.array([ranges[key][0] for key in ranges.keys()])
+   high = np.array([ranges[key][1] for key in ranges.keys()])
+   X = (samples - low)/(high - low)
+   mean = Y.mean(axis=0); scale = np.where(Y.std(axis=0) > 0, Y.std(axis=0), 1)
+   Z = (Y - mean)/scale
+   
+   held = rng.permutation(n)[:int(round(validation*n))]
+   train = np.setdiff1d(np.arange(n), held)
+   errors = {}
+   if len(held) > 0:
+      models = surrogate_fit(kind, X[train], Z[train], minimize)
+      Yp = surrogate_evaluate(kind, models, X[held])*scale + mean
+      print('Validation on', len(held), 'of', n, 'samples (error relative to range of KPI)')
+      for k, name in enumerate(kpis.keys()):
+         span = np.ptp(Y[:, k]) if np.ptp(Y[:, k]) > 0 else 1
+         rmse = float(np.sqrt(np.mean((Yp[:, k] - Y[held, k])**2)))
+         errors[name] = {'rmse': rmse, 'max': float(np.max(np.abs(Yp[:, k] - Y[held, k]))), 'range': float(span)}
+         print(' ', name, ': rmse', np.round(rmse/span, 4), ' max', np.round(errors[name]['max']/span, 4))
+   
+   surrogate.clear()
+   surrogate.update({'kind': kind, 'parameters': list(ranges.keys()), 'ranges': dict(ranges), 
+                     'nominal': {key: parValue[key] for key in ranges.keys()}, 'low': low, 
+                     'high': high, 'kpis': dict(kpis), 'mean': mean, 'scale': scale, 
+                     'models': surrogate_fit(kind, X, Z, minimize), 'samples': samples, 'values': Y, 
+                     'validation': errors})
+   return surrogate
+
+# Define prediction by the surrogate
+def predict(parValue=parValue, surrogate=surrogateModel):
+   """ Return dictionary of KPIs predicted by the surrogate for parValue, or for a list of dictionaries of 
+       parameter values where parameters not given are taken as in parValue when the surrogate was trained. 
+       A dictionary gives values and a list gives arrays. """
+   if len(surrogate) == 0:
+      print('Error: no surrogate - train it first by surrogate_train()')
+      return None
+   single = isinstance(parValue, dict)
+   points = [parValue] if single else list(parValue)
+   samples = np.array([[point.get(key, surrogate['nominal'][key]) for key in surrogate['parameters']] 
+                       for point in points], dtype=float)
+   X = (samples - surrogate['low'])/(surrogate['high'] - surrogate['low'])
+   if np.any(X < 0) or np.any(X > 1):
+      print('Warning: parameters outside the ranges the surrogate is trained for')
+   Y = surrogate_evaluate(surrogate['kind'], surrogate['models'], X)*surrogate['scale'] + surrogate['mean']
+   if single: return {name: float(Y[0, k]) for k, name in enumerate(surrogate['kpis'].keys())}
+   return {name: Y[:, k] for k, name in enumerate(surrogate['kpis'].keys())}
+
+def surrogate_confirm(grid, surrogate=surrogateModel, simulationTime=simulationTime, options=opts_std, 
+                      processes=None, parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Simulate candidates of the grid by the FMU and print and return the KPIs from the FMU and the surrogate """
+   if len(surrogate) == 0:
+      print('Error: no surrogate - train it first by surrogate_train()')
+      return None
+   scenarios = sweep_scenarios(grid, parValue)
+   if scenarios is None: return None
+   outputs = list(dict.fromkeys(output for output, reduction in surrogate['kpis'].values()))
+   result = simu_sweep(scenarios, outputs, simulationTime, options, processes, parValue, parLocation, fmu_model)
+   if result is None: return None
+   fmu = surrogate_kpis(result, surrogate['kpis'])
+   points = [{key: scenario.get(key, parValue[key]) for key in surrogate['parameters']} for scenario in scenarios]
+   predicted = predict(points, surrogate)
+   for name in surrogate['kpis'].keys():
+      print(name, ': fmu', np.round(fmu[name], 4), ' surrogate', np.round(predicted[name], 4))
+   return {'scenarios': scenarios, 'fmu': fmu, 'surrogate': predicted}
+
+# Optimization of the feed profile of the dosagescheme for maximal biomass at the end of the simulation by
+# differential evolution, with the parameters varied within feedBounds and the constraints in feedConstraints:
+# DO above DO_setpoint less DO_margin, ethanol at the end below ethanol_max since ethanol is always formed in the
+# batch phase, and volume below V_tot less V_margin. 
+# Candidates are compared by feasibility first and then biomass, and evaluated are kept in a cache by value.
+feedBounds = {}
+feedBounds['F_start'] = (0.0, 0.005)
+feedBounds['mu_feed'] = (0.05, 0.40)
+feedBounds['t_startExp'] = (1.0, 8.0)
+feedBounds['F_startExp'] = (0.0005, 0.005)
+feedBounds['F_max'] = (0.05, 0.50)
+
+feedConstraints = {}
+feedConstraints['DO_margin'] = 5.0
+feedConstraints['ethanol_max'] = 0.1
+feedConstraints['V_margin'] = 0.5
+
+feedOutputs = ['bioreactor.m[1]', 'bioreactor.c[3]', 'DOsensor.out', 'bioreactor.V']
+
+def optimize_feed_evaluate(candidates, cache, constraints, simulationTime, options, processes, parValue, 
+                           parLocation, fmu_model):
+   """ Return arrays of biomass and constraint violation of the candidates, simulated in parallel when not
+       in the cache, and the number of candidates simulated """
+   keys = [tuple(sorted(candidate.items())) for candidate in candidates]
+   new = list(dict.fromkeys(key for key in keys if key not in cache))
+   tasks = []
+   for key in new:
+      parValueLocal = dict(parValue)
+      parValueLocal.update(key)
+      start_values = {parLocation[k]:parValueLocal[k] for k in parValueLocal.keys()}
+      tasks.append(simu_task(start_values, simulationTime, options, feedOutputs, 0, fmu_model))
+   for index, res in simu_map(montecarlo_worker, tasks, processes):
+      if res is None: 
+         cache[new[index]] = (-np.inf, np.inf)
+         continue
+      parValueLocal = dict(parValue)
+      parValueLocal.update(new[index])
+      violation = max(parValueLocal['DO_setpoint'] - constraints['DO_margin'] - np.min(res['DOsensor.out']), 0) \
+                  + max(res['bioreactor.c[3]'][-1] - constraints['ethanol_max'], 0) \
+                  + max(np.max(res['bioreactor.V']) - (parValueLocal['V_tot'] - constraints['V_margin']), 0)
+      cache[new[index]] = (float(res['bioreactor.m[1]'][-1]), float(violation))
+   return np.array([cache[key][0] for key in keys]), np.array([cache[key][1] for key in keys]), len(new)
+
+def optimize_feed_better(f1, v1, f2, v2):
+   """ Return True where candidate 1 is better than candidate 2 by feasibility first and then biomass """
+   return np.where((v1 == 0) & (v2 == 0), f1 > f2, v1 < v2)
+
+# Define optimization of the feed profile
+def optimize_feed(bounds=feedBounds, constraints=feedConstraints, population=None, generations=30, 
+                  mutation=0.7, crossover=0.9, resolution=1e-4, simulationTime=simulationTime, options=opts_std, 
+                  seed=None, processes=None, parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Maximize biomass bioreactor.m[1] at simulationTime over the dosagescheme parameters in bounds by 
+       differential evolution with the constraints of feedConstraints, the other parameters as in parValue. 
+       Each generation of candidates is simulated in parallel and candidates are rounded to resolution of 
+       the range so that candidates evaluated before are taken from the cache instead of simulated again. 
+       Return dictionary with 'parValue' of the best candidate, 'biomass', 'violation' and 'history'. """
+   for key in bounds.keys():
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         return None
+   keys = list(bounds.keys())
+   low = np.array([bounds[key][0] for key in keys])
+   high = np.array([bounds[key][1] for key in keys])
+   if population is None: population = max(5*len(keys), 10)
+   rng = np.random.default_rng(seed)
+   cache = {}
+   
+   def candidates(U):
+      U = np.round(np.clip(U, 0, 1)/resolution)*resolution
+      return U, [dict(zip(keys, map(float, low + u*(high - low)))) for u in U]
+   
+   def evaluate(U):
+      U, points = candidates(U)
+      f, v, n = optimize_feed_evaluate(points, cache, constraints, simulationTime, options, processes, 
+                                       parValue, parLocation, fmu_model)
+      return U, f, v, n
+   
+   P, f, v, n = evaluate((np.argsort(rng.random((len(keys), population)), axis=1).T 
+                          + rng.random((population, len(keys))))/population)
+   history = []
+   simulations = n
+   for generation in range(generations + 1):
+      best = 0
+      for i in range(1, population):
+         if optimize_feed_better(f[i], v[i], f[best], v[best]): best = i
+      history.append({'generation': generation, 'biomass': float(f[best]), 'violation': float(v[best]), 
+                      'simulations': simulations})
+      print('Generation', generation, ': biomass', np.round(f[best], 3), ' violation', np.round(v[best], 4), 
+            ' simulations', simulations)
+      if generation == generations: break
+      
+      others = np.array([rng.choice(np.delete(np.arange(population), i), 3, replace=False) 
+                         for i in range(population)])
+      mutant = P[others[:, 0]] + mutation*(P[others[:, 1]] - P[others[:, 2]])
+      cross = rng.random(P.shape) < crossover
+      cross[np.arange(population), rng.integers(len(keys), size=population)] = True
+      T, ft, vt, n = evaluate(np.where(cross, mutant, P))
+      simulations = simulations + n
+      replace = optimize_feed_better(ft, vt, f, v) | ((ft == f) & (vt == v))
+      P = np.where(replace[:, None], T, P)
+      f = np.where(replace, ft, f)
+      v = np.where(replace, vt, v)
+   
+   best_parValue = dict(zip(keys, map(float, low + P[best]*(high - low))))
+   if v[best] > 0: print('No candidate found that satisfies the constraints')
+   return {'parValue': best_parValue, 'biomass': float(f[best]), 'violation': float(v[best]), 
+           'history': history, 'simulations': simulations, 'evaluations': population*(generations + 1)}
+
+# Estimation of culture parameters by weighted least squares against measured data given as a dictionary
+# with for each measurement (time, values) or (time, values, sd), e.g. {'X': (t, y), 'OUR': (t, y, sd)}.
+# The measurements are model variables times a factor in fitMeasurements, where OUR is the oxygen transferred
+# to the liquid in mmol/(L h), and fitSd is the standard deviation used when not given with the data.
+fitParameters = ['qGmax', 'Ks', 'qO2max', 'KsO2', 'alpha_O2']
+
+fitMeasurements = {}
+fitMeasurements['X'] = ('bioreactor.c[1]', 1.0)
+fitMeasurements['G'] = ('bioreactor.c[2]', 1.0)
+fitMeasurements['E'] = ('bioreactor.c[3]', 1.0)
+fitMeasurements['DO'] = ('DOsensor.out', 1.0)
+fitMeasurements['N'] = ('bioreactor.N', 1.0)
+fitMeasurements['OUR'] = ('bioreactor.gas_liquid_transfer.r_to_liquid[4]', 1000/32)
+
+fitSd = {'X': 0.2, 'G': 0.1, 'E': 0.05, 'DO': 2.0, 'N': 10.0, 'OUR': 2.0}
+
+def fit_residuals(res, data, measurements):
+   """ Return weighted residuals of a simulation result against the data as one array """
+   residuals = []
+   for name in data.keys():
+      time, values = np.asarray(data[name][0], dtype=float), np.asarray(data[name][1], dtype=float)
+      sd = data[name][2] if len(data[name]) > 2 else fitSd[name]
+      variable, factor = measurements[name]
+      residuals.append((factor*np.interp(time, res['time'], res[variable]) - values)/sd)
+   return np.concatenate(residuals)
+
+def fit_simulate(thetas, keys, data, measurements, simulationTime, options, processes, parValue, parLocation,
+                 fmu_model):
+   """ Return list of weighted residuals for each row of log parameter values thetas, simulated in parallel,
+       with None for a simulation that failed """
+   outputs = list(dict.fromkeys(measurements[name][0] for name in data.keys()))
+   tasks = []
+   for theta in thetas:
+      parValueLocal = dict(parValue)
+      parValueLocal.update(zip(keys, map(float, np.exp(theta))))
+      start_values = {parLocation[k]:parValueLocal[k] for k in parValueLocal.keys()}
+      tasks.append(simu_task(start_values, simulationTime, options, outputs, 0, fmu_model))
+   residuals = [None]*len(tasks)
+   for index, res in simu_map(montecarlo_worker, tasks, processes):
+      if res is not None: residuals[index] = fit_residuals(res, data, measurements)
+   return residuals
+
+# Define parameter estimation
+def fit(data, parameters=fitParameters, measurements=fitMeasurements, iterations=20, step=1e-2, tolerance=1e-4,
+        simulationTime=None, options=opts_std, processes=None, parValue=parValue, parLocation=parLocation, 
+        fmu_model=fmu_model):
+   """ Estimate parameters by weighted least squares against data by the Levenberg-Marquardt method, starting
+       from and with the other parameters as in parValue. The parameters are estimated in logarithm to stay 
+       positive. The Jacobian is computed by finite differences of relative size step from one simulation for 
+       each parameter in parallel together with the unperturbed baseline that is reused from the previous step,
+       and three damping factors are tried in parallel. The Jacobian is computed again only after a step is taken 
+       and the covariance is from the Jacobian at the estimate. Return dictionary with 'parValue' estimated, 'sd', 
+       'correlation', 'cost' and 'history'. The estimate is not put into parValue, use par() for that."""
+   for key in parameters:
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         return None
+   for name in data.keys():
+      if name not in measurements.keys():
+         print('Error:', name, '- measurement not in fitMeasurements')
+         return None
+   if simulationTime is None: simulationTime = max(float(np.max(data[name][0])) for name in data.keys())
+   arguments = (parameters, data, measurements, simulationTime, options, processes, parValue, parLocation, fmu_model)
+   
+   theta = np.log(np.array([parValue[key] for key in parameters], dtype=float))
+   r = fit_simulate([theta], *arguments)[0]
+   if r is None:
+      print('Error: simulation with the parameters in parValue failed')
+      return None
+   cost = float(r @ r)
+   damping = 1e-2
+   history = [{'iteration': 0, 'cost': cost, 'parValue': dict(zip(parameters, np.exp(theta).tolist()))}]
+   simulations = 1
+   J = None
+   print('Iteration 0 : cost', np.round(cost, 4))
+   
+   def jacobian(theta, r):
+      """ Return the Jacobian at theta from one simulation for each parameter, or None if one failed """
+      perturbed = fit_simulate(theta + step*np.eye(len(theta)), *arguments)
+      if any(rp is None for rp in perturbed):
+         print('Error: simulation with perturbed parameters failed')
+         return None
+      return np.column_stack([(rp - r)/step for rp in perturbed])
+   
+   for iteration in range(1, iterations + 1):
+      # Jacobian only after a step is taken, and otherwise the same is used with more damping
+      if J is None:
+         J = jacobian(theta, r)
+         simulations = simulations + len(theta)
+         if J is None: break
+         g = J.T @ r
+         A = J.T @ J
+      dampings = damping*np.array([0.1, 1.0, 10.0])
+      trials = [theta - np.linalg.solve(A + d*np.diag(np.diag(A) + 1e-12), g) for d in dampings]
+      results = fit_simulate(trials, *arguments)
+      simulations = simulations + len(trials)
+      costs = [float(rt @ rt) if rt is not None else np.inf for rt in results]
+      best = int(np.argmin(costs))
+      if costs[best] < cost:
+         improvement = (cost - costs[best])/cost
+         theta, r, cost = trials[best], results[best], costs[best]
+         damping = max(dampings[best]/3, 1e-8)
+         J = None
+      else:
+         improvement = 0
+         damping = dampings[-1]*10
+      history.append({'iteration': iteration, 'cost': cost, 'parValue': dict(zip(parameters, np.exp(theta).tolist()))})
+      print('Iteration', iteration, ': cost', np.round(cost, 4), ' damping', damping)
+      if (improvement > 0 and improvement < tolerance) or damping > 1e8: break
+   
+   # Covariance from the Jacobian at the estimate
+   if J is None: 
+      J = jacobian(theta, r)
+      simulations = simulations + len(theta)
+   estimate = dict(zip(parameters, np.exp(theta).tolist()))
+   dof = max(len(r) - len(theta), 1)
+   try:
+      if J is None: raise np.linalg.LinAlgError
+      covariance = np.linalg.inv(J.T @ J)*cost/dof
+      sd_log = np.sqrt(np.diag(covariance))
+      correlation = covariance/np.outer(sd_log, sd_log)
+   except np.linalg.LinAlgError:
+      sd_log = np.full(len(theta), np.nan); correlation = np.full((len(theta), len(theta)), np.nan)
+   sd = dict(zip(parameters, (np.exp(theta)*sd_log).tolist()))
+   for key in parameters:
+      print(key, ':', np.round(estimate[key], 6), '+-', np.round(sd[key], 6))
+   return {'parValue': estimate, 'sd': sd, 'correlation': correlation, 'cost': cost, 'n': len(r), 
+           'history': history, 'simulations': simulations}
+
+# Linearization along a simulated trajectory by finite differences of the derivatives from the FMU. The sparsity
+# pattern of the Jacobian A is read from resources/*_JacA.bin of the FMU if available, stored column-wise with 
+# column pointers and row indices as uint32, and columns without common rows are perturbed together.
+jacobian_patterns = {}
+
+def jacobian_pattern(fmu_model=fmu_model):
+   """ Return boolean matrix of the sparsity pattern [row, column] of A from the FMU, or None if not available """
+   if fmu_model not in jacobian_patterns:
+      n = read_model_description(fmu_model).numberOfContinuousStates
+      pattern = None
+      with zipfile.ZipFile(fmu_model) as archive:
+         files = [name for name in archive.namelist() if name.startswith('resources/') and name.endswith('_JacA.bin')]
+         if len(files) > 0:
+            data = np.frombuffer(archive.read(files[0]), dtype=np.uint32)
+            colPtrs = data[:n+1]
+            if colPtrs[0] == 0 and np.all(np.diff(colPtrs.astype(int)) >= 0) and n + 1 + colPtrs[-1] <= len(data):
+               rowIndex = data[n+1:n+1+colPtrs[-1]]
+               pattern = np.zeros((n, n), dtype=bool)
+               pattern[rowIndex, np.repeat(np.arange(n), np.diff(colPtrs.astype(int)))] = True
+      jacobian_patterns[fmu_model] = pattern
+   return jacobian_patterns[fmu_model]
+
+def jacobian_colors(pattern):
+   """ Return list of groups of columns with no common rows by greedy coloring, columns with no entries left out """
+   colors = []
+   rows = []
+   for j in np.argsort(-pattern.sum(axis=0), kind='stable'):
+      if not pattern[:, j].any(): continue
+      for group, used in zip(colors, rows):
+         if not np.any(used & pattern[:, j]):
+            group.append(int(j)); used |= pattern[:, j]
+            break
+      else:
+         colors.append([int(j)]); rows.append(pattern[:, j].copy())
+   return colors
+
+# Define linearization along a simulation
+def linearize(times=None, simulationTime=simulationTime, options=opts_std, step=1e-6, sparsity=True,
+              parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Simulate from the initial values with parValue and compute the state matrix A of the linearized model 
+       at the times, default the output grid, by finite differences of the derivatives from the FMU with 
+       relative step. The eigenvalues of all points are computed together. Return dictionary with 'time', 
+       'states', 'A' indexed [time, row, column], 'eigenvalues' indexed [time, k], 'stiffness' as ratio of 
+       largest to smallest magnitude of non-zero real parts and 'timescales' as 1/|real part| in hours. """
+   states = list(stateValue.keys())
+   n = len(states)
+   start_values = {parLocation[k]:parValue[k] for k in parValue.keys()}
+   res = simulate_session(fmu_model, 0, simulationTime, simulationTime/options['NCP'], False, start_values, states,
+                          None, None, solver_options(options))
+   if times is None: times = res['time']
+   times = np.asarray(times, dtype=float)
+   X = np.column_stack([np.interp(times, res['time'], res[name]) for name in states])
+   
+   pattern = jacobian_pattern(fmu_model) if sparsity else None
+   if pattern is None: pattern = np.ones((n, n), dtype=bool)
+   colors = jacobian_colors(pattern)
+   
+   session = fmu_session(fmu_model)
+   fmu_session_reset(session)
+   fmu = session['fmu_instance']
+   x = np.zeros(n); dx = np.zeros(n)
+   px = x.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+   pdx = dx.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+   A = np.zeros((len(times), n, n))
+   try:
+      fmu.setupExperiment(startTime=0)
+      apply_start_values(fmu, session['model_description'], start_values)
+      fmu.enterInitializationMode()
+      fmu.exitInitializationMode()
+      fmu.enterEventMode()
+      fmu.newDiscreteStates()
+      fmu.enterContinuousTimeMode()
+      
+      def derivatives(xk):
+         x[:] = xk
+         fmu.setContinuousStates(px, n)
+         fmu.getDerivatives(pdx, n)
+         return dx.copy()
+      
+      for k, t in enumerate(times):
+         fmu.setTime(t)
+         x[:] = X[k]
+         fmu.setContinuousStates(px, n)
+         fmu.enterEventMode()
+         fmu.newDiscreteStates()
+         fmu.enterContinuousTimeMode()
+         f0 = derivatives(X[k])
+         for group in colors:
+            h = step*np.maximum(np.abs(X[k, group]), 1e-3)
+            xk = X[k].copy(); xk[group] = xk[group] + h
+            df = derivatives(xk) - f0
+            for j, hj in zip(group, h):
+               A[k, pattern[:, j], j] = df[pattern[:, j]]/hj
+      fmu.terminate()
+   except Exception:
+      fmu_session_close(fmu_model)
+      raise
+   
+   eigenvalues = np.linalg.eigvals(A)
+   re = np.abs(eigenvalues.real)
+   re_nonzero = np.where(re > 1e-9, re, np.nan)
+   with np.errstate(all='ignore'):
+      stiffness = np.nanmax(re_nonzero, axis=1)/np.nanmin(re_nonzero, axis=1)
+      timescales = np.sort(1/re_nonzero, axis=1)
+   return {'time': times, 'states': states, 'A': A, 'eigenvalues': eigenvalues, 'stiffness': stiffness, 
+           'timescales': timescales, 'colors': colors, 'evaluations': len(times)*(len(colors) + 1)}
+
+# Variance-based global sensitivity analysis by Sobol indices of KPIs in sobolKPIs, given as for surrogateKPIs, 
+# to parameters varied uniformly within sobolRanges. The samples are the Saltelli scheme of two matrices A and B 
+# of a Sobol sequence and for each parameter A with that column from B, that is n*(k+2) simulations for k 
+# parameters. First order indices are estimated as Saltelli (2010) and total indices as Jansen (1999).
+sobolRanges = {key: (0.8*parValue[key], 1.2*parValue[key]) 
+               for key in ['qGmax', 'Ks', 'qO2max', 'KsO2', 'alpha_O2', 'G_in', 'mu_feed', 't_startExp', 'F_startExp', 
+                           'F_max', 'airFlow_setpoint', 'DO_setpoint', 'K', 'Ti', 'N_high']}
+
+sobolKPIs = {}
+sobolKPIs['biomass_final'] = ('bioreactor.c[1]', 'final')
+sobolKPIs['ethanol_peak'] = ('bioreactor.c[3]', 'max')
+sobolKPIs['N_integral'] = ('bioreactor.N', 'integral')
+
+def sobol_sample(k, n, seed):
+   """ Return matrices A and B of n samples of k parameters in the unit hypercube from a scrambled Sobol 
+       sequence if scipy is available and otherwise from uniform random numbers """
+   try:
+      from scipy.stats import qmc
+      AB = qmc.Sobol(2*k, scramble=True, seed=seed).random(n)
+   except ImportError:
+      AB = np.random.default_rng(seed).random((n, 2*k))
+   return AB[:, :k], AB[:, k:]
+
+def sobol_indices(fA, fB, fAB):
+   """ Return first order and total indices from the KPI of A and B indexed [..., sample] and of the matrices
+       with column i from B indexed [..., parameter i, sample] """
+   V = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)[..., None]
+   V = np.where(V > 0, V, np.nan)
+   S1 = np.mean(fB[..., None, :]*(fAB - fA[..., None, :]), axis=-1)/V
+   ST = 0.5*np.mean((fA[..., None, :] - fAB)**2, axis=-1)/V
+   return S1, ST
+
+# Define global sensitivity analysis
+def simu_sobol(ranges=sobolRanges, kpis=sobolKPIs, n=256, bootstrap=200, confidence=95, 
+               simulationTime=simulationTime, options=opts_std, seed=None, processes=None, 
+               parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Compute Sobol first order and total indices of the KPIs to the parameters in ranges, the others as in
+       parValue, from n*(k+2) simulations in parallel where n preferably is a power of 2. The confidence 
+       intervals in percent are from bootstrap resampling of the samples. Return dictionary with 'parameters', 
+       'kpis' and for 'S1', 'ST', 'S1_conf' and 'ST_conf' a dictionary with an array for each KPI, indexed 
+       [parameter] for the indices and [low/high, parameter] for the confidence intervals. """
+   for key in ranges.keys():
+      if key not in parValue.keys():
+         print('Error:', key, '- seems not an accessible parameter - check the spelling')
+         return None
+   keys = list(ranges.keys())
+   k = len(keys)
+   low = np.array([ranges[key][0] for key in keys])
+   high = np.array([ranges[key][1] for key in keys])
+   A, B = sobol_sample(k, n, seed)
+   outputs = list(dict.fromkeys(output for output, reduction in kpis.values()))
+   
+   def samples():
+      yield from A
+      yield from B
+      for i in range(k):
+         for a, b in zip(A, B):
+            ab = a.copy(); ab[i] = b[i]
+            yield ab
+   
+   def tasks():
+      parValueLocal = dict(parValue)
+      for u in samples():
+         parValueLocal.update(zip(keys, map(float, low + u*(high - low))))
+         start_values = {parLocation[key]:parValueLocal[key] for key in parValueLocal.keys()}
+         yield simu_task(start_values, simulationTime, options, outputs, 0, fmu_model)
+   
+   Y = np.full((len(kpis), (k + 2)*n), np.nan)
+   for index, res in simu_map(montecarlo_worker, tasks(), processes):
+      if res is None: continue
+      values = surrogate_kpis({'time': res['time'], **{name: res[name][None, :] for name in outputs}}, kpis)
+      Y[:, index] = [values[name][0] for name in kpis.keys()]
+   
+   fA, fB, fAB = Y[:, :n], Y[:, n:2*n], Y[:, 2*n:].reshape(len(kpis), k, n)
+   valid = ~(np.isnan(fA).any(axis=0) | np.isnan(fB).any(axis=0) | np.isnan(fAB).any(axis=(0, 1)))
+   if not valid.all(): print('Samples left out since simulations failed:', int((~valid).sum()), 'of', n)
+   fA, fB, fAB = fA[:, valid], fB[:, valid], fAB[:, :, valid]
+   S1, ST = sobol_indices(fA, fB, fAB)
+   
+   rng = np.random.default_rng(seed)
+   draw = rng.integers(fA.shape[1], size=(bootstrap, fA.shape[1]))
+   S1b, STb = sobol_indices(fA[:, draw], fB[:, draw], np.moveaxis(fAB[:, :, draw], 2, 1))
+   levels = [(100 - confidence)/2, (100 + confidence)/2]
+   S1_conf = np.percentile(S1b, levels, axis=1)
+   ST_conf = np.percentile(STb, levels, axis=1)
+   
+   result = {'parameters': keys, 'kpis': list(kpis.keys()), 'n': int(valid.sum()), 'simulations': (k + 2)*n,
+             'S1': {}, 'ST': {}, 'S1_conf': {}, 'ST_conf': {}}
+   for j, name in enumerate(kpis.keys()):
+      result['S1'][name] = S1[j]; result['ST'][name] = ST[j]
+      result['S1_conf'][name] = S1_conf[:, j]; result['ST_conf'][name] = ST_conf[:, j]
+      print(name)
+      if np.isnan(ST[j]).all(): 
+         print('  no variation of the KPI')
+         continue
+      for i in np.argsort(-ST[j]):
+         print(' ', keys[i].ljust(18), 'S1', np.round(S1[j, i], 3), ' ST', np.round(ST[j, i], 3), 
+               ' ST', confidence, '% interval', np.round(ST_conf[:, j, i], 3))
+   return result
+
+# State estimation by an unscented Kalman filter with the FMU as process model. The states in estimatorStates are
+# estimated with covariance, while the other states follow the weighted mean of the sigma points. Each sigma point
+# is a simulation from the time of the last update, with the states given as start values as in mode 'cont', and
+# the sigma points of one update, or of all reactors of a fleet, are simulated in parallel. Measurements are given
+# as for fit() by names in estimatorMeasurements with model variable and factor, off-gas O2 and CO2 in percent. 
+estimatorStates = ['bioreactor.m[1]', 'bioreactor.m[2]', 'bioreactor.m[3]']
+
+estimatorProcessSd = {'bioreactor.m[1]': 0.5, 'bioreactor.m[2]': 0.5, 'bioreactor.m[3]': 0.2}
+
+estimatorMeasurements = {}
+estimatorMeasurements['DO'] = ('DOsensor.out', 1.0)
+estimatorMeasurements['O2'] = ('bioreactor.x_gas[2]', 100.0)
+estimatorMeasurements['CO2'] = ('bioreactor.x_gas[3]', 100.0)
+estimatorMeasurements['V'] = ('bioreactor.V', 1.0)
+
+estimatorSd = {'DO': 2.0, 'O2': 0.05, 'CO2': 0.05, 'V': 0.02}
+
+def estimator_setup(state=None, sd=None, time=0.0, states=estimatorStates, parValue=parValue, 
+                    model_description=model_description):
+   """ Return an estimator at time with all states in state, as a dictionary like stateValue, and standard 
+       deviation of the estimated states in sd. By default the states are from the start values in parValue 
+       and sd is 20% of the estimated states. Parameters of the reactor are those in parValue now. """
+   if state is None:
+      p = engine_parameters([{}], parValue, parLocation, model_description)
+      state = dict(zip(engineStates, engine_initial(p)[0].tolist()))
+   for key in states:
+      if key not in state.keys():
+         print('Error:', key, '- not a state of the model')
+         return None
+   mean = np.array([state[key] for key in states], dtype=float)
+   if sd is None: sd = {key: 0.2*abs(state[key]) + 1e-3 for key in states}
+   return {'time': float(time), 'state': {key: float(state[key]) for key in state.keys()}, 'states': list(states),
+           'mean': mean, 'P': np.diag([float(sd[key])**2 for key in states]), 'parValue': dict(parValue), 
+           'updates': 0, 'failed': 0}
+
+def estimator_sigma(mean, P, alpha=1.0, beta=2.0, kappa=0.0):
+   """ Return sigma points as rows and the weights of the mean and the covariance """
+   n = len(mean)
+   lam = alpha**2*(n + kappa) - n
+   try:
+      L = np.linalg.cholesky((n + lam)*P)
+   except np.linalg.LinAlgError:
+      L = np.linalg.cholesky((n + lam)*(P + 1e-9*np.eye(n)*max(np.trace(P)/n, 1e-12)))
+   points = np.vstack([mean, mean + L.T, mean - L.T])
+   wm = np.full(2*n + 1, 1/(2*(n + lam))); wm[0] = lam/(n + lam)
+   wc = wm.copy(); wc[0] = wc[0] + 1 - alpha**2 + beta
+   return points, wm, wc
+
+# Define update of the state estimate
+def estimator_update(estimators, measurements, time, sd=estimatorSd, process_sd=estimatorProcessSd, 
+                     definitions=estimatorMeasurements, options=opts_std, processes=None, fmu_model=fmu_model):
+   """ Update the estimator, or a list of estimators of a fleet, with the measurements at time given as a 
+       dictionary of values, or a list of them, where a value can also be a tuple (value, sd). The sigma points 
+       of all estimators are simulated in parallel. An estimator where the simulation of a sigma point failed is 
+       not updated and keeps the prior. Return the estimator or the list updated in place. """
+   single = isinstance(estimators, dict)
+   if single: estimators, measurements = [estimators], [measurements]
+   states = list(stateValue.keys())
+   tasks = []
+   plans = []
+   for estimator, y in zip(estimators, measurements):
+      for name in y.keys():
+         if name not in definitions.keys():
+            print('Error:', name, '- measurement not in estimatorMeasurements')
+            return None
+      dt = time - estimator['time']
+      if dt <= 0:
+         print('Error: time of the measurements not after the time of the estimate')
+         return None
+      points, wm, wc = estimator_sigma(estimator['mean'], estimator['P'])
+      outputs = list(dict.fromkeys(states + [definitions[name][0] for name in y.keys()]))
+      start_parameters = {parLocation[k]:estimator['parValue'][k] for k in estimator['parValue'].keys()}
+      plans.append((len(tasks), points, wm, wc, outputs))
+      for point in points:
+         state = dict(estimator['state'])
+         state.update(zip(estimator['states'], np.maximum(point, 0).tolist()))
+         start_values = dict(start_parameters)
+         start_values.update((stateValueInitial[k], state[k]) for k in states)
+         tasks.append(simu_task(start_values, dt, SimuOptions(options, NCP=1), outputs, estimator['time'], 
+                                fmu_model))
+   results = [None]*len(tasks)
+   for index, res in simu_map(montecarlo_worker, tasks, processes): results[index] = res
+   
+   for estimator, y, (first, points, wm, wc, outputs) in zip(estimators, measurements, plans):
+      runs = results[first:first + len(points)]
+      failed = sum(res is None for res in runs)
+      if failed > 0:
+         print('Warning: simulation of', failed, 'of', len(runs), 'sigma points failed and the estimator is not updated')
+         estimator['failed'] = estimator['failed'] + 1
+         continue
+      
+      # Prediction
+      X = np.array([[float(res[k][-1]) for k in estimator['states']] for res in runs])
+      full = {k: float(wm @ np.array([float(res[k][-1]) for res in runs])) for k in states}
+      mean = wm @ X
+      dX = X - mean
+      dt = time - estimator['time']
+      P = (wc[:, None]*dX).T @ dX + np.diag([process_sd[k]**2*dt for k in estimator['states']])
+      
+      # Correction by the measurements
+      names = list(y.keys())
+      if len(names) > 0:
+         values = np.array([y[name][0] if isinstance(y[name], tuple) else y[name] for name in names], dtype=float)
+         R = np.diag([(y[name][1] if isinstance(y[name], tuple) else sd[name])**2 for name in names])
+         Y = np.array([[definitions[name][1]*float(res[definitions[name][0]][-1]) for name in names] 
+                       for res in runs])
+         y_mean = wm @ Y
+         dY = Y - y_mean
+         Pyy = (wc[:, None]*dY).T @ dY + R
+         Pxy = (wc[:, None]*dX).T @ dY
+         K = np.linalg.solve(Pyy, Pxy.T).T
+         mean = mean + K @ (values - y_mean)
+         P = P - K @ Pyy @ K.T
+         estimator['innovation'] = dict(zip(names, (values - y_mean).tolist()))
+      
+      estimator['mean'] = np.maximum(mean, 0)
+      estimator['P'] = (P + P.T)/2
+      full.update(zip(estimator['states'], estimator['mean'].tolist()))
+      estimator['state'] = full
+      estimator['time'] = float(time)
+      estimator['updates'] = estimator['updates'] + 1
+   return estimators[0] if single else estimators
+
+# Define state estimation over measured data
+def estimate(data, estimator=None, sd=estimatorSd, process_sd=estimatorProcessSd, definitions=estimatorMeasurements,
+             options=opts_std, processes=None, fmu_model=fmu_model):
+   """ Run the estimator through data given as for fit(), a dictionary with names in estimatorMeasurements and 
+       tuples (time, values) or (time, values, sd), updating at each time there is a measurement. Estimator is by
+       default from estimator_setup(). Return dictionary with 'time' and for each estimated state the 'mean' and 
+       'sd' as arrays, and 'estimator' after the last update. """
+   if estimator is None: estimator = estimator_setup()
+   if estimator is None: return None
+   samples = {}
+   for name in data.keys():
+      if name not in definitions.keys():
+         print('Error:', name, '- measurement not in estimatorMeasurements')
+         return None
+      for k, (t, value) in enumerate(zip(np.asarray(data[name][0], dtype=float), np.asarray(data[name][1], dtype=float))):
+         value_sd = np.asarray(data[name][2], dtype=float)[k] if len(data[name]) > 2 else sd[name]
+         samples.setdefault(float(t), {})[name] = (float(value), float(value_sd))
+   times = [estimator['time']]
+   means = [estimator['mean'].copy()]
+   sds = [np.sqrt(np.diag(estimator['P']))]
+   for t in sorted(samples.keys()):
+      if t <= estimator['time']: continue
+      if estimator_update(estimator, samples[t], t, sd, process_sd, definitions, options, processes, 
+                          fmu_model) is None: 
+         break
+      if estimator['time'] != t: continue
+      times.append(t)
+      means.append(estimator['mean'].copy())
+      sds.append(np.sqrt(np.diag(estimator['P'])))
+   means = np.array(means); sds = np.array(sds)
+   result = {'time': np.array(times), 'estimator': estimator}
+   for j, key in enumerate(estimator['states']): result[key] = {'mean': means[:, j], 'sd': sds[:, j]}
+   return result
+
+# Model predictive control of the feed rate over a receding horizon of segments with constant feed. The feed of a
+# segment is given by F_start of the dosagescheme with the exponential phase moved beyond the horizon, and the 
+# segments of a rollout are simulated in sequence in one worker from the states at the end of the previous segment 
+# as in mode 'cont', while the rollouts are simulated in parallel on the FMU sessions kept by the workers. The feed
+# is optimized by the cross-entropy method for maximal biomass at the end of the horizon with penalties on ethanol, 
+# DO below DO_setpoint and changes of the feed, starting from the plan of the previous step shifted one segment.
+mpcSettings = {'segment': 0.25, 'segments': 6, 'feed_min': 0.0, 'feed_max': 0.1, 'rollouts': 16, 'iterations': 4, 
+               'elite': 4, 'NCP': 10}
+
+mpcWeights = {'biomass': 1.0, 'ethanol': 10.0, 'DO': 1.0, 'move': 0.1}
+
+mpcOutputs = ['bioreactor.m[1]', 'bioreactor.c[3]', 'DOsensor.out', 'bioreactor.inlet[1].F']
+
+def mpc_worker(task):
+   """ Simulate the segments with constant feeds of task in sequence in this process. Return dictionary with 
+       'time', the outputs as arrays over all segments and the 'state' at the end, or None if a simulation failed """
+   segments = []
+   t = task['start_time']
+   for feed in task['feeds']:
+      segments.append((t + task['segment'], {parLocation['F_start']: float(feed), 
+                                             parLocation['t_startExp']: t + 2*task['segment']}))
+      t = t + task['segment']
+   try:
+      return simulate_segments(task['fmu_model'], task['start_values'], task['start_time'], segments, 
+                               task['segment']/task['NCP'], task['outputs'], task['solver'])
+   except Exception:
+      return None
+
+def simulate_segments(fmu_model, start_values, start_time, segments, output_interval, outputs, solver=None, 
+                      unzipdir=None):
+   """ Simulate in this process a sequence of segments given as (stop_time, start values changed), each from the 
+       states at the end of the previous as in mode 'cont'. The outputs must include the states. Return dictionary
+       with 'time' and the outputs as arrays over all segments, the 'state' at the end and 'statistics' of the 
+       solver added up over the segments. """
+   start_values = dict(start_values)
+   t = start_time
+   pieces = []
+   statistics = {}
+   for stop_time, changes in segments:
+      start_values.update(changes)
+      statistics_segment = {}
+      res = simulate_session(fmu_model, t, stop_time, output_interval, False, start_values, outputs, None, None, 
+                             solver, statistics_segment, unzipdir)
+      pieces.append(res if len(pieces) == 0 else res[1:])
+      for key, value in statistics_segment.items():
+         if isinstance(value, (int, np.integer)): statistics[key] = statistics.get(key, 0) + int(value)
+      for key in stateValue.keys(): start_values[stateValueInitial[key]] = float(res[key][-1])
+      t = stop_time
+   result = {name: np.concatenate([np.asarray(piece[name], dtype=float) for piece in pieces]) 
+             for name in ['time'] + list(outputs)}
+   result['state'] = {key: float(pieces[-1][key][-1]) for key in stateValue.keys()}
+   result['statistics'] = statistics
+   return result
+
+def mpc_task(state, time, feeds, settings, options, outputs, parValue, fmu_model):
+   """ Return a task description for mpc_worker() """
+   start_values = {parLocation[k]:parValue[k] for k in parValue.keys()}
+   start_values.update((stateValueInitial[k], float(state[k])) for k in stateValue.keys())
+   return {'fmu_model': fmu_model, 'start_values': start_values, 'start_time': float(time), 
+           'segment': settings['segment'], 'feeds': [float(feed) for feed in feeds], 'NCP': settings['NCP'],
+           'outputs': list(dict.fromkeys(list(stateValue.keys()) + outputs)), 'solver': solver_options(options)}
+
+def mpc_cost(res, feeds, previous_feed, weights, settings, parValue):
+   """ Return the cost of a rollout """
+   if res is None: return np.inf
+   shortfall = np.maximum(parValue['DO_setpoint'] - res['DOsensor.out'], 0)
+   moves = np.diff(np.concatenate([[previous_feed], feeds]))/settings['feed_max']
+   return float(- weights['biomass']*(res['bioreactor.m[1]'][-1] - res['bioreactor.m[1]'][0]) 
+                + weights['ethanol']*np.mean(np.maximum(res['bioreactor.c[3]'], 0))
+                + weights['DO']*np.mean(shortfall) + weights['move']*np.sum(moves**2))
+
+# Define one step of model predictive control
+def mpc_step(state=None, start_time=None, previous=None, settings=mpcSettings, weights=mpcWeights, options=opts_std,
+             outputs=mpcOutputs, processes=None, seed=None, parValue=parValue, fmu_model=fmu_model):
+   """ Optimize the feed over the horizon from the state at start_time, by default stateValue and prevFinalTime after
+       simu(), or the 'state' and 'time' of an estimator. The previous step, if given, is shifted one segment
+       as the first guess. Rollouts of an iteration are simulated in parallel. Return dictionary with 'feeds' 
+       over the segments where the first is to be applied, 'cost', 'prediction' of the best rollout, 'rollouts'
+       simulated and 'wall' time. """
+   start = time.perf_counter()
+   if state is None:
+      if prevFinalTime == 0:
+         print("Error: Simulation is first done with default mode = init' or a state is given")
+         return None
+      state, start_time = stateValue, prevFinalTime
+   rng = np.random.default_rng(seed)
+   n = settings['segments']
+   low, high = settings['feed_min'], settings['feed_max']
+   if previous is not None:
+      mean = np.concatenate([previous['feeds'][1:], previous['feeds'][-1:]])
+      previous_feed = float(previous['feeds'][0])
+   else:
+      mean = np.full(n, (low + high)/4)
+      previous_feed = mean[0]
+   sd = np.full(n, (high - low)/4)
+   best = {'cost': np.inf, 'feeds': mean, 'prediction': None}
+   rollouts = 0
+   for iteration in range(settings['iterations']):
+      candidates = np.clip(mean + sd*rng.standard_normal((settings['rollouts'] - 1, n)), low, high)
+      candidates = np.vstack([mean, candidates])
+      tasks = [mpc_task(state, start_time, feeds, settings, options, outputs, parValue, fmu_model) 
+               for feeds in candidates]
+      results = [None]*len(tasks)
+      for index, res in simu_map(mpc_worker, tasks, processes): results[index] = res
+      rollouts = rollouts + len(tasks)
+      costs = np.array([mpc_cost(res, feeds, previous_feed, weights, settings, parValue) 
+                        for res, feeds in zip(results, candidates)])
+      k = int(np.argmin(costs))
+      if costs[k] < best['cost']: best = {'cost': float(costs[k]), 'feeds': candidates[k], 'prediction': results[k]}
+      elite = candidates[np.argsort(costs)[:settings['elite']]]
+      mean = elite.mean(axis=0)
+      sd = np.maximum(elite.std(axis=0), 1e-3*(high - low))
+   if best['prediction'] is None:
+      print('Error: all rollouts failed')
+      return None
+   best.update({'time': float(start_time), 'rollouts': rollouts, 'wall': time.perf_counter() - start})
+   return best
+
+# Define closed loop simulation with model predictive control of the feed
+def simu_mpc(simulationTime=simulationTime, start_time=None, settings=mpcSettings, weights=mpcWeights, 
+             options=opts_std, outputs=mpcOutputs, processes=None, seed=None, verbose=True, parValue=parValue, 
+             fmu_model=fmu_model):
+   """ Simulate the culture with the feed from mpc_step() applied for one segment at a time, from the start
+       values in parValue or from start_time of a stored culture in stateValue after simu(). Nothing is plotted
+       and sim_res, prevFinalTime and stateValue are not changed. Return dictionary with 'time' and the outputs 
+       as arrays, 'feeds' applied at 'steps' and the 'wall' time of each step of the controller. """
+   if start_time is None:
+      p = engine_parameters([{}], parValue, parLocation, model_description)
+      state, t = dict(zip(engineStates, engine_initial(p)[0].tolist())), 0.0
+   else:
+      state, t = dict(stateValue), start_time
+   rng = np.random.default_rng(seed)
+   steps, feeds, walls, pieces = [], [], [], []
+   plan = None
+   stop_time = t + simulationTime
+   while t < stop_time - settings['segment']/2:
+      plan = mpc_step(state, t, plan, settings, weights, options, outputs, processes, rng, parValue, fmu_model)
+      if plan is None: break
+      res = mpc_worker(mpc_task(state, t, plan['feeds'][:1], settings, options, outputs, parValue, fmu_model))
+      if res is None:
+         print('Error: simulation of the culture failed at time', t)
+         break
+      pieces.append(res if len(pieces) == 0 else {name: res[name][1:] for name in ['time'] + outputs})
+      steps.append(t); feeds.append(float(plan['feeds'][0])); walls.append(plan['wall'])
+      state, t = res['state'], float(res['time'][-1])
+      if verbose: 
+         print('Time', round(t, 3), ': feed', round(feeds[-1], 5), ' cost', round(plan['cost'], 4), 
+               ' wall', round(walls[-1], 3), 's')
+   result = {'steps': np.array(steps), 'feeds': np.array(feeds), 'wall': np.array(walls)}
+   for name in ['time'] + outputs: 
+      result[name] = np.concatenate([piece[name] for piece in pieces]) if pieces else np.array([])
+   return result
+
+# Fleet of reactors with different recipes simulated side by side in the persistent pool of worker processes. 
+# Each reactor is a dictionary with 'parValue' changed from parValue and optionally 'setpoints' as a list of 
+# (time, parValue changed) applied during the culture by continuing from the states as in mode 'cont'. The FMU is
+# extracted once and shared by the workers, that each load the binary once and keep the FMU instance between 
+# reactors. The result of each reactor is saved in the result store as soon as it is ready.
+fleetOutputs = ['bioreactor.c[1]', 'bioreactor.c[2]', 'bioreactor.c[3]', 'DOsensor.out', 'bioreactor.N', 
+                'bioreactor.V', 'bioreactor.inlet[1].F']
+
+def fleet_worker(task):
+   """ Simulate one reactor of the fleet described by task and return result as simulate_segments() with the
+       'name' of the reactor, or with 'error' if the simulation failed """
+   try:
+      result = simulate_segments(task['fmu_model'], task['start_values'], 0, task['segments'], 
+                                 task['output_interval'], task['outputs'], task['solver'], task['unzipdir'])
+   except Exception as error:
+      return {'name': task['name'], 'error': type(error).__name__ + ': ' + str(error)}
+   result['name'] = task['name']
+   return result
+
+# Define fleet simulation
+def simu_fleet(reactors, simulationTime=simulationTime, outputs=fleetOutputs, options=opts_std, processes=None, 
+               directory=None, verbose=True, parValue=parValue, parLocation=parLocation, fmu_model=fmu_model):
+   """ Simulate the reactors, a dictionary with names or a list, each a dictionary with 'parValue' changed and 
+       optionally 'setpoints' as [(time, {key: value}), ...], in parallel from time 0 to simulationTime. Setpoints
+       at time 0 or before are start values and those at simulationTime or later are not applied. Results are 
+       saved with the name of the reactor as run_id in the result store in directory, by default that of 
+       result_store_setup() or fmu_explore_results. Nothing is plotted and sim_res and stateValue are not changed.
+       Return dictionary with 'run_ids' and 'errors' by name, 'reactor_hours' simulated, 'wall' time and 
+       'throughput' in reactor-hours per wall-second. Open the results by result_open(directory). """
+   if isinstance(reactors, (list, tuple)): reactors = {'reactor_'+str(k): reactor for k, reactor in enumerate(reactors)}
+   if directory is None: directory = resultStore['directory'] or 'fmu_explore_results'
+   for name, reactor in reactors.items():
+      changes = [reactor.get('parValue', {})] + [change for _, change in reactor.get('setpoints', [])]
+      for key in set(key for change in changes for key in change.keys()):
+         if key not in parValue.keys():
+            print('Error:', key, '- seems not an accessible parameter - check the spelling')
+            return None
+   start = time.perf_counter()
+   unzipdir = fmu_shared_extract(fmu_model)
+   outputs = list(dict.fromkeys(list(stateValue.keys()) + list(outputs)))
+   tasks = []
+   for name, reactor in reactors.items():
+      parValueLocal = dict(parValue)
+      parValueLocal.update(reactor.get('parValue', {}))
+      segments = []
+      for t, change in sorted(reactor.get('setpoints', []), key=lambda setpoint: setpoint[0]):
+         if t <= 0:
+            parValueLocal.update(change)
+         elif t < simulationTime: 
+            segments.append((t, {parLocation[k]:change[k] for k in change.keys()}))
+         else:
+            print('Warning:', name, '- setpoints at time', t, 'not applied since after the end of the culture')
+      stops = [t for t, _ in segments[1:]] + [simulationTime]
+      segments = [(simulationTime, {})] if not segments else \
+                 [(segments[0][0], {})] + [(stop, change) for stop, (_, change) in zip(stops, segments)]
+      tasks.append({'name': name, 'fmu_model': fmu_model, 'unzipdir': unzipdir, 'segments': segments,
+                    'start_values': {parLocation[k]:parValueLocal[k] for k in parValueLocal.keys()},
+                    'output_interval': simulationTime/options['NCP'], 'outputs': outputs, 
+                    'solver': solver_options(options), 'parValue': parValueLocal, 
+                    'setpoints': reactor.get('setpoints', [])})
+   
+   run_ids, errors = {}, {}
+   for index, res in simu_map(fleet_worker, tasks, processes):
+      name = tasks[index]['name']
+      if 'error' in res:
+         errors[name] = res['error']
+         if verbose: print('Error:', name, '-', res['error'])
+         continue
+      statistics = res.pop('statistics')
+      res.pop('state'); res.pop('name')
+      run_ids[name] = result_save(res, directory, name, tasks[index]['parValue'], 
+                                  {'reactor': name, 'setpoints': tasks[index]['setpoints'], 'statistics': statistics})
+      if verbose: print('Reactor', name, 'saved')
+   wall = time.perf_counter() - start
+   reactor_hours = simulationTime*len(run_ids)
+   result = {'run_ids': run_ids, 'errors': errors, 'reactor_hours': reactor_hours, 'wall': wall, 
+             'throughput': reactor_hours/wall, 'directory': directory}
+   if verbose: 
+      print('Reactors', len(run_ids), 'of', len(tasks), ':', round(reactor_hours, 2), 'reactor-hours in', 
+            round(wall, 2), 's, throughput', round(reactor_hours/wall, 1), 'reactor-hours per wall-second')
+   return result
+
 # Describe model parts of the combined system
 def describe_parts(component_list=[]):
    """List all parts of the model""" 
@@ -753,7 +3362,7 @@ def describe_parts(component_list=[]):
       return name
     
 #   variables = list(model.get_model_variables().keys())
-   variables = [v.name for v in model_description.modelVariables]
+   variables = [prefix for prefix in model_catalogue(model_description)['prefix'].keys() if '.' not in prefix]
         
    for i in range(len(variables)):
       component = model_component(variables[i])
@@ -777,7 +3386,7 @@ def describe_general(name, decimals, parLocation=parLocation):
       print(description,'[',unit,']')
       
    elif name == 'process':
-      print(read_model_description(fmu_model).description)      
+      print(model_catalogue(model_description)['model_description'].description)      
       
    elif name in parLocation.keys():
       description = model_get_variable_description(parLocation[name])
@@ -811,6 +3420,7 @@ def describe_general(name, decimals, parLocation=parLocation):
 
 # Plot process diagram
 def process_diagram(fmu_model=fmu_model, fmu_process_diagram=fmu_process_diagram):   
+   matplotlib_import()
    try:
        processDiagram = zipfile.ZipFile(fmu_model, 'r').open('documentation/processDiagram.png')
    except KeyError:
@@ -844,7 +3454,7 @@ def BPL_info():
 def system_info():
    """Print system information"""
 #   FMU_type = model.__class__.__name__
-   constants = [v for v in model_description.modelVariables if v.causality == 'local']
+   model_description_local = model_catalogue(model_description)['model_description']
    
    print()
    print('System information')
@@ -856,14 +3466,14 @@ def system_info():
    except NameError:
        print(' -Scipy: not installed in the notebook')
    print(' -FMPy:', version('fmpy'))
-   print(' -FMU by:', read_model_description(fmu_model).generationTool)
-   print(' -FMI:', read_model_description(fmu_model).fmiVersion)
-   if model_description.modelExchange is None:
+   print(' -FMU by:', model_description_local.generationTool)
+   print(' -FMI:', model_description_local.fmiVersion)
+   if model_description_local.modelExchange is None:
       print(' -Type: CS')
    else:
       print(' -Type: ME')
-   print(' -Name:', read_model_description(fmu_model).modelName)
-   print(' -Generated:', read_model_description(fmu_model).generationDateAndTime)
+   print(' -Name:', model_description_local.modelName)
+   print(' -Generated:', model_description_local.generationDateAndTime)
    print(' -MSL:', MSL_version)    
    print(' -Description:', BPL_version)   
    print(' -Interaction:', FMU_explore)
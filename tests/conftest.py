@@ -0,0 +1,62 @@
+# Tests of FMU-explore for the yeast fedbatch cultivation, run from the top directory by: python -m pytest tests
+#
+# The scripts are imported headless from the directory of the FMU. Where the locale en_US.UTF-8 the scripts
+# set on Linux is not installed the C.UTF-8 locale is used instead.
+
+import os
+import sys
+import locale
+import importlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def script_import(name):
+   """ Import the script name from the top directory headless """
+   setlocale = locale.setlocale
+   def setlocale_available(category, value=None):
+      try:
+         return setlocale(category, value)
+      except locale.Error:
+         return setlocale(category, 'C.UTF-8')
+   cwd = os.getcwd()
+   os.environ['FMU_EXPLORE_HEADLESS'] = '1'
+   if ROOT not in sys.path: sys.path.insert(0, ROOT)
+   locale.setlocale = setlocale_available
+   os.chdir(ROOT)
+   try:
+      return importlib.import_module(name)
+   finally:
+      locale.setlocale = setlocale
+      os.chdir(cwd)
+
+@pytest.fixture(scope='session')
+def fmpy_explore():
+   """ The FMPy script, skipped where FMPy is not installed """
+   pytest.importorskip('fmpy')
+   return script_import('BPL_YEAST_AIR_Fedbatch_DOcontrol_fmpy_explore')
+
+@pytest.fixture()
+def explore(fmpy_explore, monkeypatch):
+   """ The FMPy script with the working directory of the FMU and parValue restored after the test """
+   monkeypatch.chdir(ROOT)
+   parValue = dict(fmpy_explore.parValue)
+   yield fmpy_explore
+   fmpy_explore.parValue.clear()
+   fmpy_explore.parValue.update(parValue)
+
+@pytest.fixture(scope='session')
+def pyfmi_explore():
+   """ The PyFMI script, skipped where PyFMI is not installed """
+   pytest.importorskip('pyfmi')
+   return script_import('BPL_YEAST_AIR_Fedbatch_DOcontrol_explore')
+
+@pytest.fixture()
+def explore_pyfmi(pyfmi_explore, monkeypatch):
+   """ The PyFMI script with the working directory of the FMU and parValue restored after the test """
+   monkeypatch.chdir(ROOT)
+   parValue = dict(pyfmi_explore.parValue)
+   yield pyfmi_explore
+   pyfmi_explore.parValue.clear()
+   pyfmi_explore.parValue.update(parValue)
@@ -0,0 +1,27 @@
+import numpy as np
+
+def test_output_adaptive_within_tolerance(explore):
+   t = np.linspace(0, 10, 2001)
+   res = np.empty(len(t), dtype=[('time', float), ('a', float), ('b', float)])
+   res['time'] = t; res['a'] = np.sin(t); res['b'] = np.where(t < 5, 0.0, t - 5)
+   kept = explore.output_adaptive(res, 1e-3)
+   assert len(kept) < len(res)/5
+   assert kept['time'][0] == 0 and kept['time'][-1] == 10
+   for name in ['a', 'b']:
+      error = np.abs(np.interp(t, kept['time'], kept[name]) - res[name])/np.ptp(res[name])
+      assert error.max() <= 1e-3
+
+def test_output_adaptive_keeps_events(explore):
+   t = np.array([0.0, 1.0, 2.0, 2.0, 3.0, 4.0])
+   res = np.empty(len(t), dtype=[('time', float), ('a', float)])
+   res['time'] = t; res['a'] = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+   kept = explore.output_adaptive(res)
+   assert list(kept['time']) == [0.0, 2.0, 2.0, 4.0]
+
+def test_simu_run_adaptive(explore):
+   uniform = explore.simu_run(8, options=explore.SimuOptions(NCP=200))
+   adaptive = explore.simu_run(8, options=explore.SimuOptions(NCP=200, output='adaptive'))
+   statistics = adaptive.info['statistics']
+   assert statistics['output_points'] == len(adaptive['time']) < statistics['recorded_points']
+   for key in ['bioreactor.m[1]', 'bioreactor.V']:
+      assert np.isclose(adaptive.final(key), uniform.final(key), rtol=1e-4)
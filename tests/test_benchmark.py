@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from conftest import script_import
+
+@pytest.fixture(scope='module')
+def benchmark():
+   return script_import('BPL_YEAST_AIR_Fedbatch_DOcontrol_benchmark')
+
+@pytest.mark.parametrize('shift', [0.0, 0.5, 2.0])
+def test_mann_whitney_as_scipy(benchmark, shift):
+   stats = pytest.importorskip('scipy.stats')
+   rng = np.random.default_rng(11)
+   x = list(np.round(rng.normal(0, 1, 12), 1)); y = list(np.round(rng.normal(shift, 1, 9), 1))
+   expected = stats.mannwhitneyu(x, y, use_continuity=True, alternative='two-sided', method='asymptotic').pvalue
+   assert np.isclose(benchmark.mann_whitney(x, y), expected)
+
+def test_compare_verdicts(benchmark):
+   def results(samples):
+      return {'cases': {name: benchmark.summary(values, 1) for name, values in samples.items()}}
+   base = results({'a': [1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 1.0], 'b': [1.0]*7, 'c': [1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 1.0]})
+   new = results({'a': [2.0, 2.1, 1.9, 2.0, 2.05, 1.95, 2.0], 'b': [1.0]*7, 'c': [0.5, 0.55, 0.45, 0.5, 0.52, 0.48, 0.5]})
+   comparison = benchmark.compare(new, base, 0.05, 0.05)
+   assert {name: c['verdict'] for name, c in comparison.items()} == {'a': 'slower', 'b': 'unchanged', 'c': 'faster'}
+
+def test_compare_needs_repetitions(benchmark):
+   base = {'cases': {'a': benchmark.summary([1.0, 1.1, 0.9], 1)}}
+   new = {'cases': {'a': benchmark.summary([2.0, 2.1, 1.9], 1)}}
+   assert benchmark.compare(new, base, 0.05, 0.05)['a']['verdict'] == 'not enough repetitions to compare'
+   base = {'cases': {'a': benchmark.summary([1.0, 1.1, 0.9, 1.0, 1.05], 1)}}
+   new = {'cases': {'a': benchmark.summary([2.0, 2.1, 1.9, 2.0, 2.05], 1)}}
+   assert benchmark.compare(new, base, 0.05, 0.05)['a']['verdict'] == 'slower'
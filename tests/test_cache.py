@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+@pytest.fixture()
+def cache(explore, tmp_path):
+   directory = str(tmp_path/'cache')
+   explore.result_cache_setup(directory)
+   yield directory
+   explore.result_cache_setup(None)
+
+def test_cache_round_trip(explore, cache):
+   first = explore.simu_run(4, outputs=['DOsensor.out'])
+   stateValue = dict(explore.stateValue)
+   hits = explore.resultCache['hits']
+   second = explore.simu_run(4, outputs=['DOsensor.out'])
+   assert explore.resultCache['hits'] == hits + 1
+   assert set(second.keys()) == set(first.keys())
+   for name in first.keys(): assert np.array_equal(second[name], first[name])
+   assert explore.stateValue == stateValue
+   assert explore.prevFinalTime == 4
+
+def test_cache_miss_on_parameter_change(explore, cache):
+   explore.simu_run(4)
+   hits = explore.resultCache['hits']
+   explore.par(DO_setpoint=25)
+   explore.simu_run(4)
+   assert explore.resultCache['hits'] == hits
+   assert len(os.listdir(cache)) == 2
+
+def test_cache_continuation_from_hit(explore, cache):
+   explore.simu_run(4)
+   explore.simu_run(2, 'cont')
+   miss = explore.sim_res.copy()
+   explore.simu_run(4)
+   explore.simu_run(2, 'cont')
+   assert np.array_equal(explore.sim_res, miss)
+
+def test_cache_evicts_least_recently_used(explore, cache):
+   explore.simu_run(4)
+   size = sum(os.path.getsize(os.path.join(cache, file)) for file in os.listdir(cache))
+   explore.resultCache['size_limit'] = 2.5*size
+   for DO_setpoint in [20, 25, 30]:
+      explore.par(DO_setpoint=DO_setpoint)
+      explore.simu_run(4)
+   assert len(os.listdir(cache)) == 2
+   explore.par(DO_setpoint=30)
+   hits = explore.resultCache['hits']
+   explore.simu_run(4)
+   assert explore.resultCache['hits'] == hits + 1
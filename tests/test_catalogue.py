@@ -0,0 +1,21 @@
+import pytest
+
+def test_catalogue_as_scan_of_model_variables(explore):
+   variables = explore.model_description.modelVariables
+   for variable in variables[::7]:
+      assert explore.model_variables(variable.name) == [v for v in variables if v.name == variable.name]
+   assert explore.model_variables('not.a.variable') == []
+   assert explore.model_variables('culture.q', substring=True) == [v for v in variables if 'culture.q' in v.name]
+
+def test_catalogue_component_variables(explore):
+   names = explore.model_component_variables('bioreactor.culture')
+   assert len(names) > 0 and all(name.startswith('bioreactor.culture.') for name in names)
+   assert set(names) == {v.name for v in explore.model_description.modelVariables 
+                         if v.name.startswith('bioreactor.culture.')}
+
+@pytest.mark.parametrize('key', ['qGmax', 'Ks', 'DO_setpoint', 'VX_start'])
+def test_catalogue_description_and_unit(explore, key):
+   variable, = [v for v in explore.model_description.modelVariables if v.name == explore.parLocation[key]]
+   assert explore.model_get_variable_description(explore.parLocation[key]) == variable.description
+   assert explore.model_get_variable_unit(explore.parLocation[key]) == variable.unit
+   assert explore.model_get(explore.parLocation[key]) == float(variable.start)
@@ -0,0 +1,18 @@
+def test_continuation_plan(explore):
+   plan = explore.continuation_plan()
+   assert explore.continuation_plan() is plan
+   starts = set(explore.stateValueInitial.values())
+   assert not any(explore.parLocation[k] in starts for k in plan['par_real'] + plan['par_other'])
+   assert len(plan['valueReference']) == len(plan['par_real']) + len(plan['states'])
+
+def test_continuation_with_parameter_changed(explore):
+   explore.simu_run(6)
+   stateValue = dict(explore.stateValue)
+   same = explore.simu_run(2, 'cont', outputs=['DOsensor.out'])
+   explore.stateValue.update(stateValue); explore.prevFinalTime = 6
+   explore.par(mu_feed=1.5)
+   changed = explore.simu_run(2, 'cont', outputs=['DOsensor.out'])
+   assert same['time'][0] == changed['time'][0] == 6
+   assert same['bioreactor.V'][0] == changed['bioreactor.V'][0]
+   assert changed.final('bioreactor.V') > same.final('bioreactor.V') + 0.1
+   assert changed.final('bioreactor.m[1]') > 1.5*same.final('bioreactor.m[1]')
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+def test_diagram_expression(explore):
+   function, names = explore.diagram_expression('bioreactor.m[1]*bioreactor.culture.qO2 - 2/bioreactor.V')
+   assert names == {'bioreactor.m[1]', 'bioreactor.culture.qO2', 'bioreactor.V'}
+   data = {'bioreactor.m[1]': np.array([1.0, 2.0]), 'bioreactor.culture.qO2': np.array([3.0, 4.0]),
+           'bioreactor.V': np.array([4.0, 8.0])}
+   assert np.allclose(function(data), [2.5, 7.75])
+   function, names = explore.diagram_expression('-time')
+   assert names == set() and np.array_equal(function({'time': np.arange(3.0)}), -np.arange(3.0))
+
+@pytest.mark.parametrize('expression', ['bioreactor.not_a_variable', '__import__("os")', 'bioreactor.V(1)'])
+def test_diagram_expression_rejected(explore, expression):
+   with pytest.raises(ValueError):
+      explore.diagram_expression(expression)
+
+def test_diagrams_variables_recorded(explore):
+   diagrams = [explore.diagram('ax11', 'bioreactor.c[2]', color='b'), 
+               explore.diagram('ax21', 'bioreactor.m[1]*bioreactor.culture.qO2', x='bioreactor.V'),
+               explore.diagram('ax21', kind='ylim', limits=[0, 1])]
+   assert set(explore.diagrams_variables(diagrams)) == {'bioreactor.c[2]', 'bioreactor.m[1]', 
+                                                        'bioreactor.culture.qO2', 'bioreactor.V'}
+   assert explore.diagram_compile(diagrams[1]) is explore.diagram_compile(dict(diagrams[1]))
+   res = explore.simu_run(2, diagrams=diagrams)
+   assert {'bioreactor.c[2]', 'bioreactor.culture.qO2', 'bioreactor.V'} <= set(res.keys())
@@ -0,0 +1,27 @@
+import numpy as np
+
+def test_engine_as_fmu(explore):
+   grid = [{}, {'mu_feed': 0.2}, {'qGmax': 0.015}]
+   deviation = explore.engine_validate(grid, simulationTime=10, options=explore.SimuOptions(NCP=200), processes=1)
+   for name in ['bioreactor.c[1]', 'bioreactor.c[2]', 'bioreactor.c[3]', 'bioreactor.V']:
+      assert deviation[name] < 2e-3
+   assert deviation['DOsensor.out'] < 0.03
+
+def test_engine_scenarios_independent(explore):
+   options = explore.SimuOptions(NCP=100)
+   together = explore.simu_engine({'mu_feed': [0.1, 0.2]}, simulationTime=10, options=options)
+   alone = explore.simu_engine([{'mu_feed': 0.2}], simulationTime=10, options=options)
+   for name in explore.sweepOutputs:
+      assert together[name].shape == (2, 101)
+      assert np.allclose(together[name][1], alone[name][0], rtol=1e-12, atol=1e-12)
+
+def test_engine_output_missing(explore):
+   assert explore.simu_engine(outputs=['bioreactor.not_a_variable']) is None
+
+def test_engine_as_fmu_with_controller_active(explore):
+   grid = [{'F_max': 0.5, 'mu_feed': 0.3}]
+   deviation = explore.engine_validate(grid, simulationTime=20, options=explore.SimuOptions(NCP=400), processes=1)
+   assert deviation['bioreactor.N'] < 1e-3
+   assert deviation['DOsensor.out'] < 0.03
+   for name in ['bioreactor.c[1]', 'bioreactor.c[2]', 'bioreactor.c[3]']:
+      assert deviation[name] < 2e-3
@@ -0,0 +1,43 @@
+import numpy as np
+
+def test_estimator_sigma_mean_and_covariance(explore):
+   rng = np.random.default_rng(10)
+   A = rng.random((3, 3))
+   P = A @ A.T + 0.1*np.eye(3)
+   mean = np.array([1.0, 2.0, 3.0])
+   for alpha, kappa in [(1.0, 0.0), (0.5, 1.0)]:
+      points, wm, wc = explore.estimator_sigma(mean, P, alpha=alpha, kappa=kappa)
+      assert points.shape == (7, 3) and np.isclose(wm.sum(), 1)
+      assert np.allclose(wm @ points, mean)
+      d = points - wm @ points
+      assert np.allclose((wc[:, None]*d).T @ d, P)
+
+def test_estimate_converges_to_the_culture(explore):
+   options = explore.SimuOptions(NCP=60)
+   truth = explore.simu_run(6, options=options, outputs=['DOsensor.out', 'bioreactor.x_gas[3]'])
+   time = np.arange(0.5, 6.01, 0.5)
+   data = {'DO': (time, np.interp(time, truth['time'], truth['DOsensor.out'])),
+           'CO2': (time, 100*np.interp(time, truth['time'], truth['bioreactor.x_gas[3]'])),
+           'V': (time, np.interp(time, truth['time'], truth['bioreactor.V']))}
+   p = explore.engine_parameters([{}], explore.parValue, explore.parLocation, explore.model_description)
+   state = dict(zip(explore.engineStates, explore.engine_initial(p)[0].tolist()))
+   state['bioreactor.m[1]'] = 1.5*state['bioreactor.m[1]']
+   estimator = explore.estimator_setup(state)
+   result = explore.estimate(data, estimator, options=options, processes=1)
+   assert np.array_equal(result['time'][1:], time)
+   error_start = abs(result['bioreactor.m[1]']['mean'][0] - truth['bioreactor.m[1]'][0])
+   error_end = abs(result['bioreactor.m[1]']['mean'][-1] - truth.final('bioreactor.m[1]'))
+   assert error_end < 0.2*error_start
+   assert result['bioreactor.m[1]']['sd'][-1] < result['bioreactor.m[1]']['sd'][0]
+
+def test_estimator_not_updated_when_sigma_point_failed(explore, monkeypatch, capsys):
+   simu_map = explore.simu_map
+   def simu_map_failed(function, tasks, processes):
+      for index, res in simu_map(function, tasks, processes): yield index, (None if index == 2 else res)
+   monkeypatch.setattr(explore, 'simu_map', simu_map_failed)
+   estimator = explore.estimator_setup()
+   mean, P = estimator['mean'].copy(), estimator['P'].copy()
+   explore.estimator_update(estimator, {'DO': 90.0}, 0.5, options=explore.SimuOptions(NCP=10), processes=1)
+   assert 'Warning: simulation of 1 of 7 sigma points failed' in capsys.readouterr().out
+   assert estimator['failed'] == 1 and estimator['updates'] == 0 and estimator['time'] == 0
+   assert np.array_equal(estimator['mean'], mean) and np.array_equal(estimator['P'], P)
@@ -0,0 +1,43 @@
+import numpy as np
+
+def test_fit_residuals(explore):
+   res = {'time': np.array([0.0, 1.0, 2.0]), 'bioreactor.c[1]': np.array([1.0, 2.0, 3.0])}
+   data = {'X': ([0.5, 2.0], [1.5, 2.5], 0.5)}
+   assert np.allclose(explore.fit_residuals(res, data, explore.fitMeasurements), [0.0, 1.0])
+
+def test_fit_recovers_parameter(explore):
+   options = explore.SimuOptions(NCP=100)
+   explore.par(qGmax=1.1*explore.parValue['qGmax'])
+   res = explore.simu_run(8, options=options, outputs=['bioreactor.c[1]', 'bioreactor.c[2]'])
+   qGmax = explore.parValue['qGmax']
+   explore.par(qGmax=qGmax/1.1)
+   time = np.linspace(0.5, 8, 16)
+   data = {'X': (time, np.interp(time, res['time'], res['bioreactor.c[1]'])), 
+           'G': (time, np.interp(time, res['time'], res['bioreactor.c[2]']))}
+   result = explore.fit(data, ['qGmax'], iterations=10, options=options, processes=1)
+   assert result['history'][-1]['cost'] < 1e-2*result['history'][0]['cost']
+   assert np.isclose(result['parValue']['qGmax'], qGmax, rtol=1e-2)
+
+def test_fit_jacobian_only_after_a_step_taken(explore, monkeypatch):
+   evaluations = []
+   def fit_simulate(thetas, *arguments):
+      thetas = np.asarray(thetas)
+      if len(thetas) == 2 and np.allclose(thetas[1] - thetas[0], [-1e-2, 1e-2]): evaluations.append(thetas[0] - [1e-2, 0])
+      with np.errstate(over='ignore'):
+         return [np.tanh([np.exp(theta[0] + theta[1]) - 2, np.exp(theta[0]) + np.exp(2*theta[1]) - 5, 
+                          0.1*np.exp(theta[0]) - 0.1]) for theta in thetas]
+   monkeypatch.setattr(explore, 'fit_simulate', fit_simulate)
+   data = {'X': ([1.0], [0.0])}
+   explore.par(qGmax=0.01, Ks=0.01)
+   result = explore.fit(data, ['qGmax', 'Ks'], iterations=15, tolerance=1e-12, processes=1)
+   accepted = [np.log(list(h['parValue'].values())) for k, h in enumerate(result['history']) 
+               if k == 0 or h['cost'] < result['history'][k-1]['cost']]
+   rejected = len(result['history']) - len(accepted)
+   assert rejected > 0
+   assert len(evaluations) == len(accepted)
+   assert np.allclose(evaluations, accepted)
+   assert result['simulations'] == 1 + 2*len(accepted) + 3*(len(result['history']) - 1)
+   theta = np.log(list(result['parValue'].values()))
+   J = np.column_stack([(fit_simulate([theta + 1e-2*e])[0] - fit_simulate([theta])[0])/1e-2 for e in np.eye(2)])
+   covariance = np.linalg.inv(J.T @ J)*result['cost']/max(result['n'] - 2, 1)
+   assert np.allclose(list(result['sd'].values()), np.exp(theta)*np.sqrt(np.diag(covariance)))
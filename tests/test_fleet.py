@@ -0,0 +1,22 @@
+import numpy as np
+
+def test_fleet_setpoints_at_start_and_after_end(explore, tmp_path, capsys):
+   reactors = {'start': {'setpoints': [(0, {'DO_setpoint': 25}), (explore.simulationTime + 1, {'DO_setpoint': 40})]},
+               'par': {'parValue': {'DO_setpoint': 25}}}
+   result = explore.simu_fleet(reactors, processes=1, directory=str(tmp_path), verbose=False)
+   assert result['errors'] == {}
+   assert 'Warning: start' in capsys.readouterr().out
+   start = explore.result_open(str(tmp_path), result['run_ids']['start'])
+   par = explore.result_open(str(tmp_path), result['run_ids']['par'])
+   assert start.parValue['DO_setpoint'] == 25
+   assert np.array_equal(start['DOsensor.out'], par['DOsensor.out'])
+
+def test_fleet_setpoint_during_culture(explore, tmp_path):
+   reactors = {'change': {'setpoints': [(4, {'mu_feed': 0.3})]}, 'default': {}}
+   result = explore.simu_fleet(reactors, processes=1, directory=str(tmp_path), verbose=False)
+   change = explore.result_open(str(tmp_path), result['run_ids']['change'])
+   default = explore.result_open(str(tmp_path), result['run_ids']['default'])
+   assert change.time[-1] == default.time[-1] == explore.simulationTime
+   before = change.time <= 4
+   assert np.allclose(change['bioreactor.V'][before], default['bioreactor.V'][before])
+   assert change.final('bioreactor.V') > default.final('bioreactor.V') + 0.1
@@ -0,0 +1,26 @@
+import numpy as np
+
+def test_headless_without_matplotlib(explore):
+   assert explore.headless
+   assert 'plt' not in vars(explore)
+   explore.simu(1)
+   assert 'plt' not in vars(explore)
+
+def test_simu_run_result(explore):
+   result = explore.simu_run(3, outputs=['DOsensor.out'])
+   assert isinstance(result, explore.SimuResult)
+   assert result.start_time == 0 and result.final_time == 3 == explore.prevFinalTime
+   assert np.array_equal(result.time, result['time']) and 'DOsensor.out' in result
+   assert result.final('bioreactor.V') == result['bioreactor.V'][-1]
+   assert result.stateValue == explore.stateValue
+   explore.par(DO_setpoint=25)
+   assert result.parValue['DO_setpoint'] != 25
+   cont = explore.simu_run(1, 'cont')
+   assert cont.start_time == 3 and cont.final_time == 4
+
+def test_simu_run_continued_as_one_simulation(explore):
+   whole = explore.simu_run(4)
+   explore.simu_run(2)
+   cont = explore.simu_run(2, 'cont')
+   for key in ['bioreactor.m[1]', 'bioreactor.m[2]', 'bioreactor.V']:
+      assert np.isclose(cont.final(key), whole.final(key), rtol=1e-3)
@@ -0,0 +1,36 @@
+import itertools
+
+import numpy as np
+import pytest
+
+def colors_valid(pattern, colors):
+   columns = [j for group in colors for j in group]
+   if sorted(columns) != [j for j in range(pattern.shape[1]) if pattern[:, j].any()]: return False
+   return all(not np.any(pattern[:, i] & pattern[:, j]) for group in colors for i, j in itertools.combinations(group, 2))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_jacobian_colors_random_pattern(explore, seed):
+   rng = np.random.default_rng(seed)
+   pattern = rng.random((30, 30)) < 0.1
+   assert colors_valid(pattern, explore.jacobian_colors(pattern))
+
+def test_jacobian_colors_diagonal_and_full(explore):
+   assert len(explore.jacobian_colors(np.eye(8, dtype=bool))) == 1
+   assert len(explore.jacobian_colors(np.ones((8, 8), dtype=bool))) == 8
+   assert explore.jacobian_colors(np.zeros((8, 8), dtype=bool)) == []
+
+@pytest.mark.parametrize('fmu', ['BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_om_me.fmu', 
+                                 'BPL_YEAST_AIR_Fedbatch_DOcontrol_linux_2204_om_me.fmu'])
+def test_jacobian_pattern_of_the_fmu_given(explore, fmu):
+   pattern = explore.jacobian_pattern(fmu)
+   if pattern is None: pytest.skip('no sparsity pattern in the FMU')
+   n = explore.read_model_description(fmu).numberOfContinuousStates
+   assert pattern.shape == (n, n)
+   assert colors_valid(pattern, explore.jacobian_colors(pattern))
+
+def test_linearize_sparse_as_dense(explore):
+   times = [0.5, 4.0, 8.0]
+   sparse = explore.linearize(times, sparsity=True)
+   dense = explore.linearize(times, sparsity=False)
+   assert sparse['evaluations'] <= dense['evaluations']
+   assert np.allclose(sparse['A'], dense['A'], rtol=1e-4, atol=1e-6)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('distribution', ['normal', 'exponential', 'uniform'])
+def test_quantile_stream_as_numpy_quantile(explore, distribution):
+   rng = np.random.default_rng(3)
+   X = getattr(rng, distribution)(size=(5000, 7))*np.arange(1, 8)
+   percentiles = [5, 25, 50, 75, 95]
+   state = explore.quantile_stream_init(percentiles, X.shape[1])
+   for x in X: explore.quantile_stream_update(state, x)
+   estimate = explore.quantile_stream_result(state)
+   exact = np.quantile(X, np.array(percentiles)/100, axis=0)
+   spread = np.quantile(X, 0.95, axis=0) - np.quantile(X, 0.05, axis=0)
+   assert estimate.shape == (len(percentiles), X.shape[1])
+   assert np.all(np.abs(estimate - exact) < 0.03*spread)
+
+def test_quantile_stream_few_samples(explore):
+   state = explore.quantile_stream_init([50], 3)
+   assert explore.quantile_stream_result(state) is None
+   X = np.array([[1.0, 2.0, 3.0], [3.0, 2.0, 1.0], [2.0, 2.0, 2.0]])
+   for x in X: explore.quantile_stream_update(state, x)
+   assert np.array_equal(explore.quantile_stream_result(state), np.percentile(X, [50], axis=0))
+
+def test_montecarlo_sample_moments(explore):
+   distributions = {'a': ('normal', 2.0, 0.5), 'b': ('lognormal', 3.0, 0.2), 'c': ('uniform', 1.0, 2.0),
+                    'd': ('triangular', 0.0, 4.0)}
+   samples = explore.montecarlo_sample(distributions, 100000, np.random.default_rng(4))
+   assert np.allclose(samples.mean(axis=0), [2.0, 3.0*np.exp(0.02), 1.5, 2.0], rtol=0.01)
+   assert np.isclose(np.median(samples[:, 1]), 3.0, rtol=0.01)
+   assert samples[:, 2].min() >= 1.0 and samples[:, 2].max() <= 2.0
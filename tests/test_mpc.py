@@ -0,0 +1,31 @@
+import numpy as np
+
+def test_simulate_segments_as_one_simulation(explore):
+   outputs = list(explore.stateValue.keys()) + ['DOsensor.out']
+   start_values = {explore.parLocation[k]: explore.parValue[k] for k in explore.parValue.keys()}
+   solver = explore.solver_options(explore.opts_std)
+   whole = explore.simulate_segments(explore.fmu_model, start_values, 0, [(4, {})], 0.05, outputs, solver)
+   parts = explore.simulate_segments(explore.fmu_model, start_values, 0, [(1, {}), (2.5, {}), (4, {})], 0.05, 
+                                     outputs, solver)
+   assert np.allclose(parts['time'], whole['time'])
+   for key in explore.stateValue.keys():
+      assert np.isclose(parts['state'][key], whole['state'][key], rtol=1e-3, atol=1e-6)
+
+def test_mpc_cost(explore):
+   settings = dict(explore.mpcSettings)
+   res = {'bioreactor.m[1]': np.array([1.0, 3.0]), 'bioreactor.c[3]': np.array([0.0, 0.2]), 
+          'DOsensor.out': np.array([explore.parValue['DO_setpoint'] - 10, 100.0])}
+   weights = {'biomass': 1.0, 'ethanol': 10.0, 'DO': 1.0, 'move': 0.0}
+   assert np.isclose(explore.mpc_cost(res, [0.01], 0.01, weights, settings, explore.parValue), -2.0 + 1.0 + 5.0)
+   assert explore.mpc_cost(None, [0.01], 0.01, weights, settings, explore.parValue) == np.inf
+
+def test_simu_mpc(explore):
+   settings = dict(explore.mpcSettings, segments=3, rollouts=4, iterations=2, elite=2, NCP=5)
+   result = explore.simu_mpc(1.0, settings=settings, seed=3, processes=1, verbose=False)
+   assert np.allclose(result['steps'], [0.0, 0.25, 0.5, 0.75])
+   assert np.all((result['feeds'] >= settings['feed_min']) & (result['feeds'] <= settings['feed_max']))
+   assert np.isclose(result['time'][-1], 1.0) and np.all(np.diff(result['time']) > 0)
+   F = result['bioreactor.inlet[1].F']
+   for step, feed in zip(result['steps'], result['feeds']):
+      inside = (result['time'] > step + 1e-9) & (result['time'] < step + settings['segment'] - 1e-9)
+      assert np.allclose(F[inside], feed)
@@ -0,0 +1,27 @@
+import numpy as np
+
+def test_optimize_feed_better(explore):
+   f1 = np.array([1.0, 2.0, 1.0, 5.0]); v1 = np.array([0.0, 0.0, 0.1, 0.2])
+   f2 = np.array([2.0, 1.0, 0.0, 1.0]); v2 = np.array([0.0, 0.0, 0.0, 0.3])
+   assert list(explore.optimize_feed_better(f1, v1, f2, v2)) == [False, True, False, True]
+
+def test_optimize_feed_evaluate_cache(explore):
+   options = explore.SimuOptions(NCP=60)
+   candidates = [{'mu_feed': 0.1}, {'mu_feed': 0.2}, {'mu_feed': 0.1}]
+   cache = {}
+   f, v, n = explore.optimize_feed_evaluate(candidates, cache, explore.feedConstraints, 6, options, 1, 
+                                            explore.parValue, explore.parLocation, explore.fmu_model)
+   assert n == 2 and f[0] == f[2] and np.all(v >= 0)
+   f_again, v_again, n = explore.optimize_feed_evaluate(candidates[:2], cache, explore.feedConstraints, 6, options, 1,
+                                                        explore.parValue, explore.parLocation, explore.fmu_model)
+   assert n == 0 and np.array_equal(f_again, f[:2])
+
+def test_optimize_feed_keeps_best(explore):
+   result = explore.optimize_feed(population=6, generations=2, simulationTime=6, options=explore.SimuOptions(NCP=60), 
+                                  seed=2, processes=1)
+   history = result['history']
+   for before, after in zip(history[:-1], history[1:]):
+      assert not explore.optimize_feed_better(before['biomass'], before['violation'], after['biomass'], 
+                                              after['violation'])
+   bounds = explore.feedBounds
+   assert all(bounds[key][0] <= value <= bounds[key][1] for key, value in result['parValue'].items())
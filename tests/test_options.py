@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+def test_options_checked(explore):
+   options = explore.SimuOptions(NCP=100, relative_tolerance=1e-6)
+   assert options['NCP'] == 100 and options['solver'] == 'CVode'
+   assert explore.SimuOptions(max_step=1)['max_step'] == 1.0
+   with pytest.raises(KeyError): explore.SimuOptions(ncp=100)
+   with pytest.raises(TypeError): explore.SimuOptions(NCP=100.0)
+   with pytest.raises(TypeError): explore.SimuOptions(NCP=True)
+   with pytest.raises(ValueError): explore.SimuOptions(solver='RK4')
+   with pytest.raises(ValueError): explore.SimuOptions(NCP=0)
+   with pytest.raises(ValueError): explore.SimuOptions(NCP=None)
+   assert 'NCP' not in options.solver() and options.solver()['relative_tolerance'] == 1e-6
+
+def test_solver_statistics(explore):
+   result = explore.simu_run(4, options=explore.SimuOptions(NCP=100, statistics=True))
+   statistics = result.info['statistics']
+   assert statistics['steps'] > 0 and statistics['rhs_evals'] >= statistics['steps']
+   assert statistics['output_points'] == len(result['time'])
+
+def test_solver_tolerance_and_euler(explore):
+   loose = explore.simu_run(4, options=explore.SimuOptions(NCP=100, relative_tolerance=1e-3, statistics=True))
+   tight = explore.simu_run(4, options=explore.SimuOptions(NCP=100, relative_tolerance=1e-8, statistics=True))
+   assert tight.info['statistics']['steps'] > loose.info['statistics']['steps']
+   euler = explore.simu_run(4, options=explore.SimuOptions(NCP=100, solver='Euler', step_size=1e-4))
+   assert np.isclose(euler.final('bioreactor.m[1]'), tight.final('bioreactor.m[1]'), rtol=1e-2)
+
+def test_simulate_fmu_by_default(explore, monkeypatch):
+   loop = explore.simu_run(4, options=explore.SimuOptions(NCP=100, statistics=True))
+   monkeypatch.setattr(explore, 'simulate_me', None)
+   default = explore.simu_run(4, options=explore.SimuOptions(NCP=100))
+   assert 'steps' not in default.info['statistics']
+   assert np.isclose(default.final('bioreactor.m[1]'), loop.final('bioreactor.m[1]'), rtol=1e-4)
+   monkeypatch.setattr(explore, 'fmpyLoop', False)
+   fallback = explore.simu_run(4, options=explore.SimuOptions(NCP=100, statistics=True))
+   assert 'steps' not in fallback.info['statistics']
@@ -0,0 +1,24 @@
+def test_profiler_phases(explore, capsys):
+   explore.profiler_setup()
+   try:
+      result = explore.simu_run(2)
+      explore.simu_run(1, 'cont')
+   finally:
+      explore.profiler_setup(False)
+   profile = result.info['profile']
+   assert {'total', 'stateValue', 'result'} <= set(profile.keys())
+   assert all(entry['time'] >= 0 and entry['calls'] >= 1 for entry in profile.values())
+   assert profile['total']['time'] >= sum(entry['time'] for phase, entry in profile.items() 
+                                          if phase in ['stateValue', 'result'])
+
+def test_profiler_aggregate_and_report(explore, capsys):
+   explore.profiler_setup()
+   try:
+      explore.simu_run(1)
+      explore.simu_run(1)
+      assert explore.simuProfiler['runs'] == 2
+      explore.profiler_report()
+   finally:
+      explore.profiler_setup(False)
+   assert 'total' in capsys.readouterr().out
+   assert 'profile' not in explore.simu_run(1).info
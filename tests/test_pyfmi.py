@@ -0,0 +1,92 @@
+# Tests of the PyFMI script as those of the FMPy script, skipped where PyFMI is not installed
+
+import os
+
+import numpy as np
+import pytest
+
+@pytest.fixture()
+def cache(explore_pyfmi, tmp_path):
+   directory = str(tmp_path/'cache')
+   explore_pyfmi.result_cache_setup(directory)
+   yield directory
+   explore_pyfmi.result_cache_setup(None)
+
+def test_pyfmi_headless_simu_run_result(explore_pyfmi):
+   explore = explore_pyfmi
+   assert explore.headless and 'plt' not in vars(explore)
+   result = explore.simu_run(3)
+   assert isinstance(result, explore.SimuResult) and 'plt' not in vars(explore)
+   assert result.start_time == 0 and result.final_time == 3 == explore.prevFinalTime
+   assert 'bioreactor.V' in result.keys() and result.final('bioreactor.V') == result['bioreactor.V'][-1]
+   cont = explore.simu_run(1, 'cont')
+   assert cont.start_time == 3 and cont.final_time == 4
+
+def test_pyfmi_parameter_binding(explore_pyfmi):
+   explore = explore_pyfmi
+   binding = explore.parameter_binding()
+   assert explore.parameter_binding() is binding
+   assert sorted(binding['par_real'] + binding['par_other']) == sorted(explore.parValue.keys())
+   assert len(binding['par_valueReference']) == len(binding['par_real'])
+   explore.par(mu_feed=0.2)
+   result = explore.simu_run(2)
+   assert explore.model.get(explore.parLocation['mu_feed'])[0] == 0.2
+   for key in binding['states']: assert np.isclose(explore.stateValue[key], result.final(key))
+
+def test_pyfmi_continuation_as_one_simulation(explore_pyfmi):
+   explore = explore_pyfmi
+   plan = explore.continuation_plan()
+   assert explore.continuation_plan() is plan
+   starts = set(explore.stateValueInitial.values())
+   assert not any(explore.parLocation[k] in starts for k in plan['par_real'] + plan['par_other'])
+   whole = explore.simu_run(4)
+   explore.simu_run(2)
+   cont = explore.simu_run(2, 'cont')
+   for key in ['bioreactor.m[1]', 'bioreactor.m[2]', 'bioreactor.V']:
+      assert np.isclose(cont.final(key), whole.final(key), rtol=1e-3)
+
+def test_pyfmi_cache_round_trip(explore_pyfmi, cache):
+   explore = explore_pyfmi
+   first = explore.simu_run(4)
+   stateValue = dict(explore.stateValue)
+   hits = explore.resultCache['hits']
+   second = explore.simu_run(4)
+   assert explore.resultCache['hits'] == hits + 1
+   assert set(second.keys()) <= set(first.keys()) and 'bioreactor.V' in second.keys()
+   for name in second.keys(): assert np.array_equal(second[name], first[name])
+   assert explore.stateValue == stateValue
+   assert explore.prevFinalTime == 4 and explore.model.time == 4
+   cont = explore.simu_run(2, 'cont')
+   assert cont.start_time == 4 and cont.final_time == 6
+   explore.par(mu_feed=0.2)
+   explore.simu_run(4)
+   assert len(os.listdir(cache)) == 3
+
+def test_pyfmi_store_round_trip_and_select(explore_pyfmi, tmp_path):
+   explore = explore_pyfmi
+   directory = str(tmp_path)
+   explore.result_store_setup(directory)
+   try:
+      for mu_feed in [0.1, 0.2]:
+         explore.par(mu_feed=mu_feed)
+         result = explore.simu_run(1)
+   finally:
+      explore.result_store_setup(None)
+   archive = explore.result_open(directory)
+   assert len(archive) == 2
+   run_id, = archive.select(mu_feed=0.2)
+   stored = archive[run_id]
+   assert isinstance(stored.data, np.memmap) and stored.metadata['guid'] == explore.model.get_guid()
+   for name in stored.keys(): assert np.array_equal(stored[name], result[name])
+
+def test_pyfmi_profiler_phases(explore_pyfmi):
+   explore = explore_pyfmi
+   explore.profiler_setup()
+   try:
+      result = explore.simu_run(2)
+   finally:
+      explore.profiler_setup(False)
+   profile = result.info['profile']
+   assert {'reset', 'start_values', 'simulate', 'stateValue', 'result', 'total'} <= set(profile.keys())
+   assert all(entry['time'] >= 0 and entry['calls'] >= 1 for entry in profile.values())
+   assert any(phase.startswith('simulate.') for phase in profile.keys())
@@ -0,0 +1,40 @@
+import socket
+
+import numpy as np
+
+def free_address():
+   with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+      sock.bind(('127.0.0.1', 0))
+      return sock.getsockname()
+
+def test_realtime_setpoint_written_at_start(explore, monkeypatch):
+   address = {'publish': free_address(), 'listen': free_address()}
+   simu_stream = explore.simu_stream
+   calls = []
+   def simu_stream_write(*args, **kwargs):
+      if not calls: explore.realtime_write(address['listen'], DO_setpoint=25)
+      calls.append(args[1])
+      yield from simu_stream(*args, **kwargs)
+   monkeypatch.setattr(explore, 'simu_stream', simu_stream_write)
+   DO_setpoint = explore.parValue['DO_setpoint']
+   result = explore.simu_realtime(0.5, speedup=1e6, step=0.05, address=address, verbose=False)
+   assert calls == ['init', 'init']
+   assert result['writes'] == [(0.0, {'DO_setpoint': 25})]
+   assert explore.parValue['DO_setpoint'] == DO_setpoint != 25
+   assert np.allclose(result['time'], np.arange(11)*0.05)
+
+def test_realtime_setpoint_written_during_culture(explore, monkeypatch):
+   address = {'publish': free_address(), 'listen': free_address()}
+   simu_stream = explore.simu_stream
+   writes = []
+   def simu_stream_write(*args, **kwargs):
+      for res in simu_stream(*args, **kwargs):
+         if not writes and abs(res['time'][-1] - 0.2) < 1e-9: 
+            writes.append(explore.realtime_write(address['listen'], DO_setpoint=25))
+         yield res
+   monkeypatch.setattr(explore, 'simu_stream', simu_stream_write)
+   values = explore.parValue.copy()
+   result = explore.simu_realtime(0.5, speedup=1e6, step=0.05, address=address, verbose=False)
+   assert [t for t, _ in result['writes']] == [0.2]
+   assert explore.parValue == values
+   assert np.allclose(result['time'], np.arange(11)*0.05)
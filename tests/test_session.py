@@ -0,0 +1,30 @@
+import fmpy
+import numpy as np
+
+def test_session_reused_between_simulations(explore):
+   explore.simu_run(2)
+   session = explore.fmu_session(explore.fmu_model)
+   runs = session['runs']
+   explore.simu_run(2)
+   assert explore.fmu_session(explore.fmu_model) is session
+   assert session['runs'] == runs + 1
+
+def test_session_as_simulate_fmu(explore):
+   output = ['bioreactor.c[1]', 'DOsensor.out']
+   first = explore.simu_run(4, outputs=output)
+   second = explore.simu_run(4, outputs=output)
+   start_values = {explore.parLocation[k]: explore.parValue[k] for k in explore.parValue.keys()}
+   reference = fmpy.simulate_fmu(explore.fmu_model, start_time=0, stop_time=4, output_interval=4/500, 
+                                 start_values=start_values, output=output)
+   for name in ['time'] + output:
+      assert np.array_equal(first[name], second[name])
+      assert np.allclose(np.interp(reference['time'], first['time'], first[name]), reference[name], 
+                         rtol=1e-3, atol=1e-6)
+
+def test_session_closed_and_opened_again(explore):
+   explore.simu_run(2)
+   final = explore.sim_res[-1]
+   explore.fmu_session_close(explore.fmu_model)
+   explore.simu_run(2)
+   assert explore.fmu_session(explore.fmu_model)['runs'] == 1
+   assert explore.sim_res[-1] == final
@@ -0,0 +1,28 @@
+import numpy as np
+
+def ishigami(X, a=7, b=0.1):
+   X = np.pi*(2*X - 1)
+   return np.sin(X[:, 0]) + a*np.sin(X[:, 1])**2 + b*X[:, 2]**4*np.sin(X[:, 0])
+
+def test_sobol_indices_ishigami(explore):
+   k, n = 3, 2**14
+   A, B = explore.sobol_sample(k, n, seed=1)
+   AB = np.stack([np.where(np.arange(k) == i, B, A) for i in range(k)])
+   fAB = np.stack([ishigami(ABi) for ABi in AB])
+   S1, ST = explore.sobol_indices(ishigami(A), ishigami(B), fAB)
+   assert np.allclose(S1, [0.3139, 0.4424, 0.0], atol=0.03)
+   assert np.allclose(ST, [0.5576, 0.4424, 0.2437], atol=0.03)
+
+def test_sobol_indices_additive_and_constant(explore):
+   k, n = 2, 2**12
+   A, B = explore.sobol_sample(k, n, seed=2)
+   f = lambda X: X[:, 0] + 2*X[:, 1]
+   fAB = np.stack([f(np.where(np.arange(k) == i, B, A)) for i in range(k)])
+   S1, ST = explore.sobol_indices(f(A), f(B), fAB)
+   assert np.allclose(S1, [0.2, 0.8], atol=0.02) and np.allclose(ST, [0.2, 0.8], atol=0.02)
+   S1, ST = explore.sobol_indices(np.ones(n), np.ones(n), np.ones((k, n)))
+   assert np.all(np.isnan(S1)) and np.all(np.isnan(ST))
+
+def test_sobol_ranges(explore):
+   for key, (low, high) in explore.sobolRanges.items():
+      assert (low, high) == (0.8*explore.parValue[key], 1.2*explore.parValue[key])
@@ -0,0 +1,27 @@
+import numpy as np
+
+def test_store_round_trip(explore, tmp_path):
+   directory = str(tmp_path)
+   result = explore.simu_run(2, outputs=['DOsensor.out'])
+   run_id = explore.result_save(result, directory)
+   stored = explore.result_open(directory, run_id)
+   assert set(stored.keys()) == set(result.keys())
+   for name in result.keys(): assert np.array_equal(stored[name], result[name])
+   assert isinstance(stored.data, np.memmap)
+   assert stored.parValue == result.parValue
+   assert stored.final('bioreactor.V') == result.final('bioreactor.V')
+
+def test_store_archive_select(explore, tmp_path):
+   directory = str(tmp_path)
+   explore.result_store_setup(directory)
+   try:
+      for DO_setpoint in [20, 30]:
+         explore.par(DO_setpoint=DO_setpoint)
+         explore.simu_run(1)
+   finally:
+      explore.result_store_setup(None)
+   archive = explore.result_open(directory)
+   assert len(archive) == 2
+   run_id, = archive.select(DO_setpoint=30)
+   assert archive[run_id].parValue['DO_setpoint'] == 30
+   assert archive[1].run_id == run_id
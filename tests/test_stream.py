@@ -0,0 +1,34 @@
+import numpy as np
+
+def test_stream_chunks_and_continuation(explore):
+   chunks = list(explore.simu_stream(2, 'init', outputs=['DOsensor.out'], chunk=50))
+   time = np.concatenate([res['time'] for res in chunks])
+   assert all(len(res) <= 50 for res in chunks)
+   assert np.all(np.diff(time) >= 0) and time[0] == 0 and time[-1] == 2
+   assert explore.prevFinalTime == 2
+   assert explore.sim_res['time'][-1] == 2
+   chunks = list(explore.simu_stream(1, 'cont', outputs=['DOsensor.out']))
+   assert chunks[0]['time'][0] == 2 and chunks[-1]['time'][-1] == 3
+   assert explore.prevFinalTime == 3
+
+def test_stream_closed_early_keeps_continuation(explore):
+   list(explore.simu_stream(2, 'init'))
+   stream = explore.simu_stream(2, 'cont', chunk=10)
+   next(stream)
+   stream.close()
+   assert explore.prevFinalTime == 2
+
+def test_stream_adaptive_rejected(explore, capsys):
+   options = explore.SimuOptions(NCP=100, output='adaptive')
+   assert list(explore.simu_stream(2, 'init', options=options)) == []
+   assert 'Error' in capsys.readouterr().out
+
+def test_stream_without_fmpy_loop(explore, monkeypatch):
+   streamed = np.concatenate(list(explore.simu_stream(2, 'init', outputs=['DOsensor.out'], chunk=50)))
+   monkeypatch.setattr(explore, 'fmpyLoop', False)
+   chunks = list(explore.simu_stream(2, 'init', outputs=['DOsensor.out'], chunk=50))
+   assert all(len(res) <= 50 for res in chunks) and chunks[-1]['time'][-1] == 2
+   assert np.isclose(chunks[-1]['DOsensor.out'][-1], streamed['DOsensor.out'][-1], rtol=1e-4)
+   generator = explore.simu_stream(2, 'init', chunk=50)
+   next(generator)
+   generator.close()
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+def test_surrogate_sample_latin_hypercube(explore):
+   ranges = {'a': (0.0, 1.0), 'b': (2.0, 6.0)}
+   samples = explore.surrogate_sample(ranges, 50, np.random.default_rng(5))
+   u = (samples - [0.0, 2.0])/[1.0, 4.0]
+   for column in u.T: assert sorted(np.floor(column*50).astype(int)) == list(range(50))
+
+def test_surrogate_poly_exact_for_quadratic(explore):
+   X = np.random.default_rng(6).random((40, 3))
+   f = lambda X: 1 + X[:, 0] - 2*X[:, 1]*X[:, 2] + 3*X[:, 2]**2
+   models = explore.surrogate_fit('poly', X, f(X)[:, None])
+   Xt = np.random.default_rng(7).random((10, 3))
+   assert np.allclose(explore.surrogate_evaluate('poly', models, Xt)[:, 0], f(Xt))
+
+def test_surrogate_gp_smooth_function(explore):
+   minimize = pytest.importorskip('scipy.optimize').minimize
+   X = explore.surrogate_sample({'a': (0, 1), 'b': (0, 1)}, 60, np.random.default_rng(8))
+   f = lambda X: np.sin(3*X[:, 0]) + X[:, 1]**2
+   y = f(X)
+   models = explore.surrogate_fit('gp', X, ((y - y.mean())/y.std())[:, None], minimize)
+   Xt = np.random.default_rng(9).random((20, 2))*0.8 + 0.1
+   prediction = explore.surrogate_evaluate('gp', models, Xt)[:, 0]*y.std() + y.mean()
+   assert np.max(np.abs(prediction - f(Xt))) < 0.01*np.ptp(y)
+
+def test_surrogate_kpis(explore):
+   result = {'time': np.array([0.0, 1.0, 2.0]), 'x': np.array([[1.0, 3.0, 2.0], [0.0, 0.0, 4.0]])}
+   kpis = {'final': ('x', 'final'), 'min': ('x', 'min'), 'max': ('x', 'max'), 'integral': ('x', 'integral')}
+   values = explore.surrogate_kpis(result, kpis)
+   assert np.array_equal(values['final'], [2.0, 4.0]) and np.array_equal(values['min'], [1.0, 0.0])
+   assert np.array_equal(values['max'], [3.0, 4.0]) and np.array_equal(values['integral'], [4.5, 2.0])
+
+def test_surrogate_train_and_predict(explore):
+   surrogate = {}
+   explore.surrogate_train(n=30, kind='poly', simulationTime=6, options=explore.SimuOptions(NCP=60), seed=1, 
+                           processes=1, surrogate=surrogate)
+   assert set(surrogate['validation'].keys()) == set(explore.surrogateKPIs.keys())
+   k = 3
+   point = dict(zip(surrogate['parameters'], surrogate['samples'][k]))
+   predicted = explore.predict(point, surrogate)
+   for j, name in enumerate(explore.surrogateKPIs.keys()):
+      span = max(np.ptp(surrogate['values'][:, j]), 1e-12)
+      assert abs(predicted[name] - surrogate['values'][k, j]) < 0.2*span
@@ -0,0 +1,18 @@
+import numpy as np
+
+def test_sweep_scenarios(explore):
+   scenarios = explore.sweep_scenarios({'DO_setpoint': [20, 30], 'mu_feed': [0.1, 0.2, 0.3]})
+   assert len(scenarios) == 6 and {'DO_setpoint': 30, 'mu_feed': 0.1} in scenarios
+   assert explore.sweep_scenarios([{'DO_setpoint': 20}]) == [{'DO_setpoint': 20}]
+   assert explore.sweep_scenarios({'DO_setpointt': [20]}) is None
+
+def test_sweep_parallel_as_serial(explore):
+   outputs = ['bioreactor.c[1]', 'DOsensor.out']
+   options = explore.SimuOptions(NCP=100)
+   sweep = explore.simu_sweep({'DO_setpoint': [20, 30]}, outputs, 4, options, processes=2)
+   assert sweep['bioreactor.c[1]'].shape == (2, 101)
+   for k, scenario in enumerate(sweep['scenarios']):
+      explore.par(scenario)
+      res = explore.simu_run(4, options=options, outputs=outputs)
+      for name in outputs: 
+         assert np.allclose(sweep[name][k], np.interp(sweep['time'], res['time'], res[name]), rtol=1e-6, atol=1e-9)